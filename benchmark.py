@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Benchmarks for cluster serialization. Usage:
+
+    ./benchmark.py [--size N] [--repeat N] [benchmark_name ...]
+
+Runs against a temporary test database, using the same settings as runtests.py.
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import timeit
+from decimal import Decimal
+
+import django
+from django.db import connection
+
+import runtests  # NOQA - configures settings
+
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+def report(label, seconds, repeat, size=None):
+    line = '  %-32s %10.3f ms' % (label, seconds / repeat * 1000)
+    if size is not None:
+        line += '  %10d bytes' % size
+    print(line)
+
+
+def make_restaurant(size):
+    from tests.models import Chef, Dish, MenuItem, Restaurant, Review, Wine
+
+    chef = Chef.objects.create(name="Heston Blumenthal")
+    dishes = [Dish.objects.create(name="Dish %d" % i) for i in range(10)]
+    wine = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+    restaurant = Restaurant(name="The Fat Duck", proprietor=chef, serves_hot_dogs=False, menu_items=[
+        MenuItem(dish=dishes[i % 10], price=Decimal('%d.50' % i), recommended_wine=wine if i % 2 else None)
+        for i in range(size)
+    ], reviews=[
+        Review(author="Reviewer %d" % i, body="Review body %d" % i)
+        for i in range(size // 10)
+    ])
+    restaurant.save()
+    return Restaurant.objects.get(pk=restaurant.pk)
+
+
+@benchmark
+def binary_format(size, repeat):
+    """Size and encode / decode time of to_bytes against to_json"""
+    from tests.models import Restaurant
+
+    restaurant = make_restaurant(size)
+    json_data = restaurant.to_json()
+    binary_data = restaurant.to_bytes()
+    # serializable_data is common to both formats; time the encoding step alone
+    data = restaurant.serializable_data()
+
+    from django.core.serializers.json import DjangoJSONEncoder
+    from modelcluster import binary
+
+    report('json encode', timeit.timeit(lambda: json.dumps(data, cls=DjangoJSONEncoder), number=repeat), repeat, len(json_data.encode('utf-8')))
+    report('binary encode', timeit.timeit(lambda: binary.dumps(data), number=repeat), repeat, len(binary_data))
+    report('json decode', timeit.timeit(lambda: json.loads(json_data), number=repeat), repeat)
+    report('binary decode', timeit.timeit(lambda: binary.loads(binary_data), number=repeat), repeat)
+    report('from_json', timeit.timeit(lambda: Restaurant.from_json(json_data), number=repeat), repeat)
+    report('from_bytes', timeit.timeit(lambda: Restaurant.from_bytes(binary_data), number=repeat), repeat)
+
+
+@benchmark
+def file_fields(size, repeat):
+    """Serializing models with uploaded files, with and without pre_save"""
+    import shutil
+    import tempfile
+
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test import override_settings
+    from tests.models import Document
+
+    def make_documents():
+        return [
+            Document(title="Document %d" % i, file=SimpleUploadedFile('document%d.txt' % i, b'Hello world'))
+            for i in range(size)
+        ]
+
+    def serialize(pre_save):
+        # the first serialization of a new upload is the one that writes it to storage, so each
+        # run needs new documents
+        total = 0
+        for i in range(repeat):
+            documents = make_documents()
+            start = timeit.default_timer()
+            for document in documents:
+                document.serializable_data(pre_save=pre_save)
+            total += timeit.default_timer() - start
+        return total
+
+    media_root = tempfile.mkdtemp()
+    try:
+        with override_settings(MEDIA_ROOT=media_root):
+            report('with pre_save', serialize(True), repeat)
+            report('without pre_save', serialize(False), repeat)
+    finally:
+        shutil.rmtree(media_root)
+
+
+@benchmark
+def commit(size, repeat):
+    """Saving a cluster with all children modified, with bulk queries and per-object saves"""
+    restaurant = make_restaurant(size)
+
+    def save(send_signals):
+        def run():
+            menu_items = list(restaurant.menu_items.all())
+            for menu_item in menu_items:
+                menu_item.price += 1
+            restaurant.menu_items = menu_items
+            restaurant.menu_items.commit(send_signals=send_signals)
+        return timeit.timeit(run, number=repeat)
+
+    report('bulk', save(False), repeat)
+    report('per-object', save(True), repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=1000, help="number of child objects in each cluster")
+    parser.add_argument('--repeat', type=int, default=10, help="number of timed runs of each operation")
+    parser.add_argument('benchmarks', nargs='*', help="names of benchmarks to run (default: all)")
+    args = parser.parse_args()
+
+    django.setup()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        for func in BENCHMARKS:
+            if args.benchmarks and func.__name__ not in args.benchmarks:
+                continue
+            print('%s: %s (size=%d)' % (func.__name__, func.__doc__, args.size))
+            func(args.size, args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,418 @@
+"""
+A compact binary encoding for the JSON-like data structures returned by
+ClusterableModel.serializable_data.
+
+An encoded document consists of a header (MAGIC followed by a version byte) and a single value.
+Each value is a type tag byte followed by its payload; integers, floats, dates and times are
+packed with struct, and strings are length-prefixed UTF-8. The keys of a dict are written out the
+first time a dict with that set of keys is encountered, and subsequent dicts with the same keys
+(such as the other children of the same relation) refer back to that key table by index.
+
+The encoding is typically a quarter of the size of the JSON, but the encoder and decoder are
+written in Python, and so are slower than the json module's C implementation: for a cluster
+with a few hundred children, encoding takes around twice as long as json.dumps, and decoding
+around four times as long as json.loads. Where speed matters more than size, use JSON.
+"""
+from __future__ import unicode_literals
+
+import datetime
+import decimal
+import struct
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import six, timezone
+
+
+MAGIC = b'MCB'
+VERSION = 1
+
+NONE = 0
+TRUE = 1
+FALSE = 2
+INT8 = 3
+INT16 = 4
+INT32 = 5
+INT64 = 6
+BIGINT = 7
+FLOAT = 8
+STRING = 9
+DECIMAL = 10
+DATE = 11
+DATETIME = 12
+TIME = 13
+LIST = 14
+DICT_WITH_KEYS = 15
+DICT = 16
+
+# timezone flags for DATETIME values
+NAIVE = 0
+UTC = 1
+FIXED_OFFSET = 2
+
+HEADER = struct.Struct('>3sB')
+TAG = struct.Struct('>B')
+INT8_STRUCT = struct.Struct('>Bb')
+INT16_STRUCT = struct.Struct('>Bh')
+INT32_STRUCT = struct.Struct('>Bi')
+INT64_STRUCT = struct.Struct('>Bq')
+FLOAT_STRUCT = struct.Struct('>Bd')
+DATE_STRUCT = struct.Struct('>BHBB')
+DATETIME_STRUCT = struct.Struct('>BHBBBBBHB')
+TIME_STRUCT = struct.Struct('>BBBBH')
+OFFSET_STRUCT = struct.Struct('>h')
+
+NONE_BYTES = TAG.pack(NONE)
+TRUE_BYTES = TAG.pack(TRUE)
+FALSE_BYTES = TAG.pack(FALSE)
+BIGINT_BYTES = TAG.pack(BIGINT)
+STRING_BYTES = TAG.pack(STRING)
+DECIMAL_BYTES = TAG.pack(DECIMAL)
+LIST_BYTES = TAG.pack(LIST)
+DICT_WITH_KEYS_BYTES = TAG.pack(DICT_WITH_KEYS)
+DICT_BYTES = TAG.pack(DICT)
+
+ZERO = datetime.timedelta(0)
+
+# lone surrogates can appear in python 3 strings, and are preserved as they are by json
+UTF8_ERRORS = 'surrogatepass' if six.PY3 else 'strict'
+
+
+class BinaryFormatError(ValueError):
+    pass
+
+
+# encodings of the varints that fit in one byte, such as most lengths and counts
+SMALL_VARINTS = [TAG.pack(value) for value in range(0x80)]
+
+
+def _encode_varint(value):
+    if value < 0x80:
+        return SMALL_VARINTS[value]
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class Encoder(object):
+    """
+    Writes the binary encoding of a value to the callable `write`. Datetimes and times are
+    truncated to millisecond precision, as DjangoJSONEncoder does, so that the result is
+    equivalent to the JSON representation.
+    """
+    def __init__(self, write):
+        self.write = write
+        self.key_tables = {}
+        self.json_encoder = DjangoJSONEncoder()
+
+        # encoding functions, looked up by exact type; encoders for subclasses are found
+        # with get_encoder
+        self.encoders = {
+            type(None): self.encode_none,
+            bool: self.encode_bool,
+            float: self.encode_float,
+            six.text_type: self.encode_string,
+            dict: self.encode_dict,
+            list: self.encode_list,
+            tuple: self.encode_list,
+            decimal.Decimal: self.encode_decimal,
+            datetime.datetime: self.encode_datetime,
+            datetime.date: self.encode_date,
+            datetime.time: self.encode_time,
+        }
+        for integer_type in six.integer_types:
+            self.encoders[integer_type] = self.encode_int
+        if six.PY2:
+            self.encoders[six.binary_type] = lambda value: self.encode_string(value.decode('utf-8'))
+
+    def write_header(self):
+        self.write(HEADER.pack(MAGIC, VERSION))
+
+    def write_string(self, value):
+        data = value.encode('utf-8', 'surrogatepass') if six.PY3 else value.encode('utf-8')
+        self.write(_encode_varint(len(data)) + data)
+
+    def encode(self, value):
+        try:
+            encode = self.encoders[type(value)]
+        except KeyError:
+            encode = self.encoders[type(value)] = self.get_encoder(value)
+        encode(value)
+
+    def get_encoder(self, value):
+        # bool is a subclass of int, so must be checked first
+        for base in (bool, six.text_type, dict, list, tuple, datetime.datetime, datetime.date, datetime.time) + \
+                six.integer_types + (float, decimal.Decimal):
+            if isinstance(value, base):
+                return self.encoders[base]
+
+        # fall back on the JSON representation for any other types (UUIDs, lazy strings...)
+        return lambda value: self.encode(self.json_encoder.default(value))
+
+    def encode_none(self, value):
+        self.write(NONE_BYTES)
+
+    def encode_bool(self, value):
+        self.write(TRUE_BYTES if value else FALSE_BYTES)
+
+    def encode_int(self, value):
+        if -0x80 <= value < 0x80:
+            self.write(INT8_STRUCT.pack(INT8, value))
+        elif -0x8000 <= value < 0x8000:
+            self.write(INT16_STRUCT.pack(INT16, value))
+        elif -0x80000000 <= value < 0x80000000:
+            self.write(INT32_STRUCT.pack(INT32, value))
+        elif -0x8000000000000000 <= value < 0x8000000000000000:
+            self.write(INT64_STRUCT.pack(INT64, value))
+        else:
+            self.write(BIGINT_BYTES)
+            self.write_string(six.text_type(value))
+
+    def encode_float(self, value):
+        self.write(FLOAT_STRUCT.pack(FLOAT, value))
+
+    def encode_string(self, value):
+        self.write(STRING_BYTES)
+        self.write_string(value)
+
+    def encode_dict(self, value):
+        keys = tuple(value)
+        try:
+            index = self.key_tables[keys]
+        except KeyError:
+            self.key_tables[keys] = len(self.key_tables)
+            self.write(DICT_WITH_KEYS_BYTES)
+            self.write(_encode_varint(len(keys)))
+            for key in keys:
+                self.write_string(key)
+        else:
+            self.write(DICT_BYTES)
+            self.write(_encode_varint(index))
+
+        # encoders are looked up directly for the common case of a known type
+        get_encoder = self.encoders.get
+        encode = self.encode
+        for item in value.values():
+            (get_encoder(type(item)) or encode)(item)
+
+    def encode_list(self, value):
+        self.write(LIST_BYTES)
+        self.write(_encode_varint(len(value)))
+        get_encoder = self.encoders.get
+        encode = self.encode
+        for item in value:
+            (get_encoder(type(item)) or encode)(item)
+
+    def encode_decimal(self, value):
+        self.write(DECIMAL_BYTES)
+        self.write_string(six.text_type(value))
+
+    def encode_datetime(self, value):
+        offset = value.utcoffset()
+        if offset is None:
+            tz_flag = NAIVE
+        elif offset == ZERO:
+            tz_flag = UTC
+        else:
+            tz_flag = FIXED_OFFSET
+        self.write(DATETIME_STRUCT.pack(
+            DATETIME, value.year, value.month, value.day,
+            value.hour, value.minute, value.second, value.microsecond // 1000, tz_flag
+        ))
+        if tz_flag == FIXED_OFFSET:
+            self.write(OFFSET_STRUCT.pack(offset.days * 1440 + offset.seconds // 60))
+
+    def encode_date(self, value):
+        self.write(DATE_STRUCT.pack(DATE, value.year, value.month, value.day))
+
+    def encode_time(self, value):
+        if timezone.is_aware(value):
+            raise ValueError("JSON can't represent timezone-aware times.")
+        self.write(TIME_STRUCT.pack(TIME, value.hour, value.minute, value.second, value.microsecond // 1000))
+
+
+class Decoder(object):
+    """
+    Reads a value from the binary encoding. The read methods take the position to read from (just
+    after the type tag, for values) and return the value read along with the position that
+    follows it; passing the position around, rather than keeping it on the decoder, avoids
+    much of the per-value overhead of decoding in Python.
+    """
+    def __init__(self, data):
+        self.data = bytearray(data)
+        self.key_tables = []
+        # decoding functions, indexed by type tag
+        self.decoders = [self.read_unknown] * 256
+        self.decoders[NONE] = lambda pos: (None, pos)
+        self.decoders[TRUE] = lambda pos: (True, pos)
+        self.decoders[FALSE] = lambda pos: (False, pos)
+        self.decoders[INT8] = self.read_int8
+        self.decoders[INT16] = self.unpacker(INT16_STRUCT)
+        self.decoders[INT32] = self.unpacker(INT32_STRUCT)
+        self.decoders[INT64] = self.unpacker(INT64_STRUCT)
+        self.decoders[BIGINT] = self.read_bigint
+        self.decoders[FLOAT] = self.unpacker(FLOAT_STRUCT)
+        self.decoders[STRING] = self.read_string
+        self.decoders[DECIMAL] = self.read_decimal
+        self.decoders[DATE] = self.read_date
+        self.decoders[DATETIME] = self.read_datetime
+        self.decoders[TIME] = self.read_time
+        self.decoders[LIST] = self.read_list
+        self.decoders[DICT_WITH_KEYS] = self.read_dict_with_keys
+        self.decoders[DICT] = self.read_dict
+
+    def decode(self):
+        """
+        Read the header and the value that follows it, which must make up the whole of the data
+        """
+        self.read_header()
+        try:
+            value, pos = self.read_value(HEADER.size)
+        except (IndexError, struct.error):
+            # reading past the end of the data
+            raise BinaryFormatError("Unexpected end of data")
+        if pos != len(self.data):
+            raise BinaryFormatError("Unexpected data after end of value")
+        return value
+
+    def unpacker(self, struct_format):
+        def unpack(pos):
+            # the struct formats include the tag byte, so unpack from the tag's position
+            tag, value = struct_format.unpack_from(self.data, pos - 1)
+            return value, pos + struct_format.size - 1
+        return unpack
+
+    def read_header(self):
+        try:
+            magic, version = HEADER.unpack_from(self.data, 0)
+        except struct.error:
+            raise BinaryFormatError("Data is too short to be a binary cluster")
+        if magic != MAGIC:
+            raise BinaryFormatError("Data is not a binary cluster")
+        if version != VERSION:
+            raise BinaryFormatError("Unsupported binary cluster version: %d" % version)
+
+    def read_value(self, pos):
+        return self.decoders[self.data[pos]](pos + 1)
+
+    def read_unknown(self, pos):
+        raise BinaryFormatError("Unknown type tag: %d" % self.data[pos - 1])
+
+    def read_varint(self, pos):
+        data = self.data
+        result = 0
+        shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return result, pos
+            shift += 7
+
+    def read_int8(self, pos):
+        value = self.data[pos]
+        return (value - 0x100 if value > 0x7f else value), pos + 1
+
+    def read_string(self, pos):
+        data = self.data
+        length = data[pos]
+        if length > 0x7f:
+            length, pos = self.read_varint(pos)
+        else:
+            pos += 1
+        end = pos + length
+        if end > len(data):
+            raise BinaryFormatError("Unexpected end of data")
+        return data[pos:end].decode('utf-8', UTF8_ERRORS), end
+
+    def read_bigint(self, pos):
+        value, pos = self.read_string(pos)
+        return int(value), pos
+
+    def read_decimal(self, pos):
+        value, pos = self.read_string(pos)
+        return decimal.Decimal(value), pos
+
+    def read_date(self, pos):
+        tag, year, month, day = DATE_STRUCT.unpack_from(self.data, pos - 1)
+        return datetime.date(year, month, day), pos + DATE_STRUCT.size - 1
+
+    def read_datetime(self, pos):
+        tag, year, month, day, hour, minute, second, millisecond, tz_flag = DATETIME_STRUCT.unpack_from(
+            self.data, pos - 1
+        )
+        pos += DATETIME_STRUCT.size - 1
+        if tz_flag == NAIVE:
+            tzinfo = None
+        elif tz_flag == UTC:
+            tzinfo = timezone.utc
+        else:
+            offset, = OFFSET_STRUCT.unpack_from(self.data, pos)
+            pos += OFFSET_STRUCT.size
+            tzinfo = timezone.get_fixed_timezone(offset)
+        return datetime.datetime(year, month, day, hour, minute, second, millisecond * 1000, tzinfo), pos
+
+    def read_time(self, pos):
+        tag, hour, minute, second, millisecond = TIME_STRUCT.unpack_from(self.data, pos - 1)
+        return datetime.time(hour, minute, second, millisecond * 1000), pos + TIME_STRUCT.size - 1
+
+    def read_list(self, pos):
+        count, pos = self.read_varint(pos)
+        data = self.data
+        decoders = self.decoders
+        result = []
+        append = result.append
+        for i in range(count):
+            value, pos = decoders[data[pos]](pos + 1)
+            append(value)
+        return result, pos
+
+    def read_dict_with_keys(self, pos):
+        count, pos = self.read_varint(pos)
+        keys = []
+        for i in range(count):
+            key, pos = self.read_string(pos)
+            keys.append(key)
+        self.key_tables.append(keys)
+        return self.read_dict_values(keys, pos)
+
+    def read_dict(self, pos):
+        index = self.data[pos]
+        if index > 0x7f:
+            index, pos = self.read_varint(pos)
+        else:
+            pos += 1
+        try:
+            keys = self.key_tables[index]
+        except IndexError:
+            raise BinaryFormatError("Invalid key table reference: %d" % index)
+        return self.read_dict_values(keys, pos)
+
+    def read_dict_values(self, keys, pos):
+        data = self.data
+        decoders = self.decoders
+        result = {}
+        for key in keys:
+            result[key], pos = decoders[data[pos]](pos + 1)
+        return result, pos
+
+
+def dumps(value):
+    """
+    Return the binary encoding of value (as returned by serializable_data), with header
+    """
+    chunks = []
+    encoder = Encoder(chunks.append)
+    encoder.write_header()
+    encoder.encode(value)
+    return b''.join(chunks)
+
+
+def loads(data):
+    """
+    Decode a value from the binary encoding produced by dumps
+    """
+    return Decoder(data).decode()
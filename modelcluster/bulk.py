@@ -0,0 +1,366 @@
+"""
+Bulk database writes for committing in-memory child relations: the objects to be removed are
+deleted with one query per batch of pks, new objects are inserted with bulk_create, and existing
+objects are updated with one UPDATE query per batch. Batches are sized to fit the backend's
+limit on query parameters. ClusterableModel.save collects the writes for all of its child
+relations in a CommitPlan, and issues them together.
+"""
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, models, router
+
+from modelcluster.models import _method_func, get_changed_fields, get_skipped_fields, has_pre_save_value, \
+    record_original_values
+from modelcluster.utils import chunked, get_batch_size
+
+
+def use_bulk_commit(model, send_signals=None):
+    """
+    Return whether child objects of type model should be committed with bulk queries. This is
+    not done if send_signals is true (or, if it is None, the MODELCLUSTER_COMMIT_SIGNALS setting
+    is true), so that every object is saved or deleted individually and sends the pre_save /
+    post_save / pre_delete / post_delete signals. Models that override save() (including
+    ClusterableModels, which commit their own child relations on save) or use multi-table
+    inheritance are always saved individually.
+    """
+    if send_signals is None:
+        send_signals = getattr(settings, 'MODELCLUSTER_COMMIT_SIGNALS', False)
+    if send_signals:
+        return False
+
+    return _method_func(model, 'save') is _method_func(models.Model, 'save') and not model._meta.get_parent_list()
+
+
+def bulk_update(objects, using, fields=None):
+    """
+    Write the values of fields (or all concrete fields other than the pk, if fields is None) of
+    objects (saved instances of the same model) to the database, with one UPDATE query per batch,
+    setting each column to a CASE expression over the pks of the batch. Values are prepared with
+    each field's pre_save, as save() does.
+    """
+    if not objects:
+        return
+
+    model = type(objects[0])
+    if fields is None:
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    if not fields:
+        return
+
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    pk_field = model._meta.pk
+    pk_column = quote_name(pk_field.column)
+
+    # the SQL is built directly rather than with Case / When expressions, whose compilation
+    # costs more than the query itself for large batches
+    if connection.vendor == 'postgresql':
+        # parameters within CASE are untyped, so postgresql needs them cast to the column type
+        when_sql = dict(
+            (field, 'WHEN %s = %%s THEN CAST(%%s AS %s)' % (pk_column, field.db_type(connection)))
+            for field in fields
+        )
+    else:
+        when_sql = dict((field, 'WHEN %s = %%s THEN %%s' % pk_column) for field in fields)
+
+    # each object contributes a pk and a value to the CASE expression of each field, and its pk
+    # to the WHERE clause
+    batch_size = get_batch_size(connection, [pk_field] + fields * 2, objects)
+    for batch in chunked(objects, batch_size):
+        pks = [pk_field.get_db_prep_save(obj.pk, connection) for obj in batch]
+        assignments = []
+        params = []
+        for field in fields:
+            assignments.append('%s = CASE %s END' % (
+                quote_name(field.column), ' '.join([when_sql[field]] * len(batch))
+            ))
+            for pk, obj in zip(pks, batch):
+                params.append(pk)
+                params.append(field.get_db_prep_save(field.pre_save(obj, False), connection))
+
+        sql = 'UPDATE %s SET %s WHERE %s IN (%s)' % (
+            quote_name(model._meta.db_table), ', '.join(assignments), pk_column, ', '.join(['%s'] * len(batch))
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + pks)
+
+
+def get_rows(model, pks, fields, using):
+    """
+    Return a dict mapping each value in pks that is the pk of an existing object of type model to
+    a tuple of that object's database values for fields
+    """
+    pks = list(pks)
+    rows = {}
+    for batch in chunked(pks, get_batch_size(connections[using], [model._meta.pk], pks)):
+        queryset = model._base_manager.using(using).filter(pk__in=batch)
+        rows.update((row[0], row[1:]) for row in queryset.values_list('pk', *[field.name for field in fields]))
+    return rows
+
+
+def value_has_changed(field, value, db_value):
+    """
+    Return whether the attribute value of field differs from the value read from the database
+    """
+    if value == db_value:
+        return False
+    try:
+        # allow for values that have been assigned in another form, such as a string for a
+        # DecimalField
+        return field.to_python(value) != db_value
+    except ValidationError:
+        return True
+
+
+def delete_objects(queryset, pks):
+    """
+    Delete the objects in queryset whose pk is in pks, with one query per batch of pks
+    """
+    pks = sorted(pks)
+    for batch in chunked(pks, get_batch_size(connections[queryset.db], [queryset.model._meta.pk], pks)):
+        # queryset.delete() handles cascades, and only fetches the objects if there are
+        # deletion signal receivers
+        queryset.filter(pk__in=batch).delete()
+
+
+class CommitPlan(object):
+    """
+    The database writes for committing one or more child relations, collected so that they can
+    be issued together, in order: all deletions, then all inserts, then all updates. Inserts of
+    objects of the same model, and updates of the same fields of the same model, are combined
+    across relations.
+    """
+    def __init__(self, using):
+        self.using = using
+        self.deletions = []
+        # objects to insert with bulk_create, by model
+        self.insertions = OrderedDict()
+        # objects to insert individually, to obtain their pks
+        self.saves = []
+        # objects to update, by model and tuple of fields to be written
+        self.updates = OrderedDict()
+        self.objects = []
+        self.callbacks = []
+
+    def on_execute(self, callback):
+        """
+        Register a function to be called (with no arguments) once the writes have been issued
+        successfully
+        """
+        self.callbacks.append(callback)
+
+    def delete(self, queryset, pks):
+        """
+        Delete the objects in queryset whose pk is in pks
+        """
+        if pks:
+            self.deletions.append((queryset, pks))
+
+    def write(self, model, fields, items, rows, known_changes=None):
+        """
+        Write items (objects of type model) to the database: objects whose pk is in rows (a dict
+        of their current database values for fields, as returned by get_rows) are updated,
+        writing only the fields that differ (along with any fields that get a new value from
+        pre_save, such as auto_now dates) and leaving out skipped fields (see
+        modelcluster.models.get_skipped_fields); other objects are inserted.
+        known_changes is an optional dict of id(item) => the fields to write, as given by
+        get_changed_fields(item, from_database=True, include_pre_save=True), for existing objects
+        whose changes are known from the values they were loaded with; these are not looked up
+        in rows.
+        """
+        can_return_ids = getattr(connections[self.using].features, 'can_return_ids_from_bulk_insert', False)
+        pre_save_fields = set(field for field in fields if has_pre_save_value(field))
+
+        for item in items:
+            if item.pk is None and not can_return_ids:
+                # bulk_create cannot set the pks of new objects on this backend, so they are
+                # inserted one at a time to leave them usable after the commit
+                self.saves.append(item)
+            elif item.pk is not None and item.pk in rows:
+                # fields left out of the serialized data the object was built from are not written
+                skipped_fields = get_skipped_fields(item)
+                changed_fields = set(
+                    field for field, db_value in zip(fields, rows[item.pk])
+                    if field.name not in skipped_fields and
+                    value_has_changed(field, getattr(item, field.attname), db_value)
+                )
+                if changed_fields:
+                    # fields such as auto_now dates are updated whenever the row is written
+                    changed_fields = tuple(
+                        field for field in fields
+                        if field in changed_fields or (field in pre_save_fields and field.name not in skipped_fields)
+                    )
+                    self.updates.setdefault((model, changed_fields), []).append(item)
+            elif known_changes and id(item) in known_changes:
+                skipped_fields = get_skipped_fields(item)
+                changed_fields = tuple(
+                    field for field in known_changes[id(item)] if field.name not in skipped_fields
+                )
+                if changed_fields:
+                    self.updates.setdefault((model, changed_fields), []).append(item)
+            else:
+                # objects with pks that don't exist are inserted with that pk
+                self.insertions.setdefault(model, []).append(item)
+
+        self.objects.extend(items)
+
+    def execute(self):
+        """
+        Issue the collected writes, call the registered callbacks, and reset the plan. If a write
+        fails, the callbacks are not called.
+        """
+        for queryset, pks in self.deletions:
+            delete_objects(queryset.using(self.using), pks)
+
+        # objects with given pks are inserted before those assigned one by the database, which
+        # might otherwise take the same pks
+        for model, items in self.insertions.items():
+            model._base_manager.using(self.using).bulk_create(items)
+        for item in self.saves:
+            item.save(using=self.using)
+
+        for (model, fields), items in self.updates.items():
+            bulk_update(items, self.using, fields=list(fields))
+
+        for item in self.objects:
+            item._state.adding = False
+            item._state.db = self.using
+            record_original_values(item)
+
+        callbacks = self.callbacks
+        self.__init__(self.using)
+        for callback in callbacks:
+            callback()
+
+
+def run_after_execute(plan, callback):
+    """
+    Call callback once plan has been executed, or straight away if plan is None
+    """
+    if plan is None:
+        callback()
+    else:
+        plan.on_execute(callback)
+
+
+def _get_plan(plan, using):
+    # return the plan to add writes for the database using to, and whether it is a new plan to
+    # be executed straight away
+    if plan is None or plan.using != using:
+        return CommitPlan(using), True
+    return plan, False
+
+
+def commit_child_objects(instance, rel_field, live_queryset, final_items, plan=None):
+    """
+    Make the database rows for the objects related to instance through the ParentalKey
+    rel_field, which currently match live_queryset, match the list final_items. Unchanged objects
+    are not written, and for other existing objects only the fields that differ are updated.
+    If plan is given, the writes are added to that CommitPlan, to be issued when it is executed.
+    """
+    model = rel_field.model
+    using = router.db_for_write(model, instance=instance)
+    plan, execute = _get_plan(plan, using)
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+
+    for item in final_items:
+        setattr(item, rel_field.name, instance)
+
+    live_pks = set(live_queryset.values_list('pk', flat=True))
+    final_pks = set(item.pk for item in final_items if item.pk is not None)
+    plan.delete(model._base_manager.all(), live_pks - final_pks)
+
+    # objects in the relation that were loaded from the database are compared with the values
+    # they were loaded with. Other objects are compared with their rows as they are now: objects
+    # built from serialized data (such as a revision) need not match the database, and objects
+    # with pks that are not currently in the relation may exist elsewhere (to be moved to this
+    # instance) or not at all (to be inserted with that pk)
+    known_changes = {}
+    unknown_pks = set()
+    for item in final_items:
+        if item.pk is None:
+            continue
+        changed_fields = None
+        if item.pk in live_pks:
+            changed_fields = get_changed_fields(item, from_database=True, include_pre_save=True)
+        if changed_fields is None:
+            unknown_pks.add(item.pk)
+        else:
+            known_changes[id(item)] = changed_fields
+    rows = get_rows(model, unknown_pks, fields, using) if unknown_pks else {}
+
+    plan.write(model, fields, final_items, rows, known_changes)
+    if execute:
+        plan.execute()
+
+
+def commit_pending_child_objects(instance, rel_field, live_queryset, added_items, removed_pks, plan=None):
+    """
+    Apply pending changes to the objects related to instance through the ParentalKey rel_field,
+    which currently match live_queryset, without reading the rest of the relation: objects with
+    pks in removed_pks are deleted (if they belong to the relation), and added_items are
+    inserted, or updated if they already exist.
+    If plan is given, the writes are added to that CommitPlan, to be issued when it is executed.
+    """
+    model = rel_field.model
+    using = router.db_for_write(model, instance=instance)
+    plan, execute = _get_plan(plan, using)
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+
+    for item in added_items:
+        setattr(item, rel_field.name, instance)
+
+    plan.delete(live_queryset, set(removed_pks))
+
+    added_pks = set(item.pk for item in added_items if item.pk is not None)
+    rows = get_rows(model, added_pks, fields, using) if added_pks else {}
+    plan.write(model, fields, list(added_items), rows)
+    if execute:
+        plan.execute()
+
+
+class StatementCounter(object):
+    """
+    Context manager that counts the SQL statements executed on the database connection for
+    using, as the count attribute (which is None if enabled is false). This uses
+    connection.execute_wrapper where available (Django 2.0+); otherwise statements are counted
+    from the connection's query log, which requires the debug cursor to be forced on, and is only
+    accurate up to the log's size limit.
+    """
+    def __init__(self, using, enabled=True):
+        self.connection = connections[using]
+        self.enabled = enabled
+        self.count = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        if not self.enabled:
+            return self
+
+        self.count = 0
+        if hasattr(self.connection, 'execute_wrapper'):
+            self.wrapper = self.connection.execute_wrapper(self)
+            self.wrapper.__enter__()
+        else:
+            self.wrapper = None
+            self.force_debug_cursor = self.connection.force_debug_cursor
+            self.connection.force_debug_cursor = True
+            self.initial_queries = len(self.connection.queries_log)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.enabled:
+            return
+
+        if self.wrapper is not None:
+            self.wrapper.__exit__(exc_type, exc_value, traceback)
+        else:
+            self.connection.force_debug_cursor = self.force_debug_cursor
+            self.count = len(self.connection.queries_log) - self.initial_queries
@@ -0,0 +1,196 @@
+"""
+An optional process-wide cache of foreign key existence checks, as made by
+from_serializable_data when dealing with dangling foreign keys. Enable it with
+enable_foreign_key_cache; entries are invalidated when objects of the referenced models are
+saved or deleted (via the post_save / post_delete signals), and expire after a timeout, to
+cover changes that bypass signals such as queryset.update().
+
+Entries are invalidated as soon as the signal is sent, and again when the transaction commits
+(on Django versions that provide transaction.on_commit), so that checks made by other
+connections before the commit are not left cached. Checks made within a transaction that is
+rolled back may still be cached until they expire. The receivers are only connected for the
+models that have entries in the cache, along with their proxies and subclasses; Django fetches
+objects of those models before deleting them, rather than deleting them with a single query.
+"""
+from __future__ import unicode_literals
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+
+class ForeignKeyCache(object):
+    """
+    A record of whether the objects referenced by foreign key values exist, keyed on database
+    alias, target model, target field name and value. Holds at most max_size entries, discarding
+    the least recently used ones, and entries expire after `timeout` seconds (or never, if
+    timeout is None).
+    """
+    def __init__(self, max_size=10000, timeout=300):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # model => set of target field names that have been cached for it
+        self._field_names = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, using, model, field_name, value):
+        """
+        Return True or False if the existence of the referenced object is known, or None if not
+        """
+        key = (using, model._meta.concrete_model, field_name, value)
+        with self._lock:
+            try:
+                expiry_time, exists = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+
+            if expiry_time is not None and expiry_time <= time.time():
+                self.misses += 1
+                return None
+
+            # re-insert to mark the entry as most recently used
+            self._entries[key] = (expiry_time, exists)
+            self.hits += 1
+            return exists
+
+    def set(self, using, model, field_name, value, exists):
+        model = model._meta.concrete_model
+        expiry_time = None if self.timeout is None else time.time() + self.timeout
+
+        with self._lock:
+            if model not in self._field_names:
+                self._field_names[model] = set()
+                _connect_receivers(model)
+            self._field_names[model].add(field_name)
+
+            key = (using, model, field_name, value)
+            self._entries.pop(key, None)
+            self._entries[key] = (expiry_time, exists)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_keys(self, using, model, instance):
+        """
+        Return the keys of the entries that may refer to the given instance of model (or of a
+        subclass or proxy of model)
+        """
+        model = model._meta.concrete_model
+        with self._lock:
+            field_names = list(self._field_names.get(model, ()))
+        return [
+            (using, model, field_name, getattr(instance, model._meta.get_field(field_name).attname))
+            for field_name in field_names
+        ]
+
+    def discard(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def invalidate(self, using, model, instance):
+        """
+        Remove any entries referring to the given instance of model (or of a subclass or proxy
+        of model)
+        """
+        self.discard(self.get_keys(using, model, instance))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+
+_foreign_key_cache = None
+
+# models that _invalidate has been connected to as a sender
+_connected_senders = set()
+
+
+def _invalidate(sender, instance, using, **kwargs):
+    cache = _foreign_key_cache
+    if cache is None:
+        return
+
+    # saving an object also creates or updates the rows of the models it inherits from,
+    # which do not receive post_save signals of their own. Signals for proxy models are
+    # handled through their concrete model.
+    keys = []
+    for model in [sender] + list(sender._meta.get_parent_list()):
+        keys.extend(cache.get_keys(using, model, instance))
+    if not keys:
+        return
+
+    # the keys are found now, as a deleted instance loses its pk once the deletion is complete
+    cache.discard(keys)
+
+    on_commit = getattr(transaction, 'on_commit', None)  # not available before Django 1.9
+    if on_commit is not None:
+        on_commit(lambda: cache.discard(keys), using=using)
+
+
+def _get_dispatch_uid(model):
+    return 'modelcluster.cache:%s.%s' % (model._meta.app_label, model._meta.model_name)
+
+
+def _connect_receivers(model):
+    """
+    Connect the invalidation receivers for the given concrete model and every model whose
+    saves and deletes write to its table: its proxies, its subclasses and their proxies
+    """
+    for sender in apps.get_models():
+        concrete_model = sender._meta.concrete_model
+        if concrete_model is not model and model not in concrete_model._meta.get_parent_list():
+            continue
+        if sender in _connected_senders:
+            continue
+
+        # post_delete receivers prevent Django from deleting objects without fetching them
+        # first, so these are connected per model rather than for all senders
+        post_save.connect(_invalidate, sender=sender, weak=False, dispatch_uid=_get_dispatch_uid(sender))
+        post_delete.connect(_invalidate, sender=sender, weak=False, dispatch_uid=_get_dispatch_uid(sender))
+        _connected_senders.add(sender)
+
+
+def _disconnect_receivers():
+    for sender in _connected_senders:
+        post_save.disconnect(sender=sender, dispatch_uid=_get_dispatch_uid(sender))
+        post_delete.disconnect(sender=sender, dispatch_uid=_get_dispatch_uid(sender))
+    _connected_senders.clear()
+
+
+def enable_foreign_key_cache(max_size=10000, timeout=300):
+    """
+    Start caching foreign key existence checks for the current process, replacing any existing
+    cache, and return the new ForeignKeyCache
+    """
+    global _foreign_key_cache
+    _disconnect_receivers()
+    _foreign_key_cache = ForeignKeyCache(max_size=max_size, timeout=timeout)
+    return _foreign_key_cache
+
+
+def disable_foreign_key_cache():
+    global _foreign_key_cache
+    _foreign_key_cache = None
+    _disconnect_receivers()
+
+
+def get_foreign_key_cache():
+    """
+    Return the active ForeignKeyCache, or None if caching is not enabled
+    """
+    return _foreign_key_cache
@@ -0,0 +1,201 @@
+from __future__ import unicode_literals
+
+import datetime
+from decimal import Decimal
+
+
+def _is_child_list(value):
+    return isinstance(value, list) and all(isinstance(item, dict) for item in value)
+
+
+def _is_value_list(value):
+    return isinstance(value, list) and not any(isinstance(item, (dict, list)) for item in value)
+
+
+def values_identical(a, b):
+    """
+    Test whether two values from serialized data are the same, including their type - so that
+    (for example) True and 1, or Decimal('1.0') and Decimal('1.00'), are considered different.
+    """
+    if type(a) is not type(b):
+        return False
+    elif isinstance(a, dict):
+        return len(a) == len(b) and all(key in b and values_identical(value, b[key]) for key, value in a.items())
+    elif isinstance(a, list):
+        return len(a) == len(b) and all(values_identical(x, y) for x, y in zip(a, b))
+    elif isinstance(a, Decimal):
+        return str(a) == str(b)
+    elif isinstance(a, (datetime.datetime, datetime.time)):
+        return a.isoformat() == b.isoformat()
+    elif isinstance(a, float) and a != a:
+        # NaN
+        return b != b
+    else:
+        return a == b
+
+
+def _diff_children(old_children, new_children):
+    # match up children with the same pk, and children without a pk by position
+    old_indexes_by_pk = {}
+    old_unkeyed_indexes = []
+    for i, child in enumerate(old_children):
+        pk = child.get('pk')
+        if pk is None or pk in old_indexes_by_pk:
+            old_unkeyed_indexes.append(i)
+        else:
+            old_indexes_by_pk[pk] = i
+
+    old_unkeyed_indexes.reverse()
+    matched_old_indexes = []
+    changed = []
+    inserted = []
+    for new_index, child in enumerate(new_children):
+        pk = child.get('pk')
+        if pk is not None and pk in old_indexes_by_pk:
+            old_index = old_indexes_by_pk.pop(pk)
+        elif pk is None and old_unkeyed_indexes:
+            old_index = old_unkeyed_indexes.pop()
+        else:
+            inserted.append([new_index, child])
+            continue
+
+        matched_old_indexes.append(old_index)
+        child_diff = cluster_diff(old_children[old_index], child)
+        if child_diff:
+            changed.append([old_index, child_diff])
+
+    diff = {}
+    removed = sorted(set(range(len(old_children))) - set(matched_old_indexes))
+    if removed:
+        diff['removed'] = removed
+    if changed:
+        diff['changed'] = sorted(changed, key=lambda item: item[0])
+    if inserted:
+        diff['inserted'] = inserted
+    if matched_old_indexes != sorted(matched_old_indexes):
+        diff['order'] = matched_old_indexes
+    return diff
+
+
+def _diff_values(old_values, new_values):
+    old_set = set(old_values)
+    new_set = set(new_values)
+    diff = {}
+
+    added = [value for value in new_values if value not in old_set]
+    if added:
+        diff['added'] = added
+    removed = [value for value in old_values if value not in new_set]
+    if removed:
+        diff['removed'] = removed
+
+    if not values_identical(_patch_values(old_values, diff), new_values):
+        diff['order'] = new_values
+    return diff
+
+
+def cluster_diff(old_data, new_data):
+    """
+    Compare two serialized clusters (as returned by serializable_data) and return a description of
+    the changes between them, which can be applied to old_data with cluster_patch to give new_data.
+    Children within each child relation are matched up by pk (or by position, for children with no
+    pk) and compared recursively, so that a change to one field of one child produces a
+    correspondingly small diff. The result is a dict with some or all of the keys:
+
+    'fields' - a dict of field values that have been added or changed
+    'removed_fields' - a list of names of fields that no longer exist
+    'relations' - a dict, keyed by relation name, of child relation changes, each consisting of:
+        'removed' - a list of the positions of removed children in the old list
+        'changed' - a list of [old position, diff] pairs for changed children
+        'inserted' - a list of [new position, child data] pairs for added children
+        'order' - the old positions of the remaining children in their new order, if this has changed
+    'm2m' - a dict, keyed by relation name, of changes to lists of values such as
+        many-to-many pks, each consisting of 'added' / 'removed' lists of values, and
+        the complete new list as 'order' if the result would otherwise be ordered differently
+
+    An empty dict means that there are no changes. Diffs consist of the same types of value as
+    the serialized data, and can be stored as JSON in the same way.
+    """
+    diff = {}
+    fields = {}
+    relations = {}
+    value_lists = {}
+
+    for key, new_value in new_data.items():
+        try:
+            old_value = old_data[key]
+        except KeyError:
+            fields[key] = new_value
+            continue
+
+        if values_identical(old_value, new_value):
+            continue
+
+        if _is_child_list(old_value) and _is_child_list(new_value) and \
+                not (_is_value_list(old_value) and _is_value_list(new_value)):
+            relations[key] = _diff_children(old_value, new_value)
+        elif _is_value_list(old_value) and _is_value_list(new_value):
+            value_lists[key] = _diff_values(old_value, new_value)
+        else:
+            fields[key] = new_value
+
+    if fields:
+        diff['fields'] = fields
+    removed_fields = [key for key in old_data if key not in new_data]
+    if removed_fields:
+        diff['removed_fields'] = removed_fields
+    if relations:
+        diff['relations'] = relations
+    if value_lists:
+        diff['m2m'] = value_lists
+    return diff
+
+
+def _patch_children(old_children, diff):
+    removed = set(diff.get('removed', ()))
+    changes = dict((old_index, child_diff) for old_index, child_diff in diff.get('changed', ()))
+
+    try:
+        old_indexes = diff['order']
+    except KeyError:
+        old_indexes = [i for i in range(len(old_children)) if i not in removed]
+
+    children = []
+    for old_index in old_indexes:
+        child = old_children[old_index]
+        if old_index in changes:
+            child = cluster_patch(child, changes[old_index])
+        children.append(child)
+
+    for new_index, child in diff.get('inserted', ()):
+        children.insert(new_index, child)
+    return children
+
+
+def _patch_values(old_values, diff):
+    try:
+        return list(diff['order'])
+    except KeyError:
+        pass
+
+    removed = set(diff.get('removed', ()))
+    return [value for value in old_values if value not in removed] + list(diff.get('added', ()))
+
+
+def cluster_patch(data, diff):
+    """
+    Apply a diff returned by cluster_diff to serialized cluster data, and return the result. data is
+    not modified, but the result may share unchanged child objects with it.
+    """
+    if not diff:
+        return data
+
+    result = dict(data)
+    for key in diff.get('removed_fields', ()):
+        del result[key]
+    result.update(diff.get('fields', {}))
+    for key, relation_diff in diff.get('relations', {}).items():
+        result[key] = _patch_children(data.get(key) or [], relation_diff)
+    for key, values_diff in diff.get('m2m', {}).items():
+        result[key] = _patch_values(data.get(key) or [], values_diff)
+    return result
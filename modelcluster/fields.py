@@ -2,7 +2,8 @@ from __future__ import unicode_literals
 
 import django
 from django.core import checks
-from django.db import IntegrityError, router
+from django.db import IntegrityError, connections, router
+from django.db.models import Model
 from django.db.models.fields.related import ForeignKey, ManyToManyField
 from django.utils.functional import cached_property
 
@@ -14,10 +15,116 @@ except ImportError:
         ReverseManyRelatedObjectsDescriptor as ManyToManyDescriptor
 
 
-from modelcluster.utils import sort_by_fields
+from modelcluster.bulk import commit_child_objects, commit_pending_child_objects, run_after_execute, \
+    use_bulk_commit
+from modelcluster.utils import ObjectListIndex, PendingChanges, chunked, get_batch_size
 
 from modelcluster.queryset import FakeQuerySet
-from modelcluster.models import ClusterableModel
+from modelcluster.models import ClusterableModel, discard_deferred_relation, get_changed_fields, \
+    get_partial_update_fields, has_deferred_relation, invalidate_serializable_data, materialize_relation, \
+    record_original_values
+
+
+def get_object_list_index(instance, relation_name, items, ordering=None):
+    """
+    Return the ObjectListIndex for items, the in-memory object list of the relation relation_name
+    on instance (whose objects are sorted by ordering), creating it if it does not exist or the
+    list has been changed behind its back
+    """
+    try:
+        indexes = instance._cluster_related_object_indexes
+    except AttributeError:
+        indexes = instance._cluster_related_object_indexes = {}
+
+    index = indexes.get(relation_name)
+    if index is None or not index.is_valid_for(items):
+        index = indexes[relation_name] = ObjectListIndex(items, ordering)
+    return index
+
+
+def has_uncommitted_relations(instance):
+    """
+    Return whether instance has child relations with changes that saving it would commit
+    """
+    if getattr(instance, '_cluster_related_objects', None) or getattr(instance, '_cluster_deferred_relations', None):
+        return True
+    return any(
+        pending_changes.added or pending_changes.removed_pks
+        for pending_changes in getattr(instance, '_cluster_pending_changes', {}).values()
+    )
+
+
+def get_pending_changes(instance, relation_name):
+    """
+    Return the PendingChanges recorded for the relation relation_name on instance, or None if the
+    relation is not in pending mode (see DeferringRelatedManager.defer_loading)
+    """
+    try:
+        return instance._cluster_pending_changes[relation_name]
+    except (AttributeError, KeyError):
+        return None
+
+
+def discard_pending_changes(instance, relation_name):
+    """
+    Remove and return the PendingChanges recorded for the relation relation_name on instance, if any
+    """
+    try:
+        return instance._cluster_pending_changes.pop(relation_name, None)
+    except AttributeError:
+        return None
+
+
+class SnapshottingQuerySetMixin(object):
+    """
+    Queryset mixin that records the field values of the objects the queryset loads (see
+    record_original_values), so that commit can tell which of them have been changed
+    """
+    def iterator(self):
+        for obj in super(SnapshottingQuerySetMixin, self).iterator():
+            if isinstance(obj, Model):
+                record_original_values(obj)
+            yield obj
+
+    def __reduce__(self):
+        # pickle as the original queryset class, as this one is created on the fly
+        return (unpickle_queryset, (self._snapshotted_queryset_class, self.__getstate__()))
+
+
+def unpickle_queryset(queryset_class, state):
+    queryset = queryset_class.__new__(queryset_class)
+    queryset.__setstate__(state)
+    return queryset
+
+
+_snapshotting_queryset_classes = {}
+
+
+def snapshot_queryset(queryset):
+    """
+    Make queryset record the field values of the objects it loads, unless they have already been
+    loaded (as for prefetched querysets, whose objects are recorded by get_prefetch_queryset)
+    """
+    if queryset._result_cache is not None:
+        return queryset
+
+    queryset_class = type(queryset)
+    try:
+        snapshotting_class = _snapshotting_queryset_classes[queryset_class]
+    except KeyError:
+        snapshotting_class = _snapshotting_queryset_classes[queryset_class] = type(
+            str('Snapshotting%s' % queryset_class.__name__), (SnapshottingQuerySetMixin, queryset_class),
+            {'_snapshotted_queryset_class': queryset_class}
+        )
+    queryset.__class__ = snapshotting_class
+    return queryset
+
+
+def discard_object_list_index(instance, relation_name):
+    try:
+        del instance._cluster_related_object_indexes[relation_name]
+    except (AttributeError, KeyError):
+        pass
 
 
 def create_deferring_foreign_related_manager(related, original_manager_cls):
@@ -46,19 +153,24 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
 
         def get_live_queryset(self):
             """
-            return the original manager's queryset, which reflects the live database
+            return the original manager's queryset, which reflects the live database. The field
+            values of the objects it loads are recorded, so that changes to them can be detected
             """
-            return original_manager_cls(self.instance).get_queryset()
+            return snapshot_queryset(original_manager_cls(self.instance).get_queryset())
 
         def get_queryset(self):
             """
             return the current object set with any updates applied,
             wrapped up in a FakeQuerySet if it doesn't match the database state
             """
+            materialize_relation(self.instance, relation_name)
             try:
                 results = self.instance._cluster_related_objects[relation_name]
             except (AttributeError, KeyError):
-                return self.get_live_queryset()
+                if get_pending_changes(self.instance, relation_name) is None:
+                    return self.get_live_queryset()
+                # merge the pending changes with the live object set
+                results = self.get_object_list()
 
             return FakeQuerySet(related.related_model, results)
 
@@ -78,6 +190,7 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
             for rel_obj in qs:
                 instance = instances_dict[rel_obj_attr(rel_obj)]
                 setattr(rel_obj, rel_field.name, instance)
+                record_original_values(rel_obj)
             cache_name = rel_field.related_query_name()
             return qs, rel_obj_attr, instance_attr, False, cache_name
 
@@ -86,8 +199,9 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
             return the mutable list that forms the current in-memory state of
             this relation. If there is no such list (i.e. the manager is returning
             querysets from the live database instead), one is created, populating it
-            with the live database state
+            with the live database state and applying any pending changes
             """
+            materialize_relation(self.instance, relation_name)
             try:
                 cluster_related_objects = self.instance._cluster_related_objects
             except AttributeError:
@@ -97,77 +211,117 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
             try:
                 object_list = cluster_related_objects[relation_name]
             except KeyError:
+                # the live queryset records the field values as loaded, so that commit can skip
+                # unchanged objects
                 object_list = list(self.get_live_queryset())
                 cluster_related_objects[relation_name] = object_list
 
+                pending_changes = discard_pending_changes(self.instance, relation_name)
+                if pending_changes is not None:
+                    pending_changes.apply(object_list, get_object_list_index(
+                        self.instance, relation_name, object_list, rel_model._meta.ordering
+                    ))
+
             return object_list
 
+        def defer_loading(self):
+            """
+            Switch the relation to pending mode, if its object set has not yet been loaded into
+            memory: subsequent calls to add, create and remove are recorded as pending changes,
+            without reading the live object set from the database. Reading the relation merges
+            the pending changes with the live object set (and leaves pending mode), and commit
+            writes just the pending changes, staying in pending mode. This keeps adding objects
+            to a large relation cheap.
+            """
+            if has_deferred_relation(self.instance, relation_name):
+                return
+            if relation_name in getattr(self.instance, '_cluster_related_objects', {}):
+                return
+
+            try:
+                pending_changes = self.instance._cluster_pending_changes
+            except AttributeError:
+                pending_changes = self.instance._cluster_pending_changes = {}
+            pending_changes.setdefault(relation_name, PendingChanges())
+
+        def changed_objects(self):
+            """
+            Return the objects in the stored object set that have uncommitted changes: new
+            objects, and objects whose field values differ from those they were loaded with
+            (from the database or from serialized data), or that were not loaded at all
+            """
+            materialize_relation(self.instance, relation_name)
+            try:
+                items = self.instance._cluster_related_objects[relation_name]
+            except (AttributeError, KeyError):
+                pending_changes = get_pending_changes(self.instance, relation_name)
+                if pending_changes is None:
+                    return []
+                items = pending_changes.added
+
+            return [item for item in items if item.pk is None or get_changed_fields(item) != []]
+
         def add(self, *new_items):
             """
             Add the passed items to the stored object set, but do not commit them
             to the database
             """
-            items = self.get_object_list()
-
-            # Rule for checking whether an item in the list matches one of our targets.
-            # We can't do this with a simple 'in' check due to https://code.djangoproject.com/ticket/18864 -
-            # instead, we consider them to match IF:
-            # - they are exactly the same Python object (by reference), or
-            # - they have a non-null primary key that matches
-            def items_match(item, target):
-                return (item is target) or (item.pk == target.pk and item.pk is not None)
+            invalidate_serializable_data(self.instance, relation_name)
 
             for target in new_items:
-                item_matched = False
-                for i, item in enumerate(items):
-                    if items_match(item, target):
-                        # Replace the matched item with the new one. This ensures that any
-                        # modifications to that item's fields take effect within the recordset -
-                        # i.e. we can perform a virtual UPDATE to an object in the list
-                        # by calling add(updated_object). Which is semantically a bit dubious,
-                        # but it does the job...
-                        items[i] = target
-                        item_matched = True
-                        break
-                if not item_matched:
-                    items.append(target)
-
                 # update the foreign key on the added item to point back to the parent instance
                 setattr(target, related.field.name, self.instance)
 
-            # Sort list
-            if rel_model._meta.ordering and len(items) > 1:
-                sort_by_fields(items, rel_model._meta.ordering)
+            pending_changes = get_pending_changes(self.instance, relation_name)
+            if pending_changes is not None:
+                pending_changes.add(new_items)
+                return
+
+            items = self.get_object_list()
+
+            # An item in the list matches one of our targets if they are exactly the same Python
+            # object (by reference), or have a non-null primary key that matches; the index finds
+            # the match for each target without scanning the list, and replaces the matched item
+            # with the new one. This ensures that any modifications to that item's fields take
+            # effect within the recordset - i.e. we can perform a virtual UPDATE to an object in
+            # the list by calling add(updated_object). Which is semantically a bit dubious,
+            # but it does the job...
+            # Unmatched targets are inserted in the position given by the model's ordering.
+            get_object_list_index(self.instance, relation_name, items, rel_model._meta.ordering).add(new_items)
 
         def remove(self, *items_to_remove):
             """
             Remove the passed items from the stored object set, but do not commit the change
             to the database
             """
-            items = self.get_object_list()
-
-            # Rule for checking whether an item in the list matches one of our targets.
-            # We can't do this with a simple 'in' check due to https://code.djangoproject.com/ticket/18864 -
-            # instead, we consider them to match IF:
-            # - they are exactly the same Python object (by reference), or
-            # - they have a non-null primary key that matches
-            def items_match(item, target):
-                return (item is target) or (item.pk == target.pk and item.pk is not None)
+            invalidate_serializable_data(self.instance, relation_name)
+            pending_changes = get_pending_changes(self.instance, relation_name)
+            if pending_changes is not None:
+                pending_changes.remove(items_to_remove)
+                return
 
-            for target in items_to_remove:
-                # filter items list in place: see http://stackoverflow.com/a/1208792/1853523
-                items[:] = [item for item in items if not items_match(item, target)]
+            items = self.get_object_list()
+            get_object_list_index(self.instance, relation_name, items, rel_model._meta.ordering).remove(items_to_remove)
 
         def create(self, **kwargs):
-            items = self.get_object_list()
+            invalidate_serializable_data(self.instance, relation_name)
             new_item = related.related_model(**kwargs)
-            items.append(new_item)
+            pending_changes = get_pending_changes(self.instance, relation_name)
+            if pending_changes is not None:
+                pending_changes.add([new_item])
+                return new_item
+
+            items = self.get_object_list()
+            get_object_list_index(self.instance, relation_name, items, rel_model._meta.ordering).add([new_item])
             return new_item
 
         def clear(self):
             """
             Clear the stored object set, without affecting the database
             """
+            discard_deferred_relation(self.instance, relation_name)
+            discard_pending_changes(self.instance, relation_name)
+            invalidate_serializable_data(self.instance, relation_name)
             try:
                 cluster_related_objects = self.instance._cluster_related_objects
             except AttributeError:
@@ -175,30 +329,108 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
                 self.instance._cluster_related_objects = cluster_related_objects
 
             cluster_related_objects[relation_name] = []
+            discard_object_list_index(self.instance, relation_name)
 
-        def commit(self):
+        def commit(self, send_signals=None, plan=None):
             """
             Apply any changes made to the stored object set to the database.
             Any objects removed from the initial set will be deleted entirely
             from the database.
+            Changes are written with bulk queries where possible (see modelcluster.bulk); if
+            send_signals is true, or the MODELCLUSTER_COMMIT_SIGNALS setting is true, each object
+            is saved or deleted individually instead, sending the usual model signals.
+            If plan (a modelcluster.bulk.CommitPlan) is given, bulk writes are added to it rather
+            than being issued immediately, and the in-memory object set is only discarded once
+            the plan has been executed successfully.
             """
             if not self.instance.pk:
                 raise IntegrityError("Cannot commit relation %r on an unsaved model" % relation_name)
 
+            materialize_relation(self.instance, relation_name)
             try:
                 final_items = self.instance._cluster_related_objects[relation_name]
             except (AttributeError, KeyError):
-                # _cluster_related_objects entry never created => no changes to make
+                pending_changes = get_pending_changes(self.instance, relation_name)
+                if pending_changes is not None:
+                    self._commit_pending_changes(pending_changes, send_signals, plan)
+                # otherwise, _cluster_related_objects entry never created => no changes to make
                 return
 
             original_manager = original_manager_cls(self.instance)
 
+            if use_bulk_commit(rel_model, send_signals):
+                commit_child_objects(self.instance, rel_field, original_manager.get_queryset(), final_items, plan)
+            else:
+                self._commit_objects(original_manager, final_items)
+
+            def finish():
+                for item in final_items:
+                    record_original_values(item)
+                # purge the _cluster_related_objects entry, so we switch back to live SQL
+                self.instance._cluster_related_objects.pop(relation_name, None)
+                discard_object_list_index(self.instance, relation_name)
+                invalidate_serializable_data(self.instance, relation_name)
+
+            run_after_execute(plan, finish)
+
+        def _commit_pending_changes(self, pending_changes, send_signals, plan):
+            original_manager = original_manager_cls(self.instance)
+            added_items = pending_changes.added
+
+            if use_bulk_commit(rel_model, send_signals):
+                commit_pending_child_objects(
+                    self.instance, rel_field, original_manager.get_queryset(), added_items,
+                    pending_changes.removed_pks, plan
+                )
+            else:
+                live_queryset = original_manager.get_queryset()
+                removed_pks = sorted(pending_changes.removed_pks)
+                batch_size = get_batch_size(connections[live_queryset.db], [rel_model._meta.pk], removed_pks)
+                for batch in chunked(removed_pks, batch_size):
+                    for item in live_queryset.filter(pk__in=batch):
+                        item.delete()
+                self._save_objects(original_manager, added_items)
+
+            def finish():
+                for item in added_items:
+                    record_original_values(item)
+                # stay in pending mode, so that objects can go on being added cheaply
+                self.instance._cluster_pending_changes[relation_name] = PendingChanges()
+                invalidate_serializable_data(self.instance, relation_name)
+
+            run_after_execute(plan, finish)
+
+        def _commit_objects(self, original_manager, final_items):
+            final_pks = set(item.pk for item in final_items if item.pk is not None)
             live_items = list(original_manager.get_queryset())
             for item in live_items:
-                if item not in final_items:
+                if item.pk not in final_pks:
                     item.delete()
 
+            self._save_objects(original_manager, final_items)
+
+        def _save_objects(self, original_manager, final_items):
             for item in final_items:
+                if not has_uncommitted_relations(item):
+                    changed_fields = get_changed_fields(item, from_database=True, include_pre_save=True)
+                    if changed_fields is not None:
+                        # the object is known to match its database row apart from these fields
+                        if changed_fields:
+                            setattr(item, rel_field.name, self.instance)
+                            item.save(update_fields=[field.name for field in changed_fields])
+                        continue
+
+                if not isinstance(item, ClusterableModel):
+                    # leave fields that were not read from serialized data untouched; clusters
+                    # handle this in their own save method
+                    update_fields = get_partial_update_fields(
+                        item, router.db_for_write(type(item), instance=self.instance)
+                    )
+                    if update_fields is not None:
+                        setattr(item, rel_field.name, self.instance)
+                        item.save(update_fields=update_fields)
+                        continue
+
                 if django.VERSION >= (1, 9):
                     # Django 1.9+ bulk updates items by default which assumes
                     # that they have already been saved to the database.
@@ -209,9 +441,6 @@ def create_deferring_foreign_related_manager(related, original_manager_cls):
                 else:
                     original_manager.add(item)
 
-            # purge the _cluster_related_objects entry, so we switch back to live SQL
-            del self.instance._cluster_related_objects[relation_name]
-
     return DeferringRelatedManager
 
 
@@ -322,6 +551,7 @@ def create_deferring_many_related_manager(related, original_manager_cls):
                 return FakeQuerySet(related.related_model, [])
 
         def get_queryset(self):
+            materialize_relation(self.instance, rel_field.name)
             try:
                 results = self.instance._cluster_related_objects[relation_name]
             except (AttributeError, KeyError):
@@ -349,6 +579,7 @@ def create_deferring_many_related_manager(related, original_manager_cls):
             return qs, rel_obj_attr, instance_attr, False, cache_name
 
         def get_object_list(self):
+            materialize_relation(self.instance, rel_field.name)
             try:
                 cluster_related_objects = self.instance._cluster_related_objects
             except AttributeError:
@@ -365,35 +596,20 @@ def create_deferring_many_related_manager(related, original_manager_cls):
 
         def add(self, *new_items):
             items = self.get_object_list()
-
-            def items_match(item, target):
-                return (item is target) or (item.pk == target.pk and item.pk is not None)
-
+            invalidate_serializable_data(self.instance, rel_field.name)
             for target in new_items:
-                item_matched = False
-                for i, item in enumerate(items):
-                    if items_match(item, target):
-                        items[i] = target
-                        item_matched = True
-                        break
-                if not item_matched:
-                    items.append(target)
-
                 setattr(target, related.field.name, self.instance)
 
-            if rel_model._meta.ordering and len(items) > 1:
-                sort_by_fields(items, rel_model._meta.ordering)
+            get_object_list_index(self.instance, relation_name, items, rel_model._meta.ordering).add(new_items)
 
         def remove(self, *items_to_remove):
             items = self.get_object_list()
-
-            def items_match(item, target):
-                return (item is target) or (item.pk == target.pk and item.pk is not None)
-
-            for target in items_to_remove:
-                items[:] = [item for item in items if not items_match(item, target)]
+            invalidate_serializable_data(self.instance, rel_field.name)
+            get_object_list_index(self.instance, relation_name, items, rel_model._meta.ordering).remove(items_to_remove)
 
         def clear(self):
+            discard_deferred_relation(self.instance, rel_field.name)
+            invalidate_serializable_data(self.instance, rel_field.name)
             try:
                 cluster_related_objects = self.instance._cluster_related_objects
             except AttributeError:
@@ -401,17 +617,25 @@ def create_deferring_many_related_manager(related, original_manager_cls):
                 self.instance._cluster_related_objects = cluster_related_objects
 
             cluster_related_objects[relation_name] = []
+            discard_object_list_index(self.instance, relation_name)
 
         def create(self, **kwargs):
             items = self.get_object_list()
+            invalidate_serializable_data(self.instance, rel_field.name)
             new_item = related.related_model(**kwargs)
-            items.append(new_item)
+            get_object_list_index(self.instance, relation_name, items, rel_model._meta.ordering).add([new_item])
             return new_item
 
-        def commit(self):
+        def commit(self, plan=None):
+            """
+            Apply any changes made to the stored object set to the database. If plan (a
+            modelcluster.bulk.CommitPlan) is given, the in-memory object set is only discarded
+            once the plan has been executed successfully.
+            """
             if not self.instance.pk:
                 raise IntegrityError("Cannot commit relation %r on an unsaved model" % relation_name)
 
+            materialize_relation(self.instance, rel_field.name)
             try:
                 final_items = self.instance._cluster_related_objects[relation_name]
             except (AttributeError, KeyError):
@@ -440,7 +664,12 @@ def create_deferring_many_related_manager(related, original_manager_cls):
                 item.save()
                 original_manager.add(item)
 
-            del self.instance._cluster_related_objects[relation_name]
+            def finish():
+                self.instance._cluster_related_objects.pop(relation_name, None)
+                discard_object_list_index(self.instance, relation_name)
+                invalidate_serializable_data(self.instance, rel_field.name)
+
+            run_after_execute(plan, finish)
 
     return DeferringManyRelatedManager
 
@@ -0,0 +1,152 @@
+"""
+A registry of JSON encoder / decoder backends for to_json and from_json. The backend is chosen
+by the json_backend argument of those methods, or the MODELCLUSTER_JSON_BACKEND setting, and
+defaults to the standard library json module with DjangoJSONEncoder. Backends built on other
+JSON libraries convert the types that DjangoJSONEncoder handles specially to the same
+representation, so that their output decodes to the same data. If the selected backend's
+library is not installed, the standard library backend is used instead, and a warning is logged
+to the 'modelcluster' logger; get_json_backend(name, strict=True) raises ImproperlyConfigured
+instead.
+"""
+from __future__ import unicode_literals
+
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.encoding import force_text
+from django.utils.functional import Promise
+
+
+logger = logging.getLogger('modelcluster')
+
+
+class JSONBackend(object):
+    """
+    Base class for JSON backends. Subclasses implement dumps and loads, and can pass convert to
+    their JSON library as the function for encoding values that it does not handle itself.
+    """
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def __init__(self):
+        self.django_encoder = DjangoJSONEncoder()
+
+    def convert(self, value):
+        """
+        Return the DjangoJSONEncoder representation of a value that is not natively JSON
+        serializable
+        """
+        if isinstance(value, Promise):
+            # lazy translation strings
+            return force_text(value)
+        return self.django_encoder.default(value)
+
+    def dumps(self, data):
+        raise NotImplementedError
+
+    def loads(self, json_data):
+        raise NotImplementedError
+
+
+class StandardJSONBackend(JSONBackend):
+    """
+    The standard library json module, with DjangoJSONEncoder
+    """
+    def dumps(self, data):
+        return json.dumps(data, cls=DjangoJSONEncoder)
+
+    def loads(self, json_data):
+        return json.loads(json_data)
+
+
+class OrjsonBackend(JSONBackend):
+    """
+    orjson (https://github.com/ijl/orjson), version 3.1 or later. The data is passed to orjson as it is, with convert
+    as its default function, so that only the values orjson can't encode itself are handled in
+    Python: decimals, lazy strings, and dates and times, which orjson formats with different
+    precision to DjangoJSONEncoder and so are passed through to convert. orjson encodes UUIDs in
+    the same way as DjangoJSONEncoder.
+    """
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import orjson
+        except ImportError:
+            return False
+        # OPT_PASSTHROUGH_DATETIME was added in orjson 3.1
+        return hasattr(orjson, 'OPT_PASSTHROUGH_DATETIME')
+
+    def __init__(self):
+        super(OrjsonBackend, self).__init__()
+        import orjson
+        self.orjson = orjson
+
+    def dumps(self, data):
+        return self.orjson.dumps(
+            data, default=self.convert, option=self.orjson.OPT_PASSTHROUGH_DATETIME
+        ).decode('utf-8')
+
+    def loads(self, json_data):
+        return self.orjson.loads(json_data)
+
+
+_backend_classes = {}
+_backends = {}
+
+
+def register_json_backend(name, backend_class):
+    """
+    Make the JSONBackend subclass backend_class available under the given name
+    """
+    _backend_classes[name] = backend_class
+    _backends.pop(name, None)
+
+
+register_json_backend('json', StandardJSONBackend)
+register_json_backend('orjson', OrjsonBackend)
+
+
+def get_json_backend(name=None, strict=False):
+    """
+    Return the JSONBackend instance registered under name, or the one selected by the
+    MODELCLUSTER_JSON_BACKEND setting if name is None. JSONBackend instances are returned
+    unchanged. ImproperlyConfigured is raised if the backend is unknown. If it is not available,
+    the standard library backend is returned (with a warning logged the first time), unless
+    strict is true, in which case ImproperlyConfigured is raised.
+    """
+    if isinstance(name, JSONBackend):
+        return name
+    if name is None:
+        name = getattr(settings, 'MODELCLUSTER_JSON_BACKEND', 'json')
+
+    try:
+        backend = _backends[name]
+    except KeyError:
+        try:
+            backend_class = _backend_classes[name]
+        except KeyError:
+            raise ImproperlyConfigured("Unknown modelcluster JSON backend: %r" % name)
+
+        if backend_class.is_available():
+            backend = backend_class()
+        else:
+            # recorded as None, so that the warning is only logged once
+            backend = None
+            logger.warning(
+                "The modelcluster JSON backend %r is not available, as its JSON library is not installed; "
+                "using the standard library json module instead", name
+            )
+        _backends[name] = backend
+
+    if backend is None:
+        if strict:
+            raise ImproperlyConfigured(
+                "The modelcluster JSON backend %r is not available; check that its JSON library is installed" % name
+            )
+        return get_json_backend('json')
+    return backend
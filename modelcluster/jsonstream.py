@@ -0,0 +1,154 @@
+from __future__ import unicode_literals
+
+import codecs
+import json
+import re
+
+from django.utils import six
+
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# characters that can continue a number that has been cut off at the end of the buffer
+NUMBER_CONTINUATION = re.compile(r'[0-9.eE+\-]*')
+
+
+def _iter_file_chunks(fp, chunk_size):
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class JSONStreamReader(object):
+    """
+    Incremental reader for a JSON document that arrives as a file-like object or an iterable of
+    string / bytestring chunks. The structure of the document is walked with iter_object and
+    iter_array, and individual values are decoded with read_value, so that only the value
+    currently being read needs to be held in memory.
+    """
+    def __init__(self, source, chunk_size=65536, encoding='utf-8'):
+        if isinstance(source, (six.text_type, six.binary_type)):
+            self._chunks = iter([source])
+        elif hasattr(source, 'read'):
+            self._chunks = _iter_file_chunks(source, chunk_size)
+        else:
+            self._chunks = iter(source)
+
+        self._text_decoder = codecs.getincrementaldecoder(encoding)()
+        self._json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self, min_length=1):
+        """
+        Append at least min_length characters from the source to the buffer, discarding the part
+        of the buffer that has already been consumed. Returns False if the source is exhausted.
+        """
+        text = []
+        length = 0
+        while length < min_length:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                text.append(self._text_decoder.decode(b'', final=True))
+                self.eof = True
+                break
+
+            if isinstance(chunk, six.binary_type):
+                chunk = self._text_decoder.decode(chunk)
+            text.append(chunk)
+            length += len(chunk)
+
+        text = ''.join(text)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return bool(text)
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character of the document (without consuming it),
+        or None at the end of the document
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read_more():
+                return None
+
+    def _expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError("Expecting %r at position %d of buffer, found %r" % (char, self.pos, found))
+        self.pos += 1
+
+    def read_value(self):
+        """
+        Read and decode the complete JSON value at the current position
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                # value is incomplete (or invalid); keep reading until the unconsumed part of the
+                # buffer has doubled in size, so that large values are not re-parsed repeatedly
+                if self.eof or not self._read_more(len(self.buffer) - self.pos):
+                    raise
+                continue
+
+            if not self.eof and NUMBER_CONTINUATION.match(self.buffer, end).end() == len(self.buffer):
+                # the value may continue into the next chunk (e.g. a number split in two)
+                if self._read_more():
+                    continue
+
+            self.pos = end
+            return value
+
+    def iter_object(self):
+        """
+        Iterate over the keys of the JSON object at the current position. After each key is
+        returned, the caller must consume the corresponding value (with read_value, iter_object
+        or iter_array) before requesting the next key.
+        """
+        self._expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+
+        while True:
+            key = self.read_value()
+            if not isinstance(key, six.text_type):
+                raise ValueError("Expecting property name at position %d of buffer" % self.pos)
+            self._expect(':')
+
+            yield key
+
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self._expect('}')
+                return
+
+    def iter_array(self):
+        """
+        Iterate over the elements of the JSON array at the current position, yielding the index
+        of each. The caller must consume each element before requesting the next one.
+        """
+        self._expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+
+        index = 0
+        while True:
+            yield index
+            index += 1
+
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self._expect(']')
+                return
@@ -1,22 +1,48 @@
 from __future__ import unicode_literals
 
-import json
+import collections
+import copy
+import functools
+import hashlib
+import itertools
 import datetime
+import logging
 
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models.fields import Field
 from django.db.models.fields.related import ForeignObjectRel
 from django.db.models.fields import FieldDoesNotExist
+from django.utils import six
 from django.utils.encoding import is_protected_type
 from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
 from django.utils import timezone
 
+from modelcluster import binary
+from modelcluster.cache import get_foreign_key_cache
 from modelcluster.contrib.taggit import ClusterTaggableManager
+from modelcluster.jsonbackends import get_json_backend
+from modelcluster.jsonstream import JSONStreamReader
+from modelcluster.queryset import FakeQuerySet
+from modelcluster.sharing import decode_shared_references, encode_shared_references, has_shared_references
+from modelcluster.utils import chunked, get_batch_size, get_sort_key
 
 
-def get_field_value(field, model):
+logger = logging.getLogger('modelcluster')
+
+
+def get_field_value(field, model, pre_save=True):
+    """
+    Return the serializable value of field on the model instance. If pre_save is false, the
+    value is read with field.value_from_object rather than field.pre_save, so that fields with
+    side effects on saving (such as committing a FileField's file to storage, or updating an
+    auto_now date) are left untouched.
+    """
     if field.rel is None:
-        value = field.pre_save(model, add=model.pk is None)
+        if pre_save:
+            value = field.pre_save(model, add=model.pk is None)
+        else:
+            value = field.value_from_object(model)
 
         # Make datetimes timezone aware
         # https://github.com/django/django/blob/master/django/db/models/fields/__init__.py#L1394-L1403
@@ -35,84 +61,1185 @@ def get_field_value(field, model):
         return getattr(model, field.get_attname())
 
 
-def get_serializable_data_for_fields(model):
-    pk_field = model._meta.pk
-    # If model is a child via multitable inheritance, use parent's pk
-    while pk_field.rel and pk_field.rel.parent_link:
-        pk_field = pk_field.rel.to._meta.pk
+def _method_func(cls, name):
+    # unwrap unbound methods on python 2 so that implementations can be compared by identity
+    method = getattr(cls, name)
+    return getattr(method, '__func__', method)
 
-    obj = {'pk': get_field_value(pk_field, model)}
 
-    for field in model._meta.fields:
-        if field.serialize:
-            obj[field.name] = get_field_value(field, model)
+_BASE_PRE_SAVE = _method_func(Field, 'pre_save')
+_DATE_PRE_SAVES = (
+    _method_func(models.DateField, 'pre_save'),
+    _method_func(models.DateTimeField, 'pre_save'),
+    _method_func(models.TimeField, 'pre_save'),
+)
+_BASE_VALUE_TO_STRING = _method_func(Field, 'value_to_string')
+_BASE_VALUE_FROM_OBJECT = _method_func(Field, 'value_from_object')
 
-    return obj
 
+def has_pre_save_value(field):
+    """
+    Return whether field's pre_save method may give it a new value when an existing object is
+    saved, as for a DateTimeField with auto_now; such fields are always written when the object is
+    written with other changes
+    """
+    pre_save_func = _method_func(type(field), 'pre_save')
+    if pre_save_func in _DATE_PRE_SAVES:
+        return field.auto_now
+    return pre_save_func is not _BASE_PRE_SAVE
 
-def model_from_serializable_data(model, data, check_fks=True, strict_fks=False):
-    pk_field = model._meta.pk
-    # If model is a child via multitable inheritance, use parent's pk
-    while pk_field.rel and pk_field.rel.parent_link:
-        pk_field = pk_field.rel.to._meta.pk
 
-    kwargs = {pk_field.attname: data['pk']}
-    for field_name, field_value in data.items():
-        try:
-            field = model._meta.get_field(field_name)
-        except FieldDoesNotExist:
-            continue
+def _make_field_getter(field, pre_save=True):
+    """
+    Return a function that takes a model instance and returns the serializable value of
+    the given field, equivalent to get_field_value(field, instance, pre_save). Common field types
+    get a specialised getter that skips the generic pre_save / value_to_string dispatch.
+    """
+    attname = field.get_attname()
 
-        # Filter out reverse relations
-        if isinstance(field, ForeignObjectRel):
-            continue
+    if field.rel is not None:
+        return lambda instance: getattr(instance, attname)
 
-        if field.rel and isinstance(field.rel, models.ManyToManyRel):
-            pass
-        elif field.rel and isinstance(field.rel, models.ManyToOneRel):
-            if field_value is None:
-                kwargs[field.attname] = None
+    has_plain_value_from_object = _method_func(type(field), 'value_from_object') is _BASE_VALUE_FROM_OBJECT
+
+    if pre_save:
+        pre_save_func = _method_func(type(field), 'pre_save')
+        if pre_save_func in _DATE_PRE_SAVES:
+            # date fields only do anything special in pre_save if auto_now / auto_now_add are in use
+            has_plain_pre_save = not (field.auto_now or field.auto_now_add)
+        else:
+            has_plain_pre_save = (pre_save_func is _BASE_PRE_SAVE)
+
+        if not has_plain_pre_save:
+            return lambda instance: get_field_value(field, instance)
+    elif not has_plain_value_from_object:
+        return lambda instance: get_field_value(field, instance, pre_save=False)
+
+    # value_to_string is just a text conversion of the attribute here, so text values can be
+    # passed through unchanged
+    has_plain_value_to_string = (
+        _method_func(type(field), 'value_to_string') is _BASE_VALUE_TO_STRING and
+        has_plain_value_from_object
+    )
+
+    if isinstance(field, models.DateTimeField):
+        def get_datetime_value(instance):
+            value = getattr(instance, attname)
+            if isinstance(value, datetime.datetime) and settings.USE_TZ:
+                if timezone.is_naive(value):
+                    default_timezone = timezone.get_default_timezone()
+                    value = timezone.make_aware(value, default_timezone).astimezone(timezone.utc)
+                return timezone.localtime(value, timezone.utc)
+            elif is_protected_type(value):
+                return value
             else:
-                clean_value = field.rel.to._meta.get_field(field.rel.field_name).to_python(field_value)
-                kwargs[field.attname] = clean_value
-                if check_fks:
-                    try:
-                        field.rel.to._default_manager.get(**{field.rel.field_name: clean_value})
-                    except field.rel.to.DoesNotExist:
-                        if field.rel.on_delete == models.DO_NOTHING:
-                            pass
-                        elif field.rel.on_delete == models.CASCADE:
-                            if strict_fks:
-                                return None
-                            else:
-                                kwargs[field.attname] = None
-
-                        elif field.rel.on_delete == models.SET_NULL:
-                            kwargs[field.attname] = None
-
-                        else:
-                            raise Exception("can't currently handle on_delete types other than CASCADE, SET_NULL and DO_NOTHING")
+                return field.value_to_string(instance)
+
+        return get_datetime_value
+
+    def get_value(instance):
+        value = getattr(instance, attname)
+        if is_protected_type(value):
+            return value
+        elif has_plain_value_to_string and type(value) is six.text_type:
+            return value
         else:
-            value = field.to_python(field_value)
+            return field.value_to_string(instance)
+
+    return get_value
+
+
+def _make_value_converter(field):
+    """
+    Return a function that converts a serialized value to the python value for a
+    non-relational field.
+    """
+    if isinstance(field, models.DateTimeField):
+        def convert_datetime(value):
+            value = field.to_python(value)
 
             # Make sure datetimes are converted to localtime
-            if isinstance(field, models.DateTimeField) and settings.USE_TZ and value is not None:
+            if settings.USE_TZ and value is not None:
                 default_timezone = timezone.get_default_timezone()
                 if timezone.is_aware(value):
                     value = timezone.localtime(value, default_timezone)
                 else:
                     value = timezone.make_aware(value, default_timezone)
 
-            kwargs[field.name] = value
+            return value
+
+        return convert_datetime
+
+    return field.to_python
+
+
+class SerializerPlan(object):
+    """
+    Precomputed information for converting instances of a model to and from the
+    JSON-like structure used by serializable_data / from_serializable_data. Plans are
+    built once per model class - use get_serializer_plan to obtain one.
+    """
+    # kinds of keys that can appear in serialized data
+    IGNORED = 0
+    FOREIGN_KEY = 1
+    VALUE = 2
+
+    def __init__(self, model):
+        self.model = model
+        opts = model._meta
+
+        pk_field = opts.pk
+        # If model is a child via multitable inheritance, use parent's pk
+        while pk_field.rel and pk_field.rel.parent_link:
+            pk_field = pk_field.rel.to._meta.pk
+        self.pk_field = pk_field
+        self.pk_attname = pk_field.attname
+        self.get_pk_value = _make_field_getter(pk_field)
+
+        self.field_getters = [
+            (field.name, _make_field_getter(field))
+            for field in opts.fields if field.serialize
+        ]
+        # getters that read attribute values without calling pre_save, other than on the fields
+        # named in the model's serialize_pre_save_fields attribute
+        pre_save_field_names = getattr(model, 'serialize_pre_save_fields', ())
+        self.field_getters_without_pre_save = [
+            (field.name, _make_field_getter(field, pre_save=(field.name in pre_save_field_names)))
+            for field in opts.fields if field.serialize
+        ]
+        # keys of the serialized data, in order, as used for columnar data
+        self.columns = ['pk'] + [field_name for field_name, get_value in self.field_getters]
+
+        # for the fast constructor path: objects can be built from positional args
+        # if every keyword argument is a concrete field's attname
+        self.concrete_fields = opts.concrete_fields
+        self.concrete_attnames = frozenset(field.attname for field in self.concrete_fields)
+        self.concrete_attname_list = [field.attname for field in self.concrete_fields]
+        self.can_construct_from_args = not getattr(model, '_deferred', False)
+        # (name, attname) of the fields that appear in serialized data, for finding the fields
+        # left out of the data an object is built from (see get_skipped_fields)
+        self.serialized_fields = [
+            (field.name, field.attname) for field in self.concrete_fields
+            if field.serialize and not field.primary_key
+        ]
+        # attnames that SkippedFieldDescriptors have been installed for
+        self._tracked_attnames = set()
+
+        # handlers for keys of serialized data, populated as keys are encountered
+        self._key_handlers = {}
+
+    def get_field_getters(self, pre_save=True, selection=None):
+        field_getters = self.field_getters if pre_save else self.field_getters_without_pre_save
+        if selection is not None and not selection.is_everything:
+            field_getters = [
+                (field_name, get_value) for field_name, get_value in field_getters if selection.includes(field_name)
+            ]
+        return field_getters
+
+    def get_columns(self, selection=None):
+        if selection is None or selection.is_everything:
+            return list(self.columns)
+        return [column for column in self.columns if selection.includes(column)]
+
+    def serialize(self, instance, pre_save=True, selection=None):
+        """
+        Return a dict of the serializable field values of instance, equivalent to
+        get_serializable_data_for_fields. If selection (a FieldSelection) is given, only the
+        selected fields are included.
+        """
+        obj = {'pk': self.get_pk_value(instance)}
+
+        for field_name, get_value in self.get_field_getters(pre_save, selection):
+            obj[field_name] = get_value(instance)
+
+        return obj
+
+    def serialize_row(self, instance, pre_save=True, selection=None):
+        """
+        Return a list of the serializable field values of instance, corresponding to
+        self.get_columns(selection)
+        """
+        return [self.get_pk_value(instance)] + [
+            get_value(instance) for field_name, get_value in self.get_field_getters(pre_save, selection)
+        ]
+
+    def get_key_handler(self, key):
+        """
+        Return a (kind, field, converter) tuple describing how the given key of
+        serialized data is to be handled
+        """
+        try:
+            return self._key_handlers[key]
+        except KeyError:
+            pass
+
+        try:
+            field = self.model._meta.get_field(key)
+        except FieldDoesNotExist:
+            handler = (self.IGNORED, None, None)
+        else:
+            if isinstance(field, ForeignObjectRel):
+                # Filter out reverse relations
+                handler = (self.IGNORED, None, None)
+            elif field.rel and isinstance(field.rel, models.ManyToManyRel):
+                handler = (self.IGNORED, None, None)
+            elif field.rel and isinstance(field.rel, models.ManyToOneRel):
+                target_field = field.rel.to._meta.get_field(field.rel.field_name)
+                handler = (self.FOREIGN_KEY, field, target_field.to_python)
+            else:
+                handler = (self.VALUE, field, _make_value_converter(field))
+
+        self._key_handlers[key] = handler
+        return handler
+
+    def get_field_values(self, data):
+        """
+        Convert a dict of serialized data to a dict of field values keyed by attname, suitable
+        for passing to construct. Also returns a list of (field, value) pairs for the non-null
+        foreign keys, to be checked for dangling references.
+        """
+        kwargs = {self.pk_attname: data['pk']}
+        foreign_keys = []
+        for field_name, field_value in data.items():
+            kind, field, convert = self.get_key_handler(field_name)
+
+            if kind == self.FOREIGN_KEY:
+                if field_value is None:
+                    kwargs[field.attname] = None
+                else:
+                    clean_value = convert(field_value)
+                    kwargs[field.attname] = clean_value
+                    foreign_keys.append((field, clean_value))
+            elif kind == self.VALUE:
+                kwargs[field.name] = convert(field_value)
+
+        return kwargs, foreign_keys
+
+    def get_row_field_values(self, handlers, pk_index, row):
+        """
+        Equivalent to get_field_values for one row of columnar data, where handlers is the list of
+        key handlers for the columns and pk_index is the position of the 'pk' column
+        """
+        kwargs = {self.pk_attname: row[pk_index]}
+        foreign_keys = []
+        for (kind, field, convert), field_value in zip(handlers, row):
+            if kind == self.FOREIGN_KEY:
+                if field_value is None:
+                    kwargs[field.attname] = None
+                else:
+                    clean_value = convert(field_value)
+                    kwargs[field.attname] = clean_value
+                    foreign_keys.append((field, clean_value))
+            elif kind == self.VALUE:
+                kwargs[field.name] = convert(field_value)
+
+        return kwargs, foreign_keys
+
+    def construct(self, kwargs, is_saved, selection=None):
+        """
+        Build an instance of the model from a dict of field values, keyed by attname. If
+        selection (a FieldSelection) is given, the fields it leaves out are recorded as skipped
+        (see get_skipped_fields).
+        """
+        model = self.model
+        if self.can_construct_from_args and self.concrete_attnames.issuperset(kwargs):
+            # positional arguments skip the slow keyword-argument handling in Model.__init__
+            args = [
+                kwargs[field.attname] if field.attname in kwargs else field.get_default()
+                for field in self.concrete_fields
+            ]
+            obj = model(*args)
+        else:
+            obj = model(**kwargs)
+
+        if is_saved:
+            # Set state to indicate that this object has come from the database, so that
+            # ModelForm validation doesn't try to enforce a uniqueness check on the primary key
+            obj._state.adding = False
+            record_original_values(obj, from_database=False)
+            if selection is not None and not selection.is_everything:
+                skipped_fields = [
+                    (name, attname) for name, attname in self.serialized_fields if not selection.includes(name)
+                ]
+                if skipped_fields:
+                    self.track_assignments(skipped_fields)
+                    obj._cluster_skipped_fields = frozenset(name for name, attname in skipped_fields)
+
+        return obj
+
+    def track_assignments(self, fields):
+        """
+        Install SkippedFieldDescriptors on the model for the given (name, attname) pairs, so that
+        assigning to a skipped field clears its mark
+        """
+        for name, attname in fields:
+            if attname in self._tracked_attnames:
+                continue
+            self._tracked_attnames.add(attname)
+            # attributes that already have a descriptor (such as deferred fields) are left alone;
+            # get_skipped_fields notices changes to their values instead
+            if not any(attname in vars(cls) for cls in self.model.__mro__):
+                setattr(self.model, attname, SkippedFieldDescriptor(name, attname))
+
+
+class SkippedFieldDescriptor(object):
+    """
+    Holds the value of a field in the instance dict, as a plain attribute would, and clears the
+    field's skipped mark (see get_skipped_fields) whenever it is assigned to
+    """
+    def __init__(self, field_name, attname):
+        self.field_name = field_name
+        self.attname = attname
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        try:
+            return instance.__dict__[self.attname]
+        except KeyError:
+            raise AttributeError(self.attname)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.attname] = value
+        skipped_fields = instance.__dict__.get('_cluster_skipped_fields')
+        if skipped_fields and self.field_name in skipped_fields:
+            instance._cluster_skipped_fields = skipped_fields.difference([self.field_name])
+
+
+class FieldSelection(object):
+    """
+    A selection of the fields and child relations of a cluster to serialize or deserialize,
+    given as lists of names to include and / or exclude. Names can be dotted paths into child
+    relations, such as 'menu_items.price'; including a path into a relation implies including
+    the relation itself. pk values are always included.
+    """
+    def __init__(self, include=None, exclude=None):
+        self.include = self.parse_paths(include)
+        self.exclude = self.parse_paths(exclude)
+        self.is_everything = self.include is None and not self.exclude
+
+    @staticmethod
+    def parse_paths(paths):
+        """
+        Convert a list of dotted paths into a tree of dicts, where a value of None means that
+        the whole of that field or relation is selected. Trees are returned unchanged.
+        """
+        if paths is None or isinstance(paths, dict):
+            return paths
+
+        tree = {}
+        for path in paths:
+            node = tree
+            names = path.split('.')
+            for name in names[:-1]:
+                if name in node and node[name] is None:
+                    # the whole relation is already selected
+                    break
+                node = node.setdefault(name, {})
+            else:
+                node[names[-1]] = None
+        return tree
+
+    def includes(self, name):
+        if name == 'pk':
+            return True
+        if self.include is not None and name not in self.include:
+            return False
+        return not (self.exclude and name in self.exclude and self.exclude[name] is None)
+
+    def child(self, name):
+        """
+        Return the FieldSelection that applies to the objects of the child relation `name`
+        """
+        return FieldSelection(
+            None if self.include is None else self.include.get(name),
+            self.exclude.get(name) if self.exclude else None
+        )
+
+    def filter_data(self, model, data):
+        """
+        Return a copy of the serialized data for an instance of model, containing only the
+        selected fields and relations
+        """
+        if self.is_everything:
+            return data
+
+        if hasattr(model, 'from_serializable_data'):
+            relations = dict((rel.get_accessor_name(), rel) for rel in get_all_child_relations(model))
+        else:
+            relations = {}
+
+        result = {}
+        for key, value in data.items():
+            if not self.includes(key):
+                continue
+            rel = relations.get(key)
+            if rel is not None and not rel.many_to_many and value is not None:
+                value = self.child(key).filter_child_data(rel.related_model, value)
+            result[key] = value
+        return result
+
+    def filter_child_data(self, model, child_data_list):
+        """
+        Return a copy of the serialized data for a child relation of objects of type model
+        (in either list or columnar form), containing only the selected fields and relations
+        """
+        if self.is_everything:
+            return child_data_list
+
+        if is_columnar_data(child_data_list) and not hasattr(model, 'from_serializable_data'):
+            indexes = [i for i, column in enumerate(child_data_list['columns']) if self.includes(column)]
+            return {
+                'columns': [child_data_list['columns'][i] for i in indexes],
+                'rows': [[row[i] for i in indexes] for row in child_data_list['rows']],
+            }
+
+        return [self.filter_data(model, child_data) for child_data in iter_child_data(child_data_list)]
+
+
+def get_serializer_plan(model):
+    """
+    Return the SerializerPlan for the given model class (or instance)
+    """
+    try:
+        return model._meta._serializer_plan_cache
+    except AttributeError:
+        plan = SerializerPlan(model._meta.model)
+        model._meta._serializer_plan_cache = plan
+        return plan
+
+
+def get_serializable_data_for_fields(model, pre_save=True):
+    return get_serializer_plan(model).serialize(model, pre_save=pre_save)
+
+
+def get_field_snapshot(instance):
+    """
+    Return a list of the current attribute values of instance's concrete fields, for detecting
+    whether any fields have been changed since serializable data was last generated. Values
+    that may be changed in place, such as the FieldFile of a FileField, are recorded in their
+    string form (as given by value_to_string) instead.
+    """
+    instance_dict = instance.__dict__
+    plan = get_serializer_plan(instance)
+    snapshot = []
+    for field, attname in zip(plan.concrete_fields, plan.concrete_attname_list):
+        value = instance_dict.get(attname)
+        if not (is_protected_type(value) or isinstance(value, (six.text_type, six.binary_type))):
+            value = (type(value), field.value_to_string(instance))
+        snapshot.append(value)
+    return snapshot
+
+
+def record_original_values(instance, from_database=True):
+    """
+    Record the current field values of instance as its original values, for get_changed_fields
+    to detect changes against. from_database indicates whether they are known to match the
+    database row, as opposed to having been read from serialized data such as a revision.
+    """
+    instance._cluster_original_values = (get_field_snapshot(instance), from_database)
+
+
+def get_changed_fields(instance, from_database=False, include_pre_save=False):
+    """
+    Return the list of concrete fields (other than the pk) of instance whose values have changed
+    since record_original_values was called, or None if there are no original values to compare
+    against (or, if from_database is true, none that are known to match the database).
+    If include_pre_save is true and any fields have changed, fields that get a new value from
+    their pre_save method (see has_pre_save_value) are included too, for writing the changes.
+    """
+    try:
+        original_values, original_from_database = instance._cluster_original_values
+    except AttributeError:
+        return None
+    if from_database and not original_from_database:
+        return None
+
+    fields = get_serializer_plan(instance).concrete_fields
+    changed_fields = [
+        field for field, original_value, value in zip(fields, original_values, get_field_snapshot(instance))
+        if original_value != value and not field.primary_key
+    ]
+    if changed_fields and include_pre_save:
+        changed_fields = [
+            field for field in fields
+            if field in changed_fields or (has_pre_save_value(field) and not field.primary_key)
+        ]
+    return changed_fields
+
+
+def get_skipped_fields(instance):
+    """
+    Return the set of names of the fields of instance that were left out of the serialized data
+    it was built from by the include / exclude arguments of from_serializable_data, and have not
+    been assigned to since. These hold default values rather than the values in the database,
+    and are left untouched when the object is saved.
+    """
+    skipped_fields = getattr(instance, '_cluster_skipped_fields', None)
+    if not skipped_fields:
+        return frozenset()
+    changed_fields = get_changed_fields(instance)
+    if changed_fields:
+        skipped_fields = skipped_fields.difference(field.name for field in changed_fields)
+    return skipped_fields
+
+
+def get_partial_update_fields(instance, using):
+    """
+    Return the update_fields to save instance with so that its skipped fields (see
+    get_skipped_fields) are left untouched, or None if it can be saved in full, as no fields were
+    skipped or it does not yet exist in the database.
+    """
+    skipped_fields = get_skipped_fields(instance)
+    if not skipped_fields:
+        return None
+    # objects built from serialized data have the pk of the base model in multi-table inheritance
+    pk_attname = get_serializer_plan(instance).pk_attname
+    pk = getattr(instance, pk_attname)
+    if pk is None or not type(instance)._base_manager.using(using).filter(**{pk_attname: pk}).exists():
+        return None
+    return [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in skipped_fields
+    ]
+
+
+def copy_serializable_data(data):
+    """
+    Return a copy of serializable data, copying dicts and lists but sharing the (immutable)
+    values within them
+    """
+    # copied with an explicit stack, so that deeply nested data does not hit the recursion limit
+    result = [data]
+    stack = [(result, 0)]
+    while stack:
+        container, key = stack.pop()
+        value = container[key]
+        if isinstance(value, dict):
+            value = container[key] = dict(value)
+            stack.extend((value, child_key) for child_key in value)
+        elif isinstance(value, list):
+            value = container[key] = list(value)
+            stack.extend((value, index) for index in range(len(value)))
+    return result[0]
+
+
+def invalidate_serializable_data(instance, relation_name=None):
+    """
+    Discard the memoized serializable data for the child relation relation_name of instance, or
+    for the whole of instance if relation_name is None. This is called by the relation's manager
+    when it is modified or committed; code that writes a relation's rows other than through its
+    manager (for example with ChildModel.objects.create or queryset.update) must call it for
+    serializable_data to see the new rows.
+    """
+    if relation_name is None:
+        try:
+            del instance._serializable_data_memo
+        except AttributeError:
+            pass
+        return
+    for state in getattr(instance, '_serializable_data_memo', {}).values():
+        state['relations'].pop(relation_name, None)
+
+
+def get_dangling_foreign_keys(foreign_keys, resolver, strict_fks=False):
+    """
+    Given a list of (field, value) pairs for the foreign keys of an object, check whether the
+    referenced objects exist, and return the list of fields that must be set to None
+    according to their 'on_delete' setting - or None if the object itself must be dropped
+    (which happens for dangling keys with on_delete=CASCADE when strict_fks is true).
+    """
+    dangling_fields = []
+    for field, value in foreign_keys:
+        if not resolver.foreign_key_exists(field, value):
+            if field.rel.on_delete == models.DO_NOTHING:
+                pass
+            elif field.rel.on_delete == models.CASCADE:
+                if strict_fks:
+                    return None
+                else:
+                    dangling_fields.append(field)
+
+            elif field.rel.on_delete == models.SET_NULL:
+                dangling_fields.append(field)
+
+            else:
+                raise Exception("can't currently handle on_delete types other than CASCADE, SET_NULL and DO_NOTHING")
+
+    return dangling_fields
+
+
+def _construct_checked(plan, kwargs, foreign_keys, is_saved, check_fks, strict_fks, resolver, selection=None):
+    if check_fks and foreign_keys:
+        dangling_fields = get_dangling_foreign_keys(foreign_keys, resolver or ReferenceResolver(), strict_fks)
+        if dangling_fields is None:
+            return None
+        for field in dangling_fields:
+            kwargs[field.attname] = None
+
+    return plan.construct(kwargs, is_saved=is_saved, selection=selection)
+
+
+def model_from_serializable_data(model, data, check_fks=True, strict_fks=False, resolver=None, selection=None):
+    """
+    Build an instance of model from the dict of field values passed in. If check_fks is true,
+    dangling foreign keys are dealt with according to their 'on_delete' setting; the existence
+    checks are made through resolver (a ReferenceResolver), if one is passed, so that they can be
+    batched with those of other objects. selection is the FieldSelection that data was read
+    with, if any.
+    """
+    plan = get_serializer_plan(model)
+    kwargs, foreign_keys = plan.get_field_values(data)
+    return _construct_checked(
+        plan, kwargs, foreign_keys, data['pk'] is not None, check_fks, strict_fks, resolver, selection
+    )
+
+
+def is_columnar_data(child_data):
+    """
+    Return whether the serialized data for a child relation is in columnar form: a dict of
+    'columns' (a list of field names) and 'rows' (a list of lists of values), rather than
+    a list of dicts.
+    """
+    return isinstance(child_data, dict)
+
+
+def iter_child_data(child_data):
+    """
+    Iterate over the serialized data for a child relation, in either list or columnar form,
+    returning a dict for each child
+    """
+    if is_columnar_data(child_data):
+        columns = child_data['columns']
+        for row in child_data['rows']:
+            yield dict(zip(columns, row))
+    else:
+        for item in child_data:
+            yield item
+
+
+def models_from_serializable_data(model, child_data, check_fks=True, strict_fks=False, resolver=None,
+                                  selection=None):
+    """
+    Build a list of instances of model from the serialized data for a child relation, in either
+    list or columnar form. Objects dropped due to dangling foreign keys are returned as None.
+    """
+    if not is_columnar_data(child_data):
+        return [
+            model_from_serializable_data(
+                model, data, check_fks=check_fks, strict_fks=strict_fks, resolver=resolver, selection=selection
+            )
+            for data in child_data
+        ]
+
+    plan = get_serializer_plan(model)
+    columns = child_data['columns']
+    handlers = [plan.get_key_handler(column) for column in columns]
+    pk_index = columns.index('pk')
+
+    children = []
+    for row in child_data['rows']:
+        kwargs, foreign_keys = plan.get_row_field_values(handlers, pk_index, row)
+        children.append(_construct_checked(
+            plan, kwargs, foreign_keys, row[pk_index] is not None, check_fks, strict_fks, resolver, selection
+        ))
+    return children
+
+
+def _copy_instance(obj):
+    plan = get_serializer_plan(type(obj))
+    clone = plan.construct(
+        dict((field.attname, getattr(obj, field.attname)) for field in plan.concrete_fields), is_saved=True
+    )
+    clone._state.db = obj._state.db
+    return clone
+
+
+class ReferenceResolver(object):
+    """
+    Checks the existence of objects referenced by foreign keys in serialized data. Values are
+    gathered up front (with add_foreign_key, or collect to walk a whole cluster) and then
+    looked up with one query per target model, rather than one query per foreign key.
+    """
+    def __init__(self, using=None):
+        self.using = using
+        # (target model, target field name) => set of values still to be looked up
+        self._pending = {}
+        # (target model, target field name) => set of values known to exist
+        self._existing = {}
+        # (target model, target field name) => set of values that have been looked up
+        self._resolved = {}
+        # model => set of pks of objects still to be fetched for many-to-many relations
+        self._pending_objects = {}
+        # model => dict of pk => (position in query results, object) for fetched objects
+        self._objects = {}
+        # model => set of pks that have been fetched
+        self._fetched = {}
+
+    def add_foreign_key(self, field, value):
+        """
+        Record that the value of the foreign key field `field` will need to be checked
+        """
+        key = (field.rel.to, field.rel.field_name)
+        if value not in self._resolved.get(key, ()):
+            self._pending.setdefault(key, set()).add(value)
+
+    def add_related_objects(self, model, values):
+        """
+        Record that the objects of type model with the given pks will be needed for a
+        many-to-many relation
+        """
+        to_python = model._meta.pk.to_python
+        fetched = self._fetched.get(model, ())
+        pending = self._pending_objects.setdefault(model, set())
+        for value in values:
+            value = to_python(value)
+            if value not in fetched:
+                pending.add(value)
+
+    def collect(self, model, data, recursive=True, foreign_keys=True, many_to_many=False):
+        """
+        Record the foreign keys in the serialized data for model, including those of
+        child objects if model is a ClusterableModel and recursive is true. If many_to_many is
+        true, the pks of objects referenced by many-to-many relations are also recorded, so that
+        they can be fetched along with those of other clusters.
+        """
+        # nested clusters are walked with an explicit stack rather than recursively
+        stack = [(model, data)]
+        while stack:
+            model, data = stack.pop()
+            if foreign_keys:
+                plan = get_serializer_plan(model)
+                for field_name, field_value in data.items():
+                    kind, field, convert = plan.get_key_handler(field_name)
+                    if kind == SerializerPlan.FOREIGN_KEY and field_value is not None:
+                        self.add_foreign_key(field, convert(field_value))
+
+            if not (recursive and hasattr(model, 'from_serializable_data')):
+                continue
+
+            for rel in get_all_child_relations(model):
+                child_data_list = data.get(rel.get_accessor_name()) or ()
+                if rel.many_to_many:
+                    if many_to_many:
+                        self.add_related_objects(rel.related_model, child_data_list)
+                elif is_columnar_data(child_data_list) and not hasattr(rel.related_model, 'from_serializable_data'):
+                    if foreign_keys:
+                        self.collect_rows(rel.related_model, child_data_list)
+                else:
+                    stack.extend((rel.related_model, child_data) for child_data in iter_child_data(child_data_list))
+
+    def collect_children(self, model, child_data_list, recursive=True, foreign_keys=True, many_to_many=False):
+        """
+        Record the foreign keys in the serialized data for a child relation (in either list
+        or columnar form) of objects of type model
+        """
+        if is_columnar_data(child_data_list) and not hasattr(model, 'from_serializable_data'):
+            if foreign_keys:
+                self.collect_rows(model, child_data_list)
+        else:
+            for child_data in iter_child_data(child_data_list):
+                self.collect(
+                    model, child_data, recursive=recursive, foreign_keys=foreign_keys, many_to_many=many_to_many
+                )
+
+    def collect_rows(self, model, child_data):
+        """
+        Record the foreign keys in columnar serialized data for model
+        """
+        plan = get_serializer_plan(model)
+        for i, column in enumerate(child_data['columns']):
+            kind, field, convert = plan.get_key_handler(column)
+            if kind == SerializerPlan.FOREIGN_KEY:
+                for row in child_data['rows']:
+                    if row[i] is not None:
+                        self.add_foreign_key(field, convert(row[i]))
+
+    def resolve(self):
+        """
+        Look up all pending foreign key values, with one query per target model (or more,
+        if there are too many values to pass to the database in one go)
+        """
+        cache = get_foreign_key_cache()
+
+        for (target_model, field_name), values in self._pending.items():
+            existing = self._existing.setdefault((target_model, field_name), set())
+            connection = connections[self.using or router.db_for_read(target_model)]
+            self._resolved.setdefault((target_model, field_name), set()).update(values)
+
+            if cache is not None:
+                uncached_values = []
+                for value in values:
+                    exists = cache.get(connection.alias, target_model, field_name, value)
+                    if exists is None:
+                        uncached_values.append(value)
+                    elif exists:
+                        existing.add(value)
+                values = uncached_values
+            else:
+                values = list(values)
+
+            batch_size = get_batch_size(connection, [target_model._meta.get_field(field_name)], values)
+            for batch in chunked(values, batch_size):
+                found = set(
+                    target_model._default_manager.using(connection.alias).filter(
+                        **{'%s__in' % field_name: batch}
+                    ).values_list(field_name, flat=True)
+                )
+                existing.update(found)
+                if cache is not None:
+                    for value in batch:
+                        cache.set(connection.alias, target_model, field_name, value, value in found)
+
+        self._pending = {}
+
+        for model, pks in self._pending_objects.items():
+            objects = self._objects.setdefault(model, {})
+            manager = model._default_manager
+            if self.using:
+                manager = manager.db_manager(self.using)
+            pks = list(pks)
+            batch_size = get_batch_size(connections[manager.db], [model._meta.pk], pks)
+
+            for batch in chunked(pks, batch_size):
+                for obj in manager.filter(pk__in=batch):
+                    objects[obj.pk] = (len(objects), obj)
 
-    obj = model(**kwargs)
+            self._fetched.setdefault(model, set()).update(pks)
 
-    if data['pk'] is not None:
-        # Set state to indicate that this object has come from the database, so that
-        # ModelForm validation doesn't try to enforce a uniqueness check on the primary key
-        obj._state.adding = False
+        self._pending_objects = {}
 
-    return obj
+    def foreign_key_exists(self, field, value):
+        """
+        Return whether the object referenced by the value of foreign key field `field` exists
+        """
+        key = (field.rel.to, field.rel.field_name)
+        if value not in self._resolved.get(key, ()):
+            self.add_foreign_key(field, value)
+            self.resolve()
+
+        return value in self._existing[key]
+
+    def get_related_objects(self, model, values):
+        """
+        Return a list of the objects of type model with the given pks, ordered as
+        model._default_manager.filter(pk__in=values) would return them, or None if they have
+        not been fetched. Each call returns new instances, so that the objects are not
+        shared between clusters.
+        """
+        to_python = model._meta.pk.to_python
+        values = set(to_python(value) for value in values)
+        fetched = self._fetched.get(model, ())
+        if not all(value in fetched for value in values):
+            return None
+
+        objects = self._objects.get(model, {})
+        found = sorted(objects[value] for value in values if value in objects)
+        ordering = model._meta.ordering
+        if ordering:
+            # objects fetched by different queries (in separate batches, or by separate calls to
+            # resolve) are only in order relative to the others from the same query; the sort is
+            # stable, so objects with equal keys stay in the order they were fetched
+            found.sort(key=lambda item: get_sort_key(item[1], ordering))
+        return [_copy_instance(obj) for position, obj in found]
+
+
+class JSONStreamBuilder(object):
+    """
+    Builds a cluster of model instances from a JSON document read incrementally from a
+    JSONStreamReader. Each child object is built as soon as its data has been read, and the raw
+    data discarded. Foreign key checks are deferred until the whole document has been read, so
+    that they can be made with one query per referenced model.
+    """
+    def __init__(self, reader, check_fks=True):
+        self.reader = reader
+        self.check_fks = check_fks
+        self.resolver = ReferenceResolver()
+        # list of (object, foreign_keys, strict_fks) for objects awaiting foreign key checks
+        self.deferred_checks = []
+        # list of (parent object, relation, children) to be assigned once checks are complete
+        self.relation_assignments = []
+
+    def build(self, model, strict_fks=False):
+        obj = self.build_object(model, strict_fks=strict_fks)
+
+        dropped_objects = set()
+        if self.deferred_checks:
+            self.resolver.resolve()
+            for child, foreign_keys, child_strict_fks in self.deferred_checks:
+                dangling_fields = get_dangling_foreign_keys(foreign_keys, self.resolver, child_strict_fks)
+                if dangling_fields is None:
+                    dropped_objects.add(id(child))
+                else:
+                    for field in dangling_fields:
+                        setattr(child, field.attname, None)
+
+        for parent, rel, children in self.relation_assignments:
+            if rel.many_to_many:
+                children = rel.related_model._default_manager.filter(pk__in=children)
+            else:
+                children = [child for child in children if id(child) not in dropped_objects]
+            setattr(parent, rel.get_accessor_name(), children)
+
+        if id(obj) in dropped_objects:
+            return None
+        return obj
+
+    def build_object(self, model, strict_fks):
+        """
+        Build an instance of model from the JSON object at the reader's current position
+        """
+        reader = self.reader
+        if hasattr(model, 'from_serializable_data'):
+            relations = dict((rel.get_accessor_name(), rel) for rel in get_all_child_relations(model))
+        else:
+            relations = {}
+
+        data = {}
+        child_lists = []
+        for key in reader.iter_object():
+            rel = relations.get(key)
+            next_char = reader.peek()
+            if rel is None or not (next_char == '[' or (next_char == '{' and not rel.many_to_many)):
+                data[key] = reader.read_value()
+            elif rel.many_to_many:
+                child_lists.append((rel, reader.read_value()))
+            elif next_char == '{':
+                # columnar data; the rows are read as a whole
+                child_lists.append((rel, [
+                    self.build_from_tree(rel.related_model, child_data, strict_fks=True)
+                    for child_data in iter_child_data(reader.read_value())
+                ]))
+            else:
+                children = []
+                for i in reader.iter_array():
+                    if hasattr(rel.related_model, 'from_serializable_data') and reader.peek() == '{':
+                        children.append(self.build_object(rel.related_model, strict_fks=True))
+                    else:
+                        children.append(self.build_from_data(rel.related_model, reader.read_value(), strict_fks=True))
+                child_lists.append((rel, children))
+
+        if has_shared_references(data):
+            # a document in the shared-reference encoding, whose '$shared' and '$data' members
+            # have been read as a whole
+            return self.build_from_tree(model, decode_shared_references(data), strict_fks=strict_fks)
+
+        obj = self.build_from_data(model, data, strict_fks=strict_fks)
+        for rel, children in child_lists:
+            self.relation_assignments.append((obj, rel, children))
+        return obj
+
+    def build_from_tree(self, model, data, strict_fks):
+        """
+        Build an instance of model, along with its child relations, from already-decoded data
+        """
+        if not hasattr(model, 'from_serializable_data'):
+            return self.build_from_data(model, data, strict_fks)
+
+        data = dict(data)
+        child_lists = []
+        for rel in get_all_child_relations(model):
+            rel_name = rel.get_accessor_name()
+            if rel_name not in data:
+                continue
+            child_data_list = data.pop(rel_name)
+            if child_data_list is None:
+                continue
+            elif rel.many_to_many:
+                child_lists.append((rel, child_data_list))
+            else:
+                child_lists.append((rel, [
+                    self.build_from_tree(rel.related_model, child_data, strict_fks=True)
+                    for child_data in iter_child_data(child_data_list)
+                ]))
+
+        obj = self.build_from_data(model, data, strict_fks)
+        for rel, children in child_lists:
+            self.relation_assignments.append((obj, rel, children))
+        return obj
+
+    def build_from_data(self, model, data, strict_fks):
+        plan = get_serializer_plan(model)
+        kwargs, foreign_keys = plan.get_field_values(data)
+        obj = plan.construct(kwargs, is_saved=data['pk'] is not None)
+
+        if self.check_fks and foreign_keys:
+            for field, value in foreign_keys:
+                self.resolver.add_foreign_key(field, value)
+            self.deferred_checks.append((obj, foreign_keys, strict_fks))
+
+        return obj
+
+
+def build_child_relation(rel, child_data_list, check_fks=True, resolver=None, lazy=False, selection=None):
+    """
+    Build the list of child objects for the relation rel from its serialized data (or, for
+    many-to-many relations, a queryset of the referenced objects). Objects dropped due to
+    dangling foreign keys are omitted. selection is the FieldSelection that applies to the
+    child objects, if the data was read with one.
+    """
+    related_model = rel.related_model
+    if rel.many_to_many:
+        if resolver is not None:
+            children = resolver.get_related_objects(related_model, child_data_list)
+            if children is not None:
+                return children
+        return related_model._default_manager.filter(pk__in=child_data_list)
+
+    if hasattr(related_model, 'from_serializable_data'):
+        include = exclude = None
+        if selection is not None:
+            include, exclude = selection.include, selection.exclude
+        children = [
+            related_model.from_serializable_data(
+                child_data, check_fks=check_fks, strict_fks=True, resolver=resolver, lazy=lazy,
+                include=include, exclude=exclude
+            )
+            for child_data in iter_child_data(child_data_list)
+        ]
+    else:
+        children = models_from_serializable_data(
+            related_model, child_data_list, check_fks=check_fks, strict_fks=True, resolver=resolver,
+            selection=selection
+        )
+
+    return [child for child in children if child is not None]
+
+
+def has_deferred_relation(instance, relation_name):
+    """
+    Return whether the child relation relation_name of instance is still being held as
+    raw serialized data (see ClusterableModel.from_serializable_data)
+    """
+    return relation_name in getattr(instance, '_cluster_deferred_relations', ())
+
+
+def materialize_relation(instance, relation_name):
+    """
+    If the child relation relation_name of instance is being held as raw serialized data,
+    build its objects and assign them to the relation. Nested clusters are built lazily in turn.
+    """
+    try:
+        rel, child_data_list, check_fks, selection = instance._cluster_deferred_relations.pop(relation_name)
+    except (AttributeError, KeyError):
+        return
+
+    resolver = None
+    if check_fks and not rel.many_to_many:
+        resolver = ReferenceResolver()
+        resolver.collect_children(rel.related_model, child_data_list, recursive=False)
+        resolver.resolve()
+
+    children = build_child_relation(
+        rel, child_data_list, check_fks=check_fks, resolver=resolver, lazy=True, selection=selection
+    )
+    setattr(instance, relation_name, children)
+
+
+def get_deferred_relation_data(instance, relation_name, columnar=False):
+    """
+    Return a copy of the raw serialized data held for the child relation relation_name of
+    instance, or None if the relation has been materialized (or the data is not in the
+    requested list / columnar form)
+    """
+    try:
+        rel, child_data_list, check_fks, selection = instance._cluster_deferred_relations[relation_name]
+    except (AttributeError, KeyError):
+        return None
+
+    if not rel.many_to_many and is_columnar_data(child_data_list) != columnar:
+        return None
+    return copy.deepcopy(child_data_list)
+
+
+def discard_deferred_relation(instance, relation_name):
+    """
+    Drop the raw serialized data held for the child relation relation_name of instance, if any
+    """
+    try:
+        del instance._cluster_deferred_relations[relation_name]
+    except (AttributeError, KeyError):
+        pass
+
+
+def fetch_child_relation(rel, instances, using=None):
+    """
+    Return a list of the live database contents of the child relation rel (a child relation or
+    many-to-many field, as returned by get_all_child_relations) for each of the given saved
+    instances, retrieved with one query (or more, if there are too many instances to pass to
+    the database in one go) and ordered as the relation's manager would order them.
+    """
+    related_model = rel.related_model
+    manager = related_model._default_manager
+    if using is not None:
+        manager = manager.db_manager(using)
+
+    if rel.many_to_many:
+        # select the id of the source object from the join table, as Django's own
+        # many-to-many prefetching does
+        field = rel
+        through = field.rel.through
+        source_field = through._meta.get_field(field.m2m_field_name())
+        lookup = '%s__%s__in' % (field.related_query_name(), source_field.rel.get_related_field().name)
+        key_attname = source_field.rel.get_related_field().attname
+        qn = connections[manager.db].ops.quote_name
+        extra_select = {'_cluster_source_value': '%s.%s' % (qn(through._meta.db_table), qn(source_field.column))}
+
+        def get_child_key(child):
+            return child._cluster_source_value
+    else:
+        field = rel.field
+        lookup = '%s__in' % field.name
+        key_attname = field.rel.get_related_field().attname
+        extra_select = None
+
+        def get_child_key(child):
+            return getattr(child, field.attname)
+
+    keys = [getattr(instance, key_attname) for instance in instances]
+    distinct_keys = list(set(keys))
+    connection = connections[manager.db]
+    batch_size = get_batch_size(connection, [related_model._meta.pk], distinct_keys)
+
+    children_by_key = {}
+    for batch in chunked(distinct_keys, batch_size):
+        queryset = manager.filter(**{lookup: batch})
+        if extra_select:
+            queryset = queryset.extra(select=extra_select)
+        for child in queryset:
+            children_by_key.setdefault(get_child_key(child), []).append(child)
+
+    return [list(children_by_key.get(key, ())) for key in keys]
+
+
+def serializable_data_for_instances(model, instances, using=None):
+    """
+    Return a list of the serializable_data output for each of the given saved instances of the
+    cluster model `model`, which must not have any uncommitted changes to their child relations.
+    Each child relation is fetched with one query for all instances (see fetch_child_relation),
+    recursing into nested clusters.
+    """
+    results = [get_serializable_data_for_fields(instance) for instance in instances]
+    if not instances:
+        return results
+
+    for rel in get_all_child_relations(model):
+        rel_name = rel.get_accessor_name()
+        children_lists = fetch_child_relation(rel, instances, using=using)
+
+        if hasattr(rel.related_model, 'serializable_data'):
+            all_children = [child for children in children_lists for child in children]
+            all_child_data = iter(serializable_data_for_instances(rel.related_model, all_children, using=using))
+            for obj, children in zip(results, children_lists):
+                obj[rel_name] = [next(all_child_data) for child in children]
+        elif rel.many_to_many:
+            for obj, children in zip(results, children_lists):
+                obj[rel_name] = [get_serializer_plan(child).get_pk_value(child) for child in children]
+        else:
+            for obj, children in zip(results, children_lists):
+                obj[rel_name] = [get_serializer_plan(child).serialize(child) for child in children]
+
+    return results
 
 
 def get_all_child_relations(model):
@@ -145,6 +1272,154 @@ def get_all_child_relations(model):
         return relations
 
 
+class ClusterHasher(object):
+    """
+    Computes a digest of a cluster's serialized form (see ClusterableModel.cluster_fingerprint)
+    by feeding a canonical, type-tagged encoding of each value into a hash, without building the
+    serialized data structure. Values that are not natively representable in JSON are hashed as
+    their DjangoJSONEncoder representation, and dict keys are hashed in sorted order, so that
+    a cluster has the same digest as the data returned by json.loads(cluster.to_json()).
+    """
+    def __init__(self, pre_save=False):
+        self.pre_save = pre_save
+        self.hash = hashlib.sha256()
+        self.json_encoder = DjangoJSONEncoder()
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+    def write(self, tag, text):
+        data = text.encode('utf-8')
+        self.hash.update(('%s%d:' % (tag, len(data))).encode('ascii'))
+        self.hash.update(data)
+
+    # kinds of items on the stack of values still to be hashed
+    VALUE = 0
+    KEY = 1
+    INSTANCE = 2
+    RELATION = 3
+
+    def feed_value(self, value):
+        self.feed([(self.VALUE, value, None)])
+
+    def feed_instance(self, instance):
+        """
+        Hash the serialized form of a model instance, including its child relations if it is
+        a cluster; equivalent to feed_value(instance.serializable_data())
+        """
+        self.feed([(self.INSTANCE, instance, None)])
+
+    def feed_relation(self, instance, rel):
+        self.feed([(self.RELATION, instance, rel)])
+
+    def feed(self, stack):
+        """
+        Hash the items on stack, a list of (kind, value, relation) tuples, last item first. Nested
+        values and child objects are pushed onto the stack rather than hashed recursively, so that
+        deeply nested clusters do not hit the recursion limit.
+        """
+        while stack:
+            kind, value, rel = stack.pop()
+            if kind == self.VALUE:
+                self._feed_value(value, stack)
+            elif kind == self.KEY:
+                self.write('k', value)
+            elif kind == self.INSTANCE:
+                self._feed_instance(value, stack)
+            else:
+                self._feed_relation(value, rel, stack)
+
+    def _feed_value(self, value, stack):
+        if value is None:
+            self.hash.update(b'n')
+        elif value is True:
+            self.hash.update(b't')
+        elif value is False:
+            self.hash.update(b'f')
+        elif isinstance(value, six.integer_types):
+            self.write('i', six.text_type(value))
+        elif isinstance(value, float):
+            self.write('d', repr(value))
+        elif isinstance(value, six.text_type):
+            self.write('s', value)
+        elif isinstance(value, six.binary_type):
+            self.write('s', value.decode('utf-8'))
+        elif isinstance(value, dict):
+            self.write('o', six.text_type(len(value)))
+            for key in sorted(value, reverse=True):
+                stack.append((self.VALUE, value[key], None))
+                stack.append((self.KEY, key, None))
+        elif isinstance(value, (list, tuple)):
+            self.write('l', six.text_type(len(value)))
+            stack.extend((self.VALUE, item, None) for item in reversed(value))
+        else:
+            stack.append((self.VALUE, self.json_encoder.default(value), None))
+
+    def _feed_instance(self, instance, stack):
+        plan = get_serializer_plan(instance)
+        field_getters = plan.field_getters if self.pre_save else plan.field_getters_without_pre_save
+
+        # list of (key, value, relation) - value is None for relations
+        entries = [('pk', plan.get_pk_value(instance), None)]
+        entries.extend((field_name, get_value(instance), None) for field_name, get_value in field_getters)
+        if hasattr(instance, 'serializable_data'):
+            entries.extend((rel.get_accessor_name(), None, rel) for rel in get_all_child_relations(instance))
+        entries.sort(key=lambda entry: entry[0])
+
+        self.write('o', six.text_type(len(entries)))
+        for key, value, rel in reversed(entries):
+            if rel is None:
+                stack.append((self.VALUE, value, None))
+            else:
+                stack.append((self.RELATION, instance, rel))
+            stack.append((self.KEY, key, None))
+
+    def _feed_relation(self, instance, rel, stack):
+        rel_name = rel.get_accessor_name()
+        try:
+            deferred_rel, child_data_list, check_fks, selection = instance._cluster_deferred_relations[rel_name]
+        except (AttributeError, KeyError):
+            pass
+        else:
+            if rel.many_to_many:
+                stack.append((self.VALUE, child_data_list, None))
+            else:
+                stack.append((self.VALUE, list(iter_child_data(child_data_list)), None))
+            return
+
+        children = list(getattr(instance, rel_name).all())
+        self.write('l', six.text_type(len(children)))
+        if rel.many_to_many and not hasattr(rel.related_model, 'serializable_data'):
+            stack.extend(
+                (self.VALUE, get_serializer_plan(child).get_pk_value(child), None) for child in reversed(children)
+            )
+        else:
+            stack.extend((self.INSTANCE, child, None) for child in reversed(children))
+
+
+def _group_by_model(items):
+    """
+    Reorder a list of work items, each a tuple starting with a model instance, so that the
+    items for each model are processed together; the order is otherwise preserved.
+    """
+    groups = collections.OrderedDict()
+    for item in items:
+        groups.setdefault(type(item[0]), []).append(item)
+    return [item for group in groups.values() for item in group]
+
+
+def _overrides_cluster_method(model, name):
+    # whether model (a model class) has its own implementation of the ClusterableModel method name,
+    # in which case it must be called rather than being bypassed by an iterative traversal
+    return _method_func(model, name) is not _method_func(ClusterableModel, name)
+
+
+def _fill_columnar_data(rel_data, child_data_list):
+    columns = list(child_data_list[0])
+    rel_data['columns'] = columns
+    rel_data['rows'] = [[child_data[column] for column in columns] for child_data in child_data_list]
+
+
 class ClusterableModel(models.Model):
     def __init__(self, *args, **kwargs):
         """
@@ -174,9 +1449,25 @@ class ClusterableModel(models.Model):
 
     def save(self, **kwargs):
         """
-        Save the model and commit all child relations.
+        Save the model and commit all child relations, in a single transaction. The bulk writes
+        for child relations (see modelcluster.bulk) are issued together, in order: all
+        deletions, then inserts, then updates. The in-memory child relations are only discarded
+        once all writes have succeeded, so a failed save can be retried.
+        If a transaction is already open, no savepoint is created, so a failed write marks the
+        caller's whole transaction for rollback; wrap the save in its own atomic() block to be
+        able to recover from the error within that transaction.
+        Fields that were left out of the serialized data the object was built from (see
+        get_skipped_fields) are not written, unless they have been set since.
+        The number of SQL statements issued is logged to the 'modelcluster' logger, at DEBUG
+        level.
         """
-        child_relation_names = [rel.get_accessor_name() for rel in get_all_child_relations(self)]
+        # imported here, as modelcluster.bulk depends on this module
+        from modelcluster.bulk import CommitPlan, StatementCounter
+
+        child_relations = get_all_child_relations(self)
+        child_relation_names = [rel.get_accessor_name() for rel in child_relations]
+
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
 
         update_fields = kwargs.pop('update_fields', None)
         if update_fields is None:
@@ -191,42 +1482,354 @@ class ClusterableModel(models.Model):
                 else:
                     real_update_fields.append(field)
 
-        super(ClusterableModel, self).save(update_fields=real_update_fields, **kwargs)
+        # counting statements can be expensive (see StatementCounter), so is only done if the
+        # count will be logged
+        counter = StatementCounter(using, enabled=logger.isEnabledFor(logging.DEBUG))
+
+        with transaction.atomic(using=using, savepoint=False), counter:
+            if update_fields is None and not kwargs.get('force_insert'):
+                # leave fields that were not read from serialized data untouched
+                real_update_fields = get_partial_update_fields(self, using)
+            super(ClusterableModel, self).save(update_fields=real_update_fields, **kwargs)
+
+            plan = CommitPlan(using)
+            for rel in child_relations:
+                relation = rel.get_accessor_name()
+                if relation not in relations_to_commit:
+                    continue
+                getattr(self, relation).commit(plan=plan)
+            plan.execute()
+
+        if counter.count is not None:
+            logger.debug("Saved %s %r with %d SQL statements", type(self).__name__, self.pk, counter.count)
+
+    def serializable_data(self, columnar=False, pre_save=True, include=None, exclude=None, shared_references=False):
+        """
+        Return a JSON-like representation of this cluster. If columnar is true, each child
+        relation (other than many-to-many relations) is represented as a dict of 'columns' (a list
+        of field names) and 'rows' (a list of lists of field values), rather than a list of dicts;
+        this avoids repeating the field names for every child. from_serializable_data accepts
+        both forms.
+        If pre_save is false, field values are read without calling the fields' pre_save methods,
+        so that serializing has no side effects such as writing uploaded files to storage or
+        updating auto_now dates. Models can list fields that still need pre_save to be called in
+        a serialize_pre_save_fields attribute.
+        include and exclude are lists of the names of fields and child relations to include
+        or leave out, including dotted paths into child relations such as 'menu_items.price'
+        (see FieldSelection); relations that are not selected are not queried.
+        If shared_references is true, repeated values are stored once and referred to by index
+        (see modelcluster.sharing); from_serializable_data decodes this form automatically.
+        Results are memoized, and unchanged parts of the cluster are reused on subsequent calls
+        (see _get_memoized_serializable_data); the returned structure is always a new copy.
+        Child relations read from the database are reused until they are changed through their
+        managers; after writing child rows by other means, call invalidate_serializable_data.
+        """
+        if shared_references:
+            return encode_shared_references(
+                self.serializable_data(columnar=columnar, pre_save=pre_save, include=include, exclude=exclude)
+            )
+
+        selection = FieldSelection(include, exclude)
+        if not columnar and selection.is_everything:
+            return copy_serializable_data(self._get_memoized_serializable_data(pre_save=pre_save))
+
+        # the cluster is traversed one level at a time, rather than recursively; each object's
+        # data is created with placeholders for its child objects, which are filled in place as
+        # the next level is processed
+        result = [None]
+        finalizers = []
+        work = [(self, selection, result, 0)]
+        while work:
+            next_work = []
+            for node, node_selection, container, index in _group_by_model(work):
+                container[index] = node._get_node_serializable_data(
+                    columnar, pre_save, node_selection, next_work, finalizers
+                )
+            work = next_work
 
-        for relation in relations_to_commit:
-            getattr(self, relation).commit()
+        for finalize in finalizers:
+            finalize()
+        return result[0]
 
-    def serializable_data(self):
-        obj = get_serializable_data_for_fields(self)
+    def _get_node_serializable_data(self, columnar, pre_save, selection, work, finalizers):
+        """
+        Return the serializable data for this object alone, as part of serializable_data. Items
+        (child, selection, list, index) are added to work for the child objects whose data is to
+        be placed at list[index], and callables to finish off columnar data are added to
+        finalizers.
+        """
+        plan = get_serializer_plan(self)
+        obj = plan.serialize(self, pre_save=pre_save, selection=selection)
         child_relations = get_all_child_relations(self)
 
         for rel in child_relations:
             rel_name = rel.get_accessor_name()
+            if not selection.includes(rel_name):
+                continue
+            child_selection = selection.child(rel_name)
+
+            deferred_data = get_deferred_relation_data(self, rel_name, columnar=columnar)
+            if deferred_data is not None:
+                if not rel.many_to_many:
+                    deferred_data = child_selection.filter_child_data(rel.related_model, deferred_data)
+                obj[rel_name] = deferred_data
+                continue
+
             children = getattr(self, rel_name).all()
 
             if hasattr(rel.related_model, 'serializable_data'):
-                obj[rel_name] = [child.serializable_data() for child in children]
+                child_data_list = []
+                for child in children:
+                    if _overrides_cluster_method(type(child), 'serializable_data'):
+                        child_data_list.append(child.serializable_data(
+                            columnar=columnar, pre_save=pre_save,
+                            include=child_selection.include, exclude=child_selection.exclude
+                        ))
+                    else:
+                        child_data_list.append(None)
+                        work.append((child, child_selection, child_data_list, len(child_data_list) - 1))
+
+                if not columnar:
+                    obj[rel_name] = child_data_list
+                elif child_data_list:
+                    obj[rel_name] = {'columns': [], 'rows': []}
+                    finalizers.append(functools.partial(_fill_columnar_data, obj[rel_name], child_data_list))
+                else:
+                    obj[rel_name] = {
+                        'columns': get_serializer_plan(rel.related_model).get_columns(child_selection) + [
+                            child_rel.get_accessor_name() for child_rel in get_all_child_relations(rel.related_model)
+                            if child_selection.includes(child_rel.get_accessor_name())
+                        ],
+                        'rows': [],
+                    }
             else:
                 if rel.many_to_many:
-                    pk_values = []
-                    for child in children:
-                        pk_field = child._meta.pk
-                        # If model is a child via multitable inheritance, use parent's pk
-                        while pk_field.rel and pk_field.rel.parent_link:
-                            pk_field = pk_field.rel.to._meta.pk
-
-                        pk_values.append(get_field_value(pk_field, child))
-                    obj[rel_name] = pk_values
+                    obj[rel_name] = [get_serializer_plan(child).get_pk_value(child) for child in children]
+                elif columnar:
+                    child_plan = get_serializer_plan(rel.related_model)
+                    obj[rel_name] = {
+                        'columns': child_plan.get_columns(child_selection),
+                        'rows': [
+                            child_plan.serialize_row(child, pre_save=pre_save, selection=child_selection)
+                            for child in children
+                        ],
+                    }
                 else:
-                    obj[rel_name] = [get_serializable_data_for_fields(child) for child in children]
+                    obj[rel_name] = [
+                        get_serializer_plan(child).serialize(child, pre_save=pre_save, selection=child_selection)
+                        for child in children
+                    ]
 
         return obj
 
-    def to_json(self):
-        return json.dumps(self.serializable_data(), cls=DjangoJSONEncoder)
+    def _get_memoized_serializable_data(self, pre_save=True):
+        """
+        Return the serializable data for this cluster, as a structure that is retained for reuse
+        and must not be modified. Parts of the previous result are reused where they are still
+        valid: field values, unless a field's attribute value has changed; child relations that are
+        being read from the database, until they are modified through their manager; and,
+        for relations with uncommitted changes, individual child objects that are still present
+        and unchanged.
+        """
+        # traversed one level at a time, as for serializable_data. Items are
+        # (object, list, index, children), where children is the dict of memoized child objects
+        # to record the object's data in, for relations with uncommitted changes
+        result = [None]
+        work = [(self, result, 0, None)]
+        while work:
+            next_work = []
+            for node, container, index, children in _group_by_model(work):
+                data = container[index] = node._get_memoized_node_data(pre_save, next_work)
+                if children is not None:
+                    children[id(node)] = (node, get_field_snapshot(node), data)
+            work = next_work
+
+        return result[0]
+
+    def _get_memoized_node_data(self, pre_save, work):
+        try:
+            memo = self._serializable_data_memo
+        except AttributeError:
+            memo = self._serializable_data_memo = {}
+        state = memo.setdefault(pre_save, {'fields': None, 'relations': {}})
+
+        if state['fields'] is not None and state['fields'][0] == get_field_snapshot(self):
+            obj = dict(state['fields'][1])
+        else:
+            field_data = get_serializable_data_for_fields(self, pre_save=pre_save)
+            state['fields'] = (get_field_snapshot(self), field_data)
+            obj = dict(field_data)
+
+        relation_memos = state['relations']
+
+        for rel in get_all_child_relations(self):
+            rel_name = rel.get_accessor_name()
+            deferred_data = get_deferred_relation_data(self, rel_name)
+            if deferred_data is not None:
+                obj[rel_name] = deferred_data
+                continue
+
+            # entries are (None, data) for relations read from the database, which are kept until
+            # the relation's manager changes or commits the relation (see
+            # invalidate_serializable_data), and (dict of id(child) => (child, snapshot, child data),
+            # data) for in-memory object lists
+            entry = relation_memos.get(rel_name)
+            children_queryset = getattr(self, rel_name).get_queryset()
+
+            if not isinstance(children_queryset, FakeQuerySet):
+                if entry is None or entry[0] is not None:
+                    data = []
+                    for child in children_queryset:
+                        self._add_child_serializable_data(rel, child, pre_save, data, None, work)
+                    entry = relation_memos[rel_name] = (None, data)
+                obj[rel_name] = entry[1]
+                continue
+
+            object_list = children_queryset.results
+
+            previous_children = entry[0] if entry is not None and entry[0] is not None else {}
+            children = {}
+            data = []
+            for child in object_list:
+                try:
+                    previous_child, previous_snapshot, child_data = previous_children[id(child)]
+                except KeyError:
+                    previous_child = None
+
+                if previous_child is child and not hasattr(child, '_get_memoized_node_data') and \
+                        previous_snapshot == get_field_snapshot(child):
+                    children[id(child)] = (child, previous_snapshot, child_data)
+                    data.append(child_data)
+                else:
+                    self._add_child_serializable_data(rel, child, pre_save, data, children, work)
+
+            relation_memos[rel_name] = (children, data)
+            obj[rel_name] = data
+
+        return obj
+
+    def _add_child_serializable_data(self, rel, child, pre_save, data, children, work):
+        if hasattr(child, '_get_memoized_node_data'):
+            # filled in when the next level of the cluster is processed
+            data.append(None)
+            work.append((child, data, len(data) - 1, children))
+            return
+
+        plan = get_serializer_plan(child)
+        if rel.many_to_many:
+            child_data = plan.get_pk_value(child)
+        else:
+            child_data = plan.serialize(child, pre_save=pre_save)
+        data.append(child_data)
+        if children is not None:
+            children[id(child)] = (child, get_field_snapshot(child), child_data)
+
+    def cluster_fingerprint(self, pre_save=False):
+        """
+        Return a hex digest of the serialized form of this cluster, including all child
+        relations, which can be compared against a stored value to detect whether anything
+        has changed. Equal serialized data gives an equal fingerprint in any process and under
+        any Python version. Unlike serializable_data, field values are read without calling
+        pre_save by default, so that (for example) auto_now dates do not change the fingerprint.
+        """
+        hasher = ClusterHasher(pre_save=pre_save)
+        hasher.feed_instance(self)
+        return hasher.hexdigest()
+
+    @classmethod
+    def serializable_data_for_queryset(cls, queryset, chunk_size=100):
+        """
+        Iterate over (instance, data) pairs for the objects in queryset, where data is
+        the same as instance.serializable_data(). Objects are processed chunk_size at a time,
+        with one query per child relation (at every level of nesting) for each chunk, rather
+        than several queries per object.
+        """
+        model = queryset.model
+        iterator = queryset.iterator()
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                return
+            for instance, data in zip(chunk, serializable_data_for_instances(model, chunk, using=queryset.db)):
+                yield instance, data
+
+    def to_json(self, columnar=False, pre_save=True, include=None, exclude=None, json_backend=None,
+                shared_references=False):
+        """
+        Return the JSON representation of this cluster, encoded with the given JSON backend
+        (a name registered in modelcluster.jsonbackends, or a JSONBackend instance), or the one
+        selected by the MODELCLUSTER_JSON_BACKEND setting if json_backend is None
+        """
+        return get_json_backend(json_backend).dumps(self.serializable_data(
+            columnar=columnar, pre_save=pre_save, include=include, exclude=exclude,
+            shared_references=shared_references
+        ))
+
+    def to_json_iter(self, encoder=None, pre_save=True):
+        """
+        Return an iterator over chunks of the JSON representation of this cluster, as returned by
+        to_json. Child relations are serialized one object at a time, and relations that have no
+        uncommitted changes are read from the database with queryset.iterator(), so the complete
+        data structure is never held in memory.
+        """
+        if encoder is None:
+            encoder = DjangoJSONEncoder()
+
+        obj = get_serializable_data_for_fields(self, pre_save=pre_save)
+        yield '{' + ', '.join(
+            '%s: %s' % (encoder.encode(key), encoder.encode(value)) for key, value in obj.items()
+        )
+
+        for rel in get_all_child_relations(self):
+            rel_name = rel.get_accessor_name()
+            deferred_data = get_deferred_relation_data(self, rel_name)
+            if deferred_data is not None:
+                yield ', %s: %s' % (encoder.encode(rel_name), encoder.encode(deferred_data))
+                continue
+
+            children = getattr(self, rel_name).all().iterator()
+
+            if rel.many_to_many and not hasattr(rel.related_model, 'serializable_data'):
+                pk_values = [get_serializer_plan(child).get_pk_value(child) for child in children]
+                yield ', %s: %s' % (encoder.encode(rel_name), encoder.encode(pk_values))
+                continue
+
+            yield ', %s: [' % encoder.encode(rel_name)
+            for i, child in enumerate(children):
+                if i:
+                    yield ', '
+                if hasattr(child, 'to_json_iter'):
+                    for chunk in child.to_json_iter(encoder=encoder, pre_save=pre_save):
+                        yield chunk
+                elif hasattr(child, 'serializable_data'):
+                    yield encoder.encode(child.serializable_data(pre_save=pre_save))
+                else:
+                    yield encoder.encode(get_serializer_plan(child).serialize(child, pre_save=pre_save))
+            yield ']'
+
+        yield '}'
+
+    def to_bytes(self, columnar=False, pre_save=True, include=None, exclude=None, shared_references=False):
+        """
+        Return a compact binary representation of this cluster, equivalent to to_json
+        (see modelcluster.binary)
+        """
+        return binary.dumps(self.serializable_data(
+            columnar=columnar, pre_save=pre_save, include=include, exclude=exclude,
+            shared_references=shared_references
+        ))
+
+    def write_json(self, fp, pre_save=True):
+        """
+        Write the JSON representation of this cluster, as returned by to_json, to the
+        file-like object fp
+        """
+        for chunk in self.to_json_iter(pre_save=pre_save):
+            fp.write(chunk)
 
     @classmethod
-    def from_serializable_data(cls, data, check_fks=True, strict_fks=False):
+    def from_serializable_data(cls, data, check_fks=True, strict_fks=False, resolver=None, lazy=False,
+                               include=None, exclude=None):
         """
         Build an instance of this model from the JSON-like structure passed in,
         recursing into related objects as required.
@@ -237,44 +1840,140 @@ class ClusterableModel(models.Model):
         - dangling foreign keys on the base object will be nullified, unless strict_fks is true,
         in which case any dangling foreign keys with on_delete=CASCADE will cause None to be
         returned for the entire object.
+        Foreign keys throughout the cluster are checked together, with one query per referenced
+        model; resolver is the ReferenceResolver to use for this, when building part of a
+        larger structure.
+        If lazy is true, child relations are kept as raw data, and their objects are only built
+        (and their foreign keys checked) when the relation is first accessed; relations that are
+        never accessed are passed through unchanged by serializable_data and save.
+        include and exclude select the fields and child relations to be read from data, as for
+        serializable_data; fields and child relations that are left out are not built, and are
+        left untouched when the object is saved.
+        data can also be in the form returned by serializable_data(shared_references=True), which
+        is decoded automatically.
         """
-        obj = model_from_serializable_data(cls, data, check_fks=check_fks, strict_fks=strict_fks)
+        if has_shared_references(data):
+            data = decode_shared_references(data)
+        selection = FieldSelection(include, exclude)
+        data = selection.filter_data(cls, data)
+        if selection.is_everything:
+            selection = None
+
+        if check_fks and resolver is None:
+            resolver = ReferenceResolver()
+            resolver.collect(cls, data, recursive=not lazy)
+            resolver.resolve()
+
+        obj = model_from_serializable_data(
+            cls, data, check_fks=check_fks, strict_fks=strict_fks, resolver=resolver, selection=selection
+        )
         if obj is None:
             return None
 
-        child_relations = get_all_child_relations(cls)
+        # nested clusters are built one level at a time rather than recursively. Child objects
+        # are assigned to their relations once the whole cluster is built, deepest first, so that
+        # each object is complete when it is assigned, as in a recursive build
+        assignments = []
+        work = [(obj, data, selection)]
+        while work:
+            next_work = []
+            for node, node_data, node_selection in _group_by_model(work):
+                node._build_child_relations(
+                    node_data, check_fks, resolver, lazy, node_selection, next_work, assignments
+                )
+            work = next_work
 
-        for rel in child_relations:
+        for node, rel_name, children in reversed(assignments):
+            setattr(node, rel_name, children)
+
+        return obj
+
+    def _build_child_relations(self, data, check_fks, resolver, lazy, selection, work, assignments):
+        """
+        Build the child relations of this object from its serialized data, as part of
+        from_serializable_data. selection is the FieldSelection the data was read with, or None.
+        Items (child, child data, child selection) are added to work for the nested clusters still
+        to be built, and (object, relation name, children) to assignments.
+        """
+        for rel in get_all_child_relations(self):
             rel_name = rel.get_accessor_name()
             try:
                 child_data_list = data[rel_name]
             except KeyError:
                 continue
+            child_selection = None if selection is None else selection.child(rel_name)
 
             related_model = rel.related_model
-            if rel.many_to_many:
-                children = related_model._default_manager.filter(pk__in=child_data_list)
+            if lazy:
+                try:
+                    deferred_relations = self._cluster_deferred_relations
+                except AttributeError:
+                    deferred_relations = self._cluster_deferred_relations = {}
+                deferred_relations[rel_name] = (rel, child_data_list, check_fks, child_selection)
+            elif not rel.many_to_many and hasattr(related_model, 'from_serializable_data') and \
+                    not _overrides_cluster_method(related_model, 'from_serializable_data'):
+                children = []
+                for child_data in iter_child_data(child_data_list):
+                    child = model_from_serializable_data(
+                        related_model, child_data, check_fks=check_fks, strict_fks=True, resolver=resolver,
+                        selection=child_selection
+                    )
+                    if child is not None:
+                        children.append(child)
+                        work.append((child, child_data, child_selection))
+                assignments.append((self, rel_name, children))
             else:
-                if hasattr(related_model, 'from_serializable_data'):
-                    children = [
-                        related_model.from_serializable_data(child_data, check_fks=check_fks, strict_fks=True)
-                        for child_data in child_data_list
-                    ]
-                else:
-                    children = [
-                        model_from_serializable_data(related_model, child_data, check_fks=check_fks, strict_fks=True)
-                        for child_data in child_data_list
-                    ]
+                children = build_child_relation(
+                    rel, child_data_list, check_fks=check_fks, resolver=resolver, selection=child_selection
+                )
+                assignments.append((self, rel_name, children))
+
+    @classmethod
+    def from_serializable_data_many(cls, data_list, check_fks=True, strict_fks=False):
+        """
+        Equivalent to calling from_serializable_data on each item of data_list, and returning the
+        list of results; foreign key checks, and the objects referenced by many-to-many relations,
+        are looked up for the whole batch at once with one query per referenced model.
+        """
+        data_list = [
+            decode_shared_references(data) if has_shared_references(data) else data for data in data_list
+        ]
+        resolver = ReferenceResolver()
+        for data in data_list:
+            resolver.collect(cls, data, foreign_keys=check_fks, many_to_many=True)
+        resolver.resolve()
 
-            children = filter(lambda child: child is not None, children)
+        return [
+            cls.from_serializable_data(data, check_fks=check_fks, strict_fks=strict_fks, resolver=resolver)
+            for data in data_list
+        ]
 
-            setattr(obj, rel_name, children)
+    @classmethod
+    def from_json(cls, json_data, check_fks=True, strict_fks=False, lazy=False, include=None, exclude=None,
+                  json_backend=None):
+        return cls.from_serializable_data(
+            get_json_backend(json_backend).loads(json_data), check_fks=check_fks, strict_fks=strict_fks, lazy=lazy,
+            include=include, exclude=exclude
+        )
 
-        return obj
+    @classmethod
+    def from_bytes(cls, data, check_fks=True, strict_fks=False, lazy=False, include=None, exclude=None):
+        return cls.from_serializable_data(
+            binary.loads(data), check_fks=check_fks, strict_fks=strict_fks, lazy=lazy,
+            include=include, exclude=exclude
+        )
 
     @classmethod
-    def from_json(cls, json_data, check_fks=True, strict_fks=False):
-        return cls.from_serializable_data(json.loads(json_data), check_fks=check_fks, strict_fks=strict_fks)
+    def from_json_stream(cls, source, check_fks=True, strict_fks=False):
+        """
+        Alternative to from_json that reads the JSON data incrementally from a file-like object or
+        an iterable of string / bytestring chunks, building child objects one at a time so that
+        neither the complete JSON document nor its decoded data structure is held in memory.
+        Data in the shared-reference encoding (see modelcluster.sharing) is accepted, but is
+        decoded as a whole, as a reference can point to any part of the document.
+        """
+        reader = JSONStreamReader(source)
+        return JSONStreamBuilder(reader, check_fks=check_fks).build(cls, strict_fks=strict_fks)
 
     class Meta:
         abstract = True
@@ -0,0 +1,176 @@
+"""
+Decoding of many serialized clusters at once, with the CPU-bound work of parsing the JSON and
+converting field values spread across a pool of worker processes. Workers return plain
+dicts of validated field values; foreign key checks and the construction of model instances
+happen in the calling process, with the database lookups shared across the whole batch.
+"""
+from __future__ import unicode_literals
+
+from modelcluster.models import (
+    ReferenceResolver, _construct_checked, get_all_child_relations, get_serializer_plan, iter_child_data
+)
+from modelcluster.sharing import decode_shared_references, has_shared_references
+from modelcluster.utils import chunked
+from modelcluster.workers import get_worker_settings, validate_json_chunk
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    # Python 2 without the 'futures' backport
+    ProcessPoolExecutor = None
+
+
+def validate_serializable_data(model, data):
+    """
+    Convert the serialized data for an instance of model (as returned by serializable_data) into
+    a dict of python values that can be passed between processes and built into a model instance
+    without further conversion:
+
+    'kwargs' - a dict of field values, keyed by attname
+    'foreign_keys' - a list of (attname, value) pairs for the foreign keys to be checked
+    'is_saved' - whether the object has a pk
+    'relations' - a dict of the validated data for each child relation (or list of pks for
+        many-to-many relations), keyed by relation name
+    """
+    if has_shared_references(data):
+        data = decode_shared_references(data)
+
+    plan = get_serializer_plan(model)
+    kwargs, foreign_keys = plan.get_field_values(data)
+    result = {
+        'kwargs': kwargs,
+        'foreign_keys': [(field.attname, value) for field, value in foreign_keys],
+        'is_saved': data['pk'] is not None,
+        'relations': {},
+    }
+
+    if hasattr(model, 'from_serializable_data'):
+        for rel in get_all_child_relations(model):
+            rel_name = rel.get_accessor_name()
+            try:
+                child_data_list = data[rel_name]
+            except KeyError:
+                continue
+
+            if rel.many_to_many:
+                result['relations'][rel_name] = list(child_data_list)
+            else:
+                result['relations'][rel_name] = [
+                    validate_serializable_data(rel.related_model, child_data)
+                    for child_data in iter_child_data(child_data_list)
+                ]
+
+    return result
+
+
+class ClusterBuilder(object):
+    """
+    Builds model instances from the output of validate_serializable_data, checking foreign keys
+    and fetching the objects of many-to-many relations for all of the validated data together
+    """
+    def __init__(self, check_fks=True, using=None):
+        self.check_fks = check_fks
+        self.resolver = ReferenceResolver(using=using)
+        self._fields_by_attname = {}
+
+    def get_field(self, model, attname):
+        try:
+            fields = self._fields_by_attname[model]
+        except KeyError:
+            fields = self._fields_by_attname[model] = dict(
+                (field.attname, field) for field in model._meta.concrete_fields
+            )
+        return fields[attname]
+
+    def collect(self, model, validated_data):
+        if self.check_fks:
+            for attname, value in validated_data['foreign_keys']:
+                self.resolver.add_foreign_key(self.get_field(model, attname), value)
+
+        for rel in get_all_child_relations(model) if validated_data['relations'] else ():
+            try:
+                child_data_list = validated_data['relations'][rel.get_accessor_name()]
+            except KeyError:
+                continue
+
+            if rel.many_to_many:
+                self.resolver.add_related_objects(rel.related_model, child_data_list)
+            else:
+                for child_data in child_data_list:
+                    self.collect(rel.related_model, child_data)
+
+    def build(self, model, validated_data, strict_fks=False):
+        plan = get_serializer_plan(model)
+        foreign_keys = [
+            (self.get_field(model, attname), value) for attname, value in validated_data['foreign_keys']
+        ]
+        obj = _construct_checked(
+            plan, dict(validated_data['kwargs']), foreign_keys, validated_data['is_saved'],
+            self.check_fks, strict_fks, self.resolver
+        )
+        if obj is None:
+            return None
+
+        for rel in get_all_child_relations(model) if validated_data['relations'] else ():
+            rel_name = rel.get_accessor_name()
+            try:
+                child_data_list = validated_data['relations'][rel_name]
+            except KeyError:
+                continue
+
+            if rel.many_to_many:
+                children = self.resolver.get_related_objects(rel.related_model, child_data_list)
+            else:
+                children = [
+                    child for child in (
+                        self.build(rel.related_model, child_data, strict_fks=True) for child_data in child_data_list
+                    )
+                    if child is not None
+                ]
+            setattr(obj, rel_name, children)
+
+        return obj
+
+
+def from_json_many(model, json_data_list, workers=None, chunk_size=100, check_fks=True, strict_fks=False):
+    """
+    Equivalent to [model.from_json(json_data) for json_data in json_data_list], with JSON parsing
+    and field conversion done in a pool of `workers` processes (or the default number for
+    ProcessPoolExecutor, if None), chunk_size documents at a time. Foreign keys and many-to-many
+    relations are resolved for all documents together, as from_serializable_data_many does.
+    If workers is 0, or concurrent.futures is not available, the work is done in this process.
+
+    Instances are built directly from the validated data, so overrides of from_serializable_data
+    on the model or its child models are not called.
+
+    Worker processes set up Django themselves if they were not forked from this process (see
+    modelcluster.workers); if settings were passed to settings.configure rather than loaded
+    from DJANGO_SETTINGS_MODULE, they are sent to the workers, and so must be picklable.
+    """
+    json_data_list = list(json_data_list)
+    opts = model._meta
+    chunks = list(chunked(json_data_list, chunk_size))
+
+    if workers == 0 or ProcessPoolExecutor is None or len(chunks) < 2:
+        validated_chunks = [validate_json_chunk(None, opts.app_label, opts.model_name, chunk) for chunk in chunks]
+    else:
+        # ProcessPoolExecutor only accepts an initializer from python 3.7, so each task sets up
+        # Django if its process has not done so already
+        worker_settings = get_worker_settings()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            validated_chunks = list(executor.map(
+                validate_json_chunk, [worker_settings] * len(chunks),
+                [opts.app_label] * len(chunks), [opts.model_name] * len(chunks), chunks
+            ))
+
+    builder = ClusterBuilder(check_fks=check_fks)
+    for validated_chunk in validated_chunks:
+        for validated_data in validated_chunk:
+            builder.collect(model, validated_data)
+    builder.resolver.resolve()
+
+    return [
+        builder.build(model, validated_data, strict_fks=strict_fks)
+        for validated_chunk in validated_chunks
+        for validated_data in validated_chunk
+    ]
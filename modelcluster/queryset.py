@@ -138,6 +138,9 @@ class FakeQuerySet(object):
     def __iter__(self):
         return self.results.__iter__()
 
+    def iterator(self):
+        return self.results.__iter__()
+
     def __nonzero__(self):
         return bool(self.results)
 
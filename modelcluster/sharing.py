@@ -0,0 +1,152 @@
+"""
+An optional encoding of the JSON-like data structures returned by
+ClusterableModel.serializable_data, in which values that occur more than once - dicts, lists
+and long strings, such as the same sub-structure repeated across nested clusters - are stored
+once in a table and referred to by index.
+
+An encoded document is a dict of the form {'$shared': [...], '$data': ...}, where '$data' is the
+original structure with each repeated value replaced by {'$ref': index}. Entries of the table
+can themselves contain references to earlier entries. Decoding replaces each reference with the
+same python object, so repeated values are shared by identity rather than being re-created.
+
+Foreign keys are serialized as plain pk values, so the objects they refer to are not themselves
+shared: menu items that all refer to the same dish each hold the dish's pk. What is shared is
+repeated data within the cluster, such as identical child objects and long strings.
+"""
+from __future__ import unicode_literals
+
+from django.utils import six
+
+
+SHARED_KEY = '$shared'
+DATA_KEY = '$data'
+REF_KEY = '$ref'
+
+# strings shorter than this are not worth replacing with a reference
+MIN_STRING_LENGTH = 16
+
+
+def _scalar_key(value):
+    if value is None or isinstance(value, (six.string_types, bool) + six.integer_types):
+        return (type(value), value)
+    # distinguish values that compare equal but encode differently, such as Decimal('1.0')
+    # and Decimal('1.00')
+    return (type(value), repr(value))
+
+
+def _is_shareable(value, min_string_length):
+    if isinstance(value, (dict, list)):
+        return True
+    return isinstance(value, six.string_types) and len(value) >= min_string_length
+
+
+def encode_shared_references(data, min_string_length=MIN_STRING_LENGTH):
+    """
+    Return the shared-reference encoding of data, as a new structure; data is not modified
+    """
+    # first pass: give every distinct value an id (equal values get the same id) and count
+    # the occurrences of each id. Dicts and lists are identified by the ids of their contents,
+    # so that keys stay shallow and cheap to hash.
+    ids = {}
+    node_ids = {}
+    counts = {}
+    stack = [(data, False)]
+    while stack:
+        value, visited = stack.pop()
+        if isinstance(value, dict) and not visited:
+            stack.append((value, True))
+            stack.extend((child, False) for child in value.values())
+            continue
+        elif isinstance(value, list) and not visited:
+            stack.append((value, True))
+            stack.extend((child, False) for child in value)
+            continue
+
+        if isinstance(value, dict):
+            key = ('dict',) + tuple(sorted((k, node_ids[id(v)]) for k, v in value.items()))
+        elif isinstance(value, list):
+            key = ('list',) + tuple(node_ids[id(v)] for v in value)
+        else:
+            key = _scalar_key(value)
+        node_id = node_ids[id(value)] = ids.setdefault(key, len(ids))
+        counts[node_id] = counts.get(node_id, 0) + 1
+
+    # second pass: copy the structure, replacing repeated values with references. Table
+    # entries are added once their contents have been encoded, so they only refer to earlier
+    # entries.
+    table = []
+    table_indexes = {}
+    result = [None]
+    stack = [(data, result, 0, False)]
+    while stack:
+        value, container, index, visited = stack.pop()
+        node_id = node_ids[id(value)]
+        shared = counts[node_id] > 1 and _is_shareable(value, min_string_length)
+
+        if shared and node_id in table_indexes:
+            container[index] = {REF_KEY: table_indexes[node_id]}
+            continue
+
+        if not visited and isinstance(value, dict):
+            encoded = dict(value)
+            stack.append((encoded, container, index, True))
+            stack.extend((child, encoded, key, False) for key, child in value.items())
+            node_ids[id(encoded)] = node_id
+            continue
+        elif not visited and isinstance(value, list):
+            encoded = list(value)
+            stack.append((encoded, container, index, True))
+            stack.extend((child, encoded, i, False) for i, child in enumerate(value))
+            node_ids[id(encoded)] = node_id
+            continue
+
+        if shared:
+            table_indexes[node_id] = len(table)
+            table.append(value)
+            container[index] = {REF_KEY: table_indexes[node_id]}
+        else:
+            container[index] = value
+
+    return {SHARED_KEY: table, DATA_KEY: result[0]}
+
+
+def has_shared_references(data):
+    """
+    Return whether data is in the shared-reference encoding
+    """
+    return isinstance(data, dict) and SHARED_KEY in data
+
+
+def _is_reference(value):
+    return isinstance(value, dict) and len(value) == 1 and REF_KEY in value
+
+
+def _resolve_references(value, table):
+    # return a copy of value with each reference replaced by its (already resolved) table entry.
+    # Dicts and lists are copied rather than updated, so that the encoded data is left unchanged;
+    # table entries are shared as they are.
+    result = [value]
+    stack = [(result, 0)]
+    while stack:
+        container, key = stack.pop()
+        child = container[key]
+        if _is_reference(child):
+            container[key] = table[child[REF_KEY]]
+        elif isinstance(child, dict):
+            child = container[key] = dict(child)
+            stack.extend((child, child_key) for child_key in child)
+        elif isinstance(child, list):
+            child = container[key] = list(child)
+            stack.extend((child, index) for index in range(len(child)))
+    return result[0]
+
+
+def decode_shared_references(data):
+    """
+    Return the original structure from the shared-reference encoding data, as a new structure
+    in which each repeated value is a single shared object; data is not modified
+    """
+    table = []
+    for entry in data[SHARED_KEY]:
+        table.append(_resolve_references(entry, table))
+    return _resolve_references(data[DATA_KEY], table)
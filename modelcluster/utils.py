@@ -1,3 +1,7 @@
+import bisect
+import operator
+
+
 def sort_by_fields(items, fields):
     """
     Sort a list of objects on the given fields. The field list works analogously to
@@ -17,3 +21,332 @@ def sort_by_fields(items, fields):
         # Use a tuple of (v is not None, v) as the key, to ensure that None sorts before other values,
         # as comparing directly with None breaks on python3
         items.sort(key=lambda x: (getattr(x, key) is not None, getattr(x, key)), reverse=reverse)
+
+
+def chunked(items, size):
+    """
+    Split a list into consecutive sublists of at most `size` items
+    """
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def get_batch_size(connection, fields, objs):
+    """
+    Return the number of objects (or values) that can be processed in one query on the given
+    database connection, where each one contributes a query parameter for each of `fields`
+    """
+    return max(connection.ops.bulk_batch_size(fields, objs), 1)
+
+
+class ReversedSortKey(object):
+    """
+    Wrapper for a sort key value that inverts its ordering, for the descending ('-' prefixed)
+    fields of a sort key
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __ne__(self, other):
+        return self.value != other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def get_sort_key(item, fields):
+    """
+    Return a key for item that orders objects in the same way as sort_by_fields(items, fields)
+    when compared as tuples; as that sort is stable, objects with equal keys keep their
+    relative order
+    """
+    key = []
+    for field in fields:
+        if field[0] == '-':
+            value = getattr(item, field[1:])
+            key.append(ReversedSortKey((value is not None, value)))
+        else:
+            value = getattr(item, field)
+            key.append((value is not None, value))
+    return tuple(key)
+
+
+class SortFieldDescriptor(object):
+    """
+    Holds the value of a sort field in the instance dict, as a plain attribute would, and counts
+    the assignments made to it on objects held in an ordered ObjectListIndex, so that the index
+    can tell whether sort values may have been changed in place without reading every item
+    """
+    # the number of assignments made to sort fields of indexed objects
+    changes = 0
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        try:
+            return instance.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+        if '_cluster_sort_indexed' in instance.__dict__:
+            SortFieldDescriptor.changes += 1
+
+
+# (class, field names) => whether SortFieldDescriptors hold all of the fields
+_watched_sort_fields = {}
+
+
+def watch_sort_fields(cls, names):
+    """
+    Install SortFieldDescriptors on cls for the given attribute names, and return whether
+    assignments to all of them are now counted. Attributes that already have a descriptor (such
+    as deferred fields) are left alone.
+    """
+    try:
+        return _watched_sort_fields[cls, names]
+    except KeyError:
+        pass
+
+    watched = True
+    for name in names:
+        for klass in cls.__mro__:
+            if name in vars(klass):
+                watched = watched and isinstance(vars(klass)[name], SortFieldDescriptor)
+                break
+        else:
+            setattr(cls, name, SortFieldDescriptor(name))
+    _watched_sort_fields[cls, names] = watched
+    return watched
+
+
+class ObjectListIndex(object):
+    """
+    An index of the objects in a list, by identity and by (non-null) pk, for finding the item that
+    matches a given object in constant time. An item matches an object if they are the same python
+    object, or have the same non-null pk; we can't use a simple 'in' check due to
+    https://code.djangoproject.com/ticket/18864
+
+    If ordering (a list of fields as for sort_by_fields) is given, the index also keeps the sort
+    key of each item once the list has been sorted, so that added items can be inserted in order
+    with a binary search rather than by re-sorting the list. If the sort fields of items have
+    been changed in place since their keys were built, the next add fully re-sorts the list;
+    such changes are noticed through SortFieldDescriptors, so that each add does not have to
+    read every item.
+    """
+    def __init__(self, items, ordering=None):
+        self.items = items
+        self.ordering = ordering
+        if ordering:
+            self.sort_field_names = tuple(field.lstrip('-') for field in ordering)
+            self.get_sort_values = operator.attrgetter(*self.sort_field_names)
+        self.sort_keys = None
+        self.sort_values = None
+        # whether assignments to the sort fields of all items are counted by SortFieldDescriptor,
+        # and the count when sort_values were last known to be current
+        self.watches_sort_fields = True
+        self.sort_field_changes = SortFieldDescriptor.changes
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Re-index the list, after it has been reordered or modified other than through this index
+        """
+        self.members = {}
+        self.pks = {}
+        for item in self.items:
+            self._add_entry(item)
+        self._positions = None
+        self.sort_keys = None
+        self.sort_values = None
+        self.length = len(self.items)
+
+    def is_valid_for(self, items):
+        return items is self.items and len(items) == self.length
+
+    def _add_entry(self, item):
+        self.members[id(item)] = item
+        if item.pk is not None:
+            self.pks.setdefault(item.pk, item)
+        if self.ordering:
+            item.__dict__['_cluster_sort_indexed'] = True
+            if not watch_sort_fields(type(item), self.sort_field_names):
+                self.watches_sort_fields = False
+
+    def _remove_entry(self, item):
+        self.members.pop(id(item), None)
+        if item.pk is not None and self.pks.get(item.pk) is item:
+            del self.pks[item.pk]
+
+    def find(self, target):
+        """
+        Return the first item matching target, or None if there is none
+        """
+        item = self.members.get(id(target))
+        if item is None and target.pk is not None:
+            item = self.pks.get(target.pk)
+        return item
+
+    def _position(self, item):
+        # positions are found lazily, as inserting in order shifts the items that follow
+        if self._positions is None:
+            self._positions = dict((id(item), position) for position, item in enumerate(self.items))
+        return self._positions[id(item)]
+
+    def _replace(self, item, target):
+        position = self._position(item)
+        self._remove_entry(item)
+        del self._positions[id(item)]
+        self.items[position] = target
+        self._add_entry(target)
+        self._positions[id(target)] = position
+        if self.sort_keys is not None:
+            self.sort_values[position] = self.get_sort_values(target)
+
+    def _append(self, target):
+        if self.sort_keys is None:
+            self.items.append(target)
+            if self._positions is not None:
+                self._positions[id(target)] = len(self.items) - 1
+        else:
+            sort_key = get_sort_key(target, self.ordering)
+            position = bisect.bisect_right(self.sort_keys, sort_key)
+            self.items.insert(position, target)
+            self.sort_keys.insert(position, sort_key)
+            self.sort_values.insert(position, self.get_sort_values(target))
+            if position < len(self.items) - 1:
+                self._positions = None
+            elif self._positions is not None:
+                self._positions[id(target)] = position
+
+        self._add_entry(target)
+        self.length += 1
+
+    def _changes_sort_keys(self, targets):
+        # Return whether adding targets would replace an item with one that sorts differently
+        # (or replace one of the targets themselves). Inserting in order is then not equivalent
+        # to appending and re-sorting, so the list must be fully re-sorted.
+        seen_ids = set()
+        seen_pks = set()
+        for target in targets:
+            if id(target) in seen_ids or (target.pk is not None and target.pk in seen_pks):
+                return True
+            seen_ids.add(id(target))
+            if target.pk is not None:
+                seen_pks.add(target.pk)
+
+            item = self.find(target)
+            if item is not None and get_sort_key(target, self.ordering) != self.sort_keys[self._position(item)]:
+                return True
+        return False
+
+    def _sort_values_changed(self):
+        # Return whether the sort field values of any item have been changed in place since its
+        # sort key was built; inserting in order is then not equivalent to appending and
+        # re-sorting either. The items are only read if a sort field may have been assigned to.
+        if self.watches_sort_fields and self.sort_field_changes == SortFieldDescriptor.changes:
+            return False
+        self.sort_field_changes = SortFieldDescriptor.changes
+        return list(map(self.get_sort_values, self.items)) != self.sort_values
+
+    def add(self, targets):
+        """
+        Add targets to the list. A target that matches an item in the list replaces it, at the
+        same position; others are appended. If the index has an ordering, the list is then kept
+        sorted, as if by sort_by_fields: new items are inserted after any items with an equal
+        sort key, and the list is only fully re-sorted if an item is replaced by one with a
+        different sort key, or the sort fields of items have been changed in place.
+        """
+        if self.sort_keys is not None and (self._sort_values_changed() or self._changes_sort_keys(targets)):
+            self.sort_keys = None
+            self.sort_values = None
+
+        for target in targets:
+            item = self.find(target)
+            if item is None:
+                self._append(target)
+            else:
+                self._replace(item, target)
+
+        self.sort()
+
+    def sort(self):
+        """
+        Sort the list by the index's ordering, unless it is already being kept in order
+        """
+        if not self.ordering or self.sort_keys is not None:
+            return
+
+        sort_keys = [get_sort_key(item, self.ordering) for item in self.items]
+        # sorting positions by key is stable, as sort_by_fields is
+        order = sorted(range(len(self.items)), key=sort_keys.__getitem__)
+        self.items[:] = [self.items[i] for i in order]
+        self.sort_keys = [sort_keys[i] for i in order]
+        self.sort_values = list(map(self.get_sort_values, self.items))
+        self.sort_field_changes = SortFieldDescriptor.changes
+        self._positions = None
+
+    def remove(self, targets):
+        """
+        Remove all items matching any of targets from the list, in a single pass
+        """
+        ids = set(id(target) for target in targets)
+        pks = set(target.pk for target in targets if target.pk is not None)
+        keep = [
+            id(item) not in ids and (item.pk is None or item.pk not in pks)
+            for item in self.items
+        ]
+        if all(keep):
+            return
+
+        for item, kept in zip(self.items, keep):
+            if not kept:
+                self._remove_entry(item)
+        # filter items list in place: see http://stackoverflow.com/a/1208792/1853523
+        self.items[:] = [item for item, kept in zip(self.items, keep) if kept]
+        self.length = len(self.items)
+        # positions of the items after the first removed one have shifted
+        self._positions = None
+        # removing items leaves the rest in order
+        if self.sort_keys is not None:
+            self.sort_keys = [sort_key for sort_key, kept in zip(self.sort_keys, keep) if kept]
+            self.sort_values = [values for values, kept in zip(self.sort_values, keep) if kept]
+
+
+class PendingChanges(object):
+    """
+    Changes to a relation that have been recorded without loading its current object list: the
+    objects added (held in a list indexed by ObjectListIndex, so that adding an object again
+    replaces it) and the pks of the objects removed
+    """
+    def __init__(self):
+        self.added = []
+        self.index = ObjectListIndex(self.added)
+        self.removed_pks = set()
+
+    def add(self, targets):
+        self.index.add(targets)
+        for target in targets:
+            if target.pk is not None:
+                self.removed_pks.discard(target.pk)
+
+    def remove(self, targets):
+        self.index.remove(targets)
+        self.removed_pks.update(target.pk for target in targets if target.pk is not None)
+
+    def apply(self, items, index):
+        """
+        Apply the changes to the object list items, indexed by index
+        """
+        if self.removed_pks:
+            index.remove([item for item in items if item.pk in self.removed_pks])
+        index.add(self.added)
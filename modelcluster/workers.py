@@ -0,0 +1,63 @@
+"""
+The functions run in the worker processes of modelcluster.parallel. Worker processes that are
+not forked from the calling process (such as with the 'spawn' start method, the default on
+Windows and macOS) start with a fresh interpreter, and import this module to find the function
+to run before Django has been set up; so this module only imports what is safe to import at
+that point, and everything else once Django is set up.
+"""
+from __future__ import unicode_literals
+
+import os
+
+import django
+from django.apps import apps
+from django.conf import ENVIRONMENT_VARIABLE, UserSettingsHolder, settings
+
+
+def get_worker_settings():
+    """
+    Return the settings that a worker process needs to configure Django with: None if settings
+    are loaded from the module named by the DJANGO_SETTINGS_MODULE environment variable, which
+    worker processes inherit, or otherwise the dict of settings passed to settings.configure
+    (and any overrides of them, such as by override_settings). These must be picklable.
+    """
+    if os.environ.get(ENVIRONMENT_VARIABLE):
+        return None
+
+    holders = []
+    holder = settings._wrapped
+    while isinstance(holder, UserSettingsHolder):
+        holders.append(holder)
+        holder = holder.default_settings
+
+    worker_settings = {}
+    for holder in reversed(holders):
+        worker_settings.update((name, value) for name, value in vars(holder).items() if name.isupper())
+    return worker_settings
+
+
+def setup_worker(worker_settings):
+    """
+    Set up Django in a worker process, with settings as returned by get_worker_settings, if this
+    has not already been done (or inherited from the calling process by forking)
+    """
+    if apps.ready:
+        return
+    if worker_settings is not None and not settings.configured:
+        settings.configure(**worker_settings)
+    django.setup()
+
+
+def validate_json_chunk(worker_settings, app_label, model_name, json_data_list):
+    """
+    Decode and validate a list of JSON documents for instances of the given model, returning
+    the results of modelcluster.parallel.validate_serializable_data
+    """
+    setup_worker(worker_settings)
+
+    from modelcluster.jsonbackends import get_json_backend
+    from modelcluster.parallel import validate_serializable_data
+
+    model = apps.get_model(app_label, model_name)
+    json_backend = get_json_backend()
+    return [validate_serializable_data(model, json_backend.loads(json_data)) for json_data in json_data_list]
@@ -183,6 +183,16 @@ class Migration(migrations.Migration):
                 ('name', models.CharField(max_length=255)),
             ],
         ),
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
         migrations.CreateModel(
             name='Article',
             fields=[
@@ -192,4 +202,40 @@ class Migration(migrations.Migration):
                 ('categories', models.ManyToManyField('Category', related_name="articles_by_cateory")),
             ],
         ),
+        migrations.CreateModel(
+            name='Comment',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('body', models.TextField()),
+                ('parent', modelcluster.fields.ParentalKey(related_name='replies', blank=True, null=True, to='tests.Comment')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HouseWine',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+            },
+            bases=('tests.wine',),
+        ),
+        migrations.CreateModel(
+            name='Playlist',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Track',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('title', models.CharField(max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('playlist', modelcluster.fields.ParentalKey(related_name='tracks', to='tests.Playlist')),
+            ],
+        ),
     ]
@@ -77,6 +77,11 @@ class Wine(models.Model):
         return self.name
 
 
+class HouseWine(Wine):
+    class Meta:
+        proxy = True
+
+
 @python_2_unicode_compatible
 class Chef(models.Model):
     name = models.CharField(max_length=255)
@@ -148,3 +153,41 @@ class Category(models.Model):
 
     def __str__(self):
         return self.name
+
+
+@python_2_unicode_compatible
+class Genre(models.Model):
+    name = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+
+
+@python_2_unicode_compatible
+class Comment(ClusterableModel):
+    parent = ParentalKey('self', null=True, blank=True, related_name='replies')
+    body = models.TextField()
+
+    def __str__(self):
+        return self.body
+
+
+@python_2_unicode_compatible
+class Playlist(ClusterableModel):
+    name = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.name
+
+
+@python_2_unicode_compatible
+class Track(models.Model):
+    playlist = ParentalKey('Playlist', related_name='tracks')
+    title = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
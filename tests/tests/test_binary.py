@@ -0,0 +1,110 @@
+from __future__ import unicode_literals
+
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import TestCase
+from django.utils import timezone
+
+from modelcluster import binary
+
+from tests.models import Band, BandMember, Album, Restaurant, Dish, MenuItem, Chef, Wine, Review, Log, \
+    Article, Author
+
+
+class BinaryFormatTest(TestCase):
+    def assertEquivalentToJSON(self, data):
+        decoded = binary.loads(binary.dumps(data))
+        self.assertEqual(
+            json.loads(json.dumps(data, cls=DjangoJSONEncoder)),
+            json.loads(json.dumps(decoded, cls=DjangoJSONEncoder))
+        )
+        return decoded
+
+    def test_round_trip_values(self):
+        data = {
+            'pk': None,
+            'small': 12,
+            'medium': -1234,
+            'large': 12345678,
+            'huge': 2 ** 40,
+            'enormous': -2 ** 80,
+            'float': 1.5,
+            'true': True,
+            'false': False,
+            'text': 'Beyonc\xe9 \U0001f3b5',
+            'empty': '',
+            'price': Decimal('20.00'),
+            'date': datetime.date(1965, 12, 3),
+            'time': datetime.time(11, 1, 42, 123456),
+            'naive_datetime': datetime.datetime(2014, 8, 1, 11, 1, 42, 123456),
+            'utc_datetime': datetime.datetime(2014, 8, 1, 11, 1, 42, tzinfo=timezone.utc),
+            'offset_datetime': datetime.datetime(2014, 8, 1, 11, 1, 42, tzinfo=timezone.get_fixed_timezone(-330)),
+            'uuid': uuid.UUID('12345678123456781234567812345678'),
+            'list': [1, 'two', None, [], {}],
+            'children': [{'pk': i, 'name': 'child %d' % i} for i in range(3)],
+        }
+        decoded = self.assertEquivalentToJSON(data)
+        self.assertEqual(Decimal('20.00'), decoded['price'])
+        self.assertEqual(datetime.date(1965, 12, 3), decoded['date'])
+        self.assertEqual(data['utc_datetime'], decoded['utc_datetime'])
+        self.assertEqual(data['offset_datetime'], decoded['offset_datetime'])
+        self.assertEqual(datetime.datetime(2014, 8, 1, 11, 1, 42, 123000), decoded['naive_datetime'])
+
+    def test_key_tables_are_shared(self):
+        children = [{'pk': i, 'name': 'child'} for i in range(100)]
+        encoded = binary.dumps(children)
+        self.assertEqual(1, encoded.count(b'name'))
+        self.assertEqual(children, binary.loads(encoded))
+
+    def test_invalid_data(self):
+        self.assertRaises(binary.BinaryFormatError, binary.loads, b'{"pk": null}')
+        self.assertRaises(binary.BinaryFormatError, binary.loads, b'MCB\xff\x00')
+        encoded = binary.dumps({'pk': None, 'name': 'The Beatles'})
+        self.assertRaises(binary.BinaryFormatError, binary.loads, encoded[:-3])
+        self.assertRaises(binary.BinaryFormatError, binary.loads, encoded + b'\x00')
+
+    def test_truncated_data(self):
+        encoded = binary.dumps({
+            'pk': 300, 'name': 'x' * 200, 'price': Decimal('1.50'), 'members': [None, True, -1, 70000],
+            'date': datetime.date(2014, 8, 1), 'updated': datetime.datetime(2014, 8, 1, 11, 1, 42, 123000),
+        })
+        # every prefix of the data is rejected cleanly, whichever value it ends in
+        for length in range(len(encoded)):
+            self.assertRaises(binary.BinaryFormatError, binary.loads, encoded[:length])
+
+    def test_cluster_round_trip(self):
+        heston_blumenthal = Chef.objects.create(name="Heston Blumenthal")
+        snail_ice_cream = Dish.objects.create(name="Snail ice cream")
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        george_orwell = Author.objects.create(name='George Orwell')
+        clusters = [
+            Band(name='The Beatles', members=[
+                BandMember(name='John Lennon'),
+            ], albums=[
+                Album(name='Rubber Soul', release_date=datetime.date(1965, 12, 3), sort_order=1)
+            ]),
+            Restaurant(name="The Fat Duck", proprietor=heston_blumenthal, serves_hot_dogs=False, menu_items=[
+                MenuItem(dish=snail_ice_cream, price='20.00', recommended_wine=chateauneuf),
+                MenuItem(dish=snail_ice_cream, price=Decimal('3.50')),
+            ], reviews=[
+                Review(author='Michael Winner', body='Rubbish.')
+            ]),
+            Log(time=datetime.datetime(2014, 8, 1, 11, 1, 42, tzinfo=timezone.utc), data="Wagtail 0.5 released"),
+            Article(title='Animal Farm', authors=[george_orwell]),
+        ]
+
+        for cluster in clusters:
+            cluster.save()
+            encoded = cluster.to_bytes()
+            self.assertEquivalentToJSON(cluster.serializable_data())
+
+            model = type(cluster)
+            self.assertEqual(
+                model.from_json(cluster.to_json()).serializable_data(),
+                model.from_bytes(encoded).serializable_data()
+            )
+            self.assertLess(len(encoded), len(cluster.to_json()))
@@ -0,0 +1,438 @@
+from __future__ import unicode_literals
+
+import datetime
+import logging
+import re
+from decimal import Decimal
+
+from django.db import IntegrityError, connection
+from django.db.models.signals import post_save
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from modelcluster.bulk import use_bulk_commit
+
+from tests.models import Album, Band, BandMember, Comment, Dish, MenuItem, Playlist, Restaurant, Track
+
+
+def is_update_of(sql, table):
+    # Django 1.8 records sqlite queries as "QUERY = '...' - PARAMS = (...)", so the statement is
+    # searched for rather than matched at the start of the string
+    return re.search(r'\bUPDATE "%s"' % table, sql) is not None
+
+
+def get_statement_type(sql):
+    # the first keyword of the statement, found as for is_update_of
+    return re.search(r'\b(SELECT|INSERT|UPDATE|DELETE|SAVEPOINT|RELEASE)\b', sql).group(1)
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super(RecordingHandler, self).__init__(level=logging.DEBUG)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class BulkCommitTest(TestCase):
+    def setUp(self):
+        self.beatles = Band.objects.create(name='The Beatles')
+        self.members = [BandMember.objects.create(band=self.beatles, name='Member %d' % i) for i in range(10)]
+        self.saved_members = []
+        self.update_fields = []
+
+    def record_save(self, sender, instance, **kwargs):
+        self.saved_members.append(instance.name)
+        self.update_fields.append(kwargs['update_fields'])
+
+    def test_use_bulk_commit(self):
+        self.assertTrue(use_bulk_commit(BandMember))
+        self.assertFalse(use_bulk_commit(BandMember, send_signals=True))
+        # ClusterableModels save their own child relations
+        self.assertFalse(use_bulk_commit(Comment))
+        with override_settings(MODELCLUSTER_COMMIT_SIGNALS=True):
+            self.assertFalse(use_bulk_commit(BandMember))
+
+    def test_commit(self):
+        beatles = Band.objects.get(pk=self.beatles.pk)
+        members = list(beatles.members.all())
+        beatles.members.remove(*members[7:])
+        beatles.members.add(BandMember(name='New member 1'), BandMember(name='New member 2'))
+        # the relation is now held in memory
+        for member in list(beatles.members.all())[:5]:
+            member.name = member.name.upper()
+
+        # save the band; find the live pks; delete 3 members; insert the 2 new ones individually,
+        # as sqlite cannot return the pks of bulk inserts; update the 5 changed members in one
+        # statement, leaving the 2 unchanged ones alone
+        with self.assertNumQueries(6):
+            beatles.save()
+
+        self.assertEqual(
+            ['MEMBER 0', 'MEMBER 1', 'MEMBER 2', 'MEMBER 3', 'MEMBER 4', 'Member 5', 'Member 6',
+             'New member 1', 'New member 2'],
+            [member.name for member in BandMember.objects.filter(band=beatles).order_by('pk')]
+        )
+        self.assertFalse(BandMember.objects.filter(pk__in=[member.pk for member in members[7:]]).exists())
+        self.assertTrue(all(member.pk is not None for member in beatles.members.all()))
+
+    def test_changed_objects(self):
+        beatles = Band.objects.get(pk=self.beatles.pk)
+        self.assertEqual([], beatles.members.changed_objects())
+
+        new_member = BandMember(name='New member')
+        beatles.members.add(new_member)
+        member = beatles.members.get(id=self.members[3].pk)
+        member.name = 'Changed'
+        self.assertEqual([member, new_member], beatles.members.changed_objects())
+
+        beatles.save()
+        self.assertEqual([], beatles.members.changed_objects())
+
+    def test_assigned_objects_compared_with_loaded_values(self):
+        for i in range(10, 50):
+            BandMember.objects.create(band=self.beatles, name='Member %d' % i)
+        beatles = Band.objects.get(pk=self.beatles.pk)
+        members = list(beatles.members.all())
+        members[0].name = 'Changed'
+        beatles.members = members
+        self.assertEqual([members[0]], beatles.members.changed_objects())
+
+        # find the live members; update the changed one
+        with CaptureQueriesContext(connection) as context:
+            beatles.members.commit(send_signals=True)
+        self.assertEqual(['SELECT', 'UPDATE'], [get_statement_type(query['sql']) for query in context.captured_queries])
+        self.assertEqual('Changed', BandMember.objects.get(pk=members[0].pk).name)
+
+    def test_commit_skips_unchanged_objects(self):
+        beatles = Band.objects.get(pk=self.beatles.pk)
+        # load the relation into memory
+        beatles.members.add()
+        member = beatles.members.get(id=self.members[3].pk)
+        member.name = 'Changed'
+
+        with CaptureQueriesContext(connection) as context:
+            beatles.save()
+
+        updates = [
+            query['sql'] for query in context.captured_queries if is_update_of(query['sql'], 'tests_bandmember')
+        ]
+        self.assertEqual(1, len(updates))
+        self.assertIn('"name" = CASE', updates[0])
+        self.assertNotIn('"band_id"', updates[0].split('WHERE')[0])
+        self.assertEqual('Changed', BandMember.objects.get(pk=member.pk).name)
+
+    def test_loaded_objects_compared_without_reading_rows(self):
+        beatles = Band.objects.get(pk=self.beatles.pk)
+        beatles.members.add()
+        beatles.members.get(id=self.members[3].pk).name = 'Changed'
+
+        # only the pks of the live members are read
+        with CaptureQueriesContext(connection) as context:
+            beatles.members.commit()
+        selects = [query['sql'] for query in context.captured_queries if get_statement_type(query['sql']) == 'SELECT']
+        self.assertEqual(1, len(selects))
+        self.assertNotIn('"name"', selects[0])
+        self.assertEqual('Changed', BandMember.objects.get(pk=self.members[3].pk).name)
+
+        # the rows of objects built from serialized data are read to compare them with
+        beatles = Band.from_serializable_data(beatles.serializable_data())
+        with CaptureQueriesContext(connection) as context:
+            beatles.members.commit()
+        selects = [query['sql'] for query in context.captured_queries if get_statement_type(query['sql']) == 'SELECT']
+        self.assertEqual(2, len(selects))
+        self.assertIn('"name"', selects[1])
+
+    def test_auto_now_fields_updated_with_changes(self):
+        playlist = Playlist.objects.create(name='Road trip')
+        tracks = [Track.objects.create(playlist=playlist, title='Track %d' % i) for i in range(2)]
+        long_ago = timezone.now() - datetime.timedelta(days=1)
+        Track.objects.all().update(updated_at=long_ago)
+
+        for send_signals in (False, True):
+            playlist = Playlist.objects.get(pk=playlist.pk)
+            playlist.tracks.add()
+            playlist.tracks.get(id=tracks[0].pk).title = 'Changed %s' % send_signals
+            playlist.tracks.commit(send_signals=send_signals)
+
+            # the changed track gets a new timestamp; the unchanged one is not written
+            self.assertGreater(Track.objects.get(pk=tracks[0].pk).updated_at, long_ago)
+            self.assertEqual(long_ago, Track.objects.get(pk=tracks[1].pk).updated_at)
+            Track.objects.all().update(updated_at=long_ago)
+
+    def test_revision_data_compared_to_database(self):
+        # objects built from serialized data are written if they differ from the database,
+        # even if they are unchanged since they were loaded
+        data = self.beatles.serializable_data()
+        BandMember.objects.filter(pk=self.members[2].pk).update(name='Renamed')
+
+        beatles = Band.from_serializable_data(data)
+        self.assertEqual([], beatles.members.changed_objects())
+        beatles.save()
+        self.assertEqual('Member 2', BandMember.objects.get(pk=self.members[2].pk).name)
+
+    def test_update_batches(self):
+        beatles = Band.objects.get(pk=self.beatles.pk)
+        members = [BandMember(name='Member %d' % i) for i in range(300)]
+        beatles.members = members
+        beatles.save()
+
+        for member in members:
+            member.name = member.name.upper()
+        beatles.members = members
+        with CaptureQueriesContext(connection) as context:
+            beatles.save()
+
+        updates = [query for query in context.captured_queries if is_update_of(query['sql'], 'tests_bandmember')]
+        # only the changed column is written
+        batch_size = connection.ops.bulk_batch_size(['pk', 'name', 'name'], members)
+        self.assertEqual((300 + batch_size - 1) // batch_size, len(updates))
+        self.assertEqual(
+            ['MEMBER %d' % i for i in range(300)],
+            [member.name for member in BandMember.objects.filter(band=beatles).order_by('pk')]
+        )
+
+    def test_recreate_and_move_objects_with_pks(self):
+        # objects with pks that are not in the relation are inserted if they don't exist, and
+        # moved to this instance if they do
+        data = self.beatles.serializable_data()
+        BandMember.objects.filter(pk__in=[member.pk for member in self.members[5:]]).delete()
+        wings = Band.objects.create(name='Wings')
+        moved_member = BandMember.objects.get(pk=self.members[0].pk)
+        moved_member.band = wings
+        moved_member.save()
+
+        beatles = Band.from_serializable_data(data)
+        beatles.save()
+        self.assertEqual(
+            [member.pk for member in self.members],
+            list(BandMember.objects.filter(band=self.beatles).order_by('pk').values_list('pk', flat=True))
+        )
+        self.assertEqual(0, wings.members.count())
+
+    def test_field_values(self):
+        dish = Dish.objects.create(name='Snail ice cream')
+        fat_duck = Restaurant(name='The Fat Duck', menu_items=[MenuItem(dish=dish, price=Decimal('20.00'))])
+        fat_duck.save()
+
+        fat_duck = Restaurant.objects.get(pk=fat_duck.pk)
+        menu_item = fat_duck.menu_items.all()[0]
+        menu_item.price = Decimal('25.50')
+        fat_duck.menu_items = [menu_item]
+        fat_duck.save()
+        self.assertEqual(Decimal('25.50'), MenuItem.objects.get(pk=menu_item.pk).price)
+
+    def test_signals(self):
+        post_save.connect(self.record_save, sender=BandMember)
+        try:
+            beatles = Band.objects.get(pk=self.beatles.pk)
+            beatles.members = list(beatles.members.all())[:2]
+            beatles.save()
+            self.assertEqual([], self.saved_members)
+
+            with override_settings(MODELCLUSTER_COMMIT_SIGNALS=True):
+                members = list(beatles.members.all())
+                members[0].name = 'Changed 0'
+                beatles.members = members
+                beatles.save()
+            self.assertEqual(['Changed 0'], self.saved_members)
+
+            # objects read from the live queryset and assigned back unchanged are not saved
+            self.saved_members = []
+            beatles.members = list(beatles.members.all())
+            beatles.members.commit(send_signals=True)
+            self.assertEqual([], self.saved_members)
+
+            # objects loaded through the relation are only saved if changed, and then only
+            # their changed fields
+            self.saved_members = []
+            self.update_fields = []
+            beatles.members.add()
+            member = beatles.members.get(name='Member 1')
+            member.name = 'Changed'
+            beatles.members.commit(send_signals=True)
+            self.assertEqual(['Changed'], self.saved_members)
+            self.assertEqual([frozenset(['name'])], self.update_fields)
+        finally:
+            post_save.disconnect(self.record_save, sender=BandMember)
+
+
+class PendingChangesTest(TestCase):
+    def setUp(self):
+        self.beatles = Band.objects.create(name='The Beatles')
+        self.members = [BandMember.objects.create(band=self.beatles, name='Member %d' % i) for i in range(10)]
+        self.saved_members = []
+
+    def record_save(self, sender, instance, **kwargs):
+        self.saved_members.append(instance.name)
+
+    def test_add_without_loading(self):
+        beatles = Band.objects.get(pk=self.beatles.pk)
+        beatles.members.defer_loading()
+        with self.assertNumQueries(0):
+            beatles.members.add(BandMember(name='New member 1'))
+            beatles.members.create(name='New member 2')
+        self.assertEqual(['New member 1', 'New member 2'], [member.name for member in beatles.members.changed_objects()])
+
+        # update the band, and insert the 2 new members individually, as sqlite cannot return
+        # the pks of bulk inserts
+        with self.assertNumQueries(3):
+            beatles.save()
+        self.assertEqual(12, BandMember.objects.filter(band=beatles).count())
+
+        # the relation stays in pending mode
+        with self.assertNumQueries(2):
+            beatles.members.add(BandMember(name='New member 3'))
+            beatles.save()
+        self.assertEqual(13, BandMember.objects.filter(band=beatles).count())
+
+    def test_read_merges_pending_changes(self):
+        beatles = Band.objects.get(pk=self.beatles.pk)
+        beatles.members.defer_loading()
+        renamed_member = BandMember(pk=self.members[1].pk, name='Renamed')
+        beatles.members.add(BandMember(name='New member'), renamed_member)
+        beatles.members.remove(self.members[0], self.members[2])
+        # adding an object again cancels its removal
+        beatles.members.add(self.members[2])
+
+        self.assertEqual(
+            ['Renamed', 'Member 2'] + ['Member %d' % i for i in range(3, 10)] + ['New member'],
+            [member.name for member in beatles.members.all()]
+        )
+        # the relation is now held in memory, and saved as a whole
+        beatles.save()
+        self.assertEqual(
+            ['Renamed', 'Member 2'] + ['Member %d' % i for i in range(3, 10)] + ['New member'],
+            [member.name for member in BandMember.objects.filter(band=beatles).order_by('pk')]
+        )
+
+    def test_commit_pending_changes(self):
+        wings = Band.objects.create(name='Wings')
+        other_member = BandMember.objects.create(band=wings, name='Other member')
+
+        beatles = Band.objects.get(pk=self.beatles.pk)
+        beatles.members.defer_loading()
+        renamed_member = BandMember(pk=self.members[1].pk, name='Renamed')
+        beatles.members.add(renamed_member)
+        # removing an object that is not in the relation has no effect
+        beatles.members.remove(self.members[0], other_member)
+        beatles.save()
+
+        self.assertEqual(
+            ['Renamed'] + ['Member %d' % i for i in range(2, 10)],
+            [member.name for member in BandMember.objects.filter(band=beatles).order_by('pk')]
+        )
+        self.assertTrue(BandMember.objects.filter(pk=other_member.pk, band=wings).exists())
+
+        # objects from another relation are moved to this one
+        beatles.members.add(other_member)
+        beatles.save()
+        self.assertEqual(0, wings.members.count())
+
+    def test_commit_pending_changes_with_signals(self):
+        post_save.connect(self.record_save, sender=BandMember)
+        try:
+            beatles = Band.objects.get(pk=self.beatles.pk)
+            beatles.members.defer_loading()
+            beatles.members.add(BandMember(name='New member'))
+            beatles.members.remove(self.members[0])
+            beatles.members.commit(send_signals=True)
+            self.assertEqual(['New member'], self.saved_members)
+        finally:
+            post_save.disconnect(self.record_save, sender=BandMember)
+
+        self.assertEqual(
+            ['Member %d' % i for i in range(1, 10)] + ['New member'],
+            [member.name for member in BandMember.objects.filter(band=beatles).order_by('pk')]
+        )
+
+
+class ClusterSaveTest(TestCase):
+    def setUp(self):
+        self.beatles = Band.objects.create(name='The Beatles')
+        self.members = [BandMember.objects.create(band=self.beatles, name='Member %d' % i) for i in range(3)]
+        self.albums = [Album.objects.create(band=self.beatles, name='Album %d' % i, sort_order=i) for i in range(3)]
+
+    def test_writes_are_ordered_across_relations(self):
+        beatles = Band.objects.get(pk=self.beatles.pk)
+        members = list(beatles.members.all())
+        members[0].name = 'Renamed member'
+        beatles.members = [members[0], members[1], BandMember(pk=1000, name='New member')]
+        albums = list(beatles.albums.all())
+        albums[0].name = 'Renamed album'
+        beatles.albums = [albums[0], Album(pk=1000, name='New album', sort_order=4)]
+
+        with CaptureQueriesContext(connection) as context:
+            beatles.save()
+
+        statement_types = [get_statement_type(query['sql']) for query in context.captured_queries]
+        writes = [
+            statement_type for statement_type in statement_types
+            if statement_type not in ('SELECT', 'SAVEPOINT', 'RELEASE')
+        ]
+        # the band update, then the deletions, inserts and updates for both relations
+        self.assertEqual(['UPDATE', 'DELETE', 'DELETE', 'INSERT', 'INSERT', 'UPDATE', 'UPDATE'], writes)
+        # the test case's transaction is already open, so no savepoint is created
+        self.assertNotIn('SAVEPOINT', statement_types)
+
+        self.assertEqual(
+            ['Renamed member', 'Member 1', 'New member'],
+            [member.name for member in BandMember.objects.filter(band=beatles).order_by('pk')]
+        )
+        self.assertEqual(
+            ['Renamed album', 'New album'],
+            [album.name for album in Album.objects.filter(band=beatles).order_by('pk')]
+        )
+
+    def test_statement_count_is_logged(self):
+        logger = logging.getLogger('modelcluster')
+        handler = RecordingHandler()
+        old_level = logger.level
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        try:
+            beatles = Band.objects.get(pk=self.beatles.pk)
+            beatles.members.add(BandMember(name='New member'))
+            with self.assertNumQueries(3):
+                beatles.save()
+        finally:
+            logger.removeHandler(handler)
+            logger.setLevel(old_level)
+
+        # update the band; find the live rows; insert the new member
+        self.assertEqual(["Saved Band %r with 3 SQL statements" % beatles.pk], handler.messages)
+
+
+class ClusterSaveTransactionTest(TransactionTestCase):
+    def test_failed_save_is_rolled_back(self):
+        beatles = Band.objects.create(name='The Beatles')
+        BandMember.objects.create(band=beatles, name='John Lennon')
+
+        beatles.name = 'The Silver Beetles'
+        beatles.members = [BandMember(name=None)]
+        with self.assertRaises(IntegrityError):
+            beatles.save()
+
+        self.assertEqual('The Beatles', Band.objects.get(pk=beatles.pk).name)
+        self.assertEqual(['John Lennon'], [member.name for member in BandMember.objects.filter(band=beatles)])
+
+    def test_failed_save_keeps_child_relations(self):
+        beatles = Band.objects.create(name='The Beatles')
+        BandMember.objects.create(band=beatles, name='John Lennon')
+
+        beatles.members = [BandMember(name=None)]
+        beatles.albums = [Album(name='Help!', sort_order=1)]
+        with self.assertRaises(IntegrityError):
+            beatles.save()
+
+        # the edits are still held in memory, and can be saved once corrected
+        self.assertEqual([None], [member.name for member in beatles.members.all()])
+        self.assertEqual(['Help!'], [album.name for album in beatles.albums.all()])
+        self.assertFalse(Album.objects.filter(band=beatles).exists())
+
+        beatles.members.all()[0].name = 'Paul McCartney'
+        beatles.save()
+        self.assertEqual(['Paul McCartney'], [member.name for member in BandMember.objects.filter(band=beatles)])
+        self.assertEqual(['Help!'], [album.name for album in Album.objects.filter(band=beatles)])
@@ -0,0 +1,130 @@
+from __future__ import unicode_literals
+
+from unittest import skipUnless
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.test import TestCase, TransactionTestCase
+
+from modelcluster.cache import ForeignKeyCache, disable_foreign_key_cache, enable_foreign_key_cache
+from modelcluster.models import ReferenceResolver
+
+from tests.models import Chef, Dish, HouseWine, MenuItem, Restaurant, Review, Wine
+
+
+class ForeignKeyCacheTest(TestCase):
+    def setUp(self):
+        self.cache = enable_foreign_key_cache()
+
+    def tearDown(self):
+        disable_foreign_key_cache()
+
+    def test_lru_eviction(self):
+        cache = ForeignKeyCache(max_size=2)
+        cache.set('default', Dish, 'id', 1, True)
+        cache.set('default', Dish, 'id', 2, False)
+        self.assertTrue(cache.get('default', Dish, 'id', 1))
+        cache.set('default', Dish, 'id', 3, True)
+
+        # 2 was the least recently used entry
+        self.assertEqual(None, cache.get('default', Dish, 'id', 2))
+        self.assertTrue(cache.get('default', Dish, 'id', 1))
+        self.assertTrue(cache.get('default', Dish, 'id', 3))
+        self.assertEqual(2, len(cache))
+        self.assertEqual(3, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_timeout(self):
+        cache = ForeignKeyCache(timeout=0)
+        cache.set('default', Dish, 'id', 1, True)
+        self.assertEqual(None, cache.get('default', Dish, 'id', 1))
+
+    def test_checks_are_cached(self):
+        heston_blumenthal = Chef.objects.create(name="Heston Blumenthal")
+        snail_ice_cream = Dish.objects.create(name="Snail ice cream")
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        fat_duck_json = Restaurant(name="The Fat Duck", proprietor=heston_blumenthal, menu_items=[
+            MenuItem(dish=snail_ice_cream, price='20.00', recommended_wine=chateauneuf)
+        ]).to_json()
+
+        with self.assertNumQueries(3):
+            Restaurant.from_json(fat_duck_json)
+        self.assertEqual(0, self.cache.hits)
+        self.assertEqual(3, self.cache.misses)
+
+        with self.assertNumQueries(0):
+            fat_duck = Restaurant.from_json(fat_duck_json)
+        self.assertEqual(heston_blumenthal.pk, fat_duck.proprietor_id)
+        self.assertEqual(3, self.cache.hits)
+
+    def test_delete_invalidates_entries(self):
+        snail_ice_cream = Dish.objects.create(name="Snail ice cream")
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        fat_duck_json = Restaurant(name="The Fat Duck", menu_items=[
+            MenuItem(dish=snail_ice_cream, price='20.00', recommended_wine=chateauneuf)
+        ]).to_json()
+        Restaurant.from_json(fat_duck_json)
+
+        chateauneuf.delete()
+        with self.assertNumQueries(1):
+            fat_duck = Restaurant.from_json(fat_duck_json)
+        self.assertEqual(None, fat_duck.menu_items.all()[0].recommended_wine_id)
+
+    def test_delete_through_proxy_invalidates_entries(self):
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        wine_field = MenuItem._meta.get_field('recommended_wine')
+        self.assertTrue(ReferenceResolver().foreign_key_exists(wine_field, chateauneuf.pk))
+
+        HouseWine.objects.get(pk=chateauneuf.pk).delete()
+        self.assertEqual(None, self.cache.get('default', Wine, 'id', chateauneuf.pk))
+        self.assertFalse(ReferenceResolver().foreign_key_exists(wine_field, chateauneuf.pk))
+
+    def test_receivers_are_connected_for_cached_models(self):
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        self.assertFalse(post_delete.has_listeners(Wine))
+
+        wine_field = MenuItem._meta.get_field('recommended_wine')
+        ReferenceResolver().foreign_key_exists(wine_field, chateauneuf.pk)
+        self.assertTrue(post_delete.has_listeners(Wine))
+        self.assertTrue(post_delete.has_listeners(HouseWine))
+        # models with no cached checks can still be deleted without being fetched
+        self.assertFalse(post_delete.has_listeners(Dish))
+
+        disable_foreign_key_cache()
+        self.assertFalse(post_delete.has_listeners(Wine))
+
+    def test_save_invalidates_entries(self):
+        fat_duck = Restaurant.objects.create(name="The Fat Duck")
+        # Review.place is a ParentalKey to Place
+        place_field = Review._meta.get_field('place')
+        resolver = ReferenceResolver()
+        self.assertTrue(resolver.foreign_key_exists(place_field, fat_duck.pk))
+        self.assertFalse(resolver.foreign_key_exists(place_field, fat_duck.pk + 1))
+
+        # creating a Restaurant also creates a Place, so the cached result must be invalidated
+        Restaurant.objects.create(id=fat_duck.pk + 1, name="The Chip Shop")
+        self.assertTrue(ReferenceResolver().foreign_key_exists(place_field, fat_duck.pk + 1))
+
+
+class ForeignKeyCacheTransactionTest(TransactionTestCase):
+    def setUp(self):
+        self.cache = enable_foreign_key_cache()
+
+    def tearDown(self):
+        disable_foreign_key_cache()
+
+    @skipUnless(hasattr(transaction, 'on_commit'), "transaction.on_commit requires Django 1.9")
+    def test_entries_are_invalidated_on_commit(self):
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        wine_field = MenuItem._meta.get_field('recommended_wine')
+        self.assertTrue(ReferenceResolver().foreign_key_exists(wine_field, chateauneuf.pk))
+
+        with transaction.atomic():
+            chateauneuf_pk = chateauneuf.pk
+            chateauneuf.delete()
+            self.assertEqual(None, self.cache.get('default', Wine, 'id', chateauneuf_pk))
+            # another connection, which can't see the deletion yet, finds the wine
+            self.cache.set('default', Wine, 'id', chateauneuf_pk, True)
+
+        self.assertEqual(None, self.cache.get('default', Wine, 'id', chateauneuf_pk))
+        self.assertFalse(ReferenceResolver().foreign_key_exists(wine_field, chateauneuf_pk))
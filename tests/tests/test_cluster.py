@@ -6,6 +6,8 @@ from django.db import IntegrityError
 from tests.models import Band, BandMember, Restaurant, Review, Album, \
     Article, Author, Category
 
+from modelcluster.utils import ObjectListIndex, sort_by_fields
+
 
 class ClusterTest(TestCase):
     def test_can_create_cluster(self):
@@ -88,6 +90,140 @@ class ClusterTest(TestCase):
         self.assertEqual(2, beatles.members.count())
         self.assertEqual('George Harrison', george.name)
 
+    def test_add_replaces_matching_items(self):
+        beatles = Band(name='The Beatles')
+        beatles.save()
+        john = BandMember.objects.create(band=beatles, name='John Lennon')
+        paul = BandMember(name='Paul McCartney')
+        beatles.members.add(paul)
+
+        # an object with the same pk replaces the existing one, in place
+        renamed_john = BandMember(pk=john.pk, name='John Winston Lennon')
+        beatles.members.add(renamed_john)
+        self.assertEqual(['John Winston Lennon', 'Paul McCartney'], [member.name for member in beatles.members.all()])
+        self.assertIs(renamed_john, beatles.members.all()[0])
+
+        # removing by pk or identity is a single pass over the list
+        ringo = BandMember(name='Ringo Starr')
+        beatles.members.add(ringo, BandMember(name='George Harrison'))
+        beatles.members.remove(BandMember(pk=john.pk), ringo)
+        self.assertEqual(['Paul McCartney', 'George Harrison'], [member.name for member in beatles.members.all()])
+
+        # the index is rebuilt if the object list is modified directly
+        beatles.members.get_object_list().insert(0, ringo)
+        beatles.members.add(ringo)
+        self.assertEqual(
+            ['Ringo Starr', 'Paul McCartney', 'George Harrison'], [member.name for member in beatles.members.all()]
+        )
+
+        beatles.save()
+        beatles.members.add(BandMember(pk=paul.pk, name='James Paul McCartney'))
+        self.assertEqual(
+            ['Ringo Starr', 'James Paul McCartney', 'George Harrison'],
+            [member.name for member in beatles.members.all()]
+        )
+
+    def test_add_many_items(self):
+        beatles = Band(name='The Beatles')
+        members = [BandMember(name='Member %d' % i) for i in range(3000)]
+        beatles.members = members
+        beatles.members.add(*members[:10])
+        self.assertEqual(3000, beatles.members.count())
+        beatles.members.remove(*members[1000:])
+        self.assertEqual(members[:1000], list(beatles.members.all()))
+
+    def test_add_keeps_ordering(self):
+        beatles = Band(name='The Beatles')
+        sort_orders = [3, None, 1, 2, 1, None, 3, 0]
+        albums = [Album(name='Album %d' % i, sort_order=sort_order) for i, sort_order in enumerate(sort_orders)]
+        for album in albums:
+            beatles.albums.add(album)
+        created_album = beatles.albums.create(name='Created album', sort_order=1)
+
+        # the same order as a stable sort with None first
+        expected = albums + [created_album]
+        sort_by_fields(expected, ['sort_order'])
+        self.assertEqual(expected, list(beatles.albums.all()))
+
+        # changing the sort field of an existing item re-sorts the list
+        albums[0].sort_order = -1
+        beatles.albums.add(albums[0])
+        self.assertEqual([albums[1], albums[5], albums[0]], list(beatles.albums.all())[:3])
+
+        beatles.albums.remove(albums[1], albums[2])
+        last_album = Album(name='Last album', sort_order=4)
+        beatles.albums.add(last_album)
+        expected = [album for album in expected if album not in (albums[1], albums[2])] + [last_album]
+        sort_by_fields(expected, ['sort_order'])
+        self.assertEqual(expected, list(beatles.albums.all()))
+
+    def test_add_after_changing_sort_field_in_place(self):
+        beatles = Band(name='The Beatles')
+        albums = [Album(name='Album %d' % i, sort_order=i) for i in range(5)]
+        beatles.albums.add(*albums)
+
+        # the change is picked up by the next add, as a full sort would
+        albums[0].sort_order = 10
+        albums[3].sort_order = None
+        new_album = Album(name='New album', sort_order=2)
+        beatles.albums.add(new_album)
+
+        expected = albums + [new_album]
+        sort_by_fields(expected, ['sort_order'])
+        self.assertEqual(expected, list(beatles.albums.all()))
+        self.assertEqual(
+            ['Album 3', 'Album 1', 'Album 2', 'New album', 'Album 4', 'Album 0'],
+            [album.name for album in beatles.albums.all()]
+        )
+
+        # changes made after the last add are left for the next one, as before
+        albums[4].sort_order = -1
+        self.assertEqual('Album 4', list(beatles.albums.all())[4].name)
+
+    def test_add_after_changing_sort_field_to_equal_value(self):
+        beatles = Band(name='The Beatles')
+        album_a = Album(name='a', sort_order=1)
+        album_b = Album(name='b', sort_order=3)
+        beatles.albums.add(album_a, album_b)
+
+        # b now sorts with a, ahead of the album added after it
+        album_b.sort_order = 1
+        beatles.albums.add(Album(name='c', sort_order=1))
+        self.assertEqual(['a', 'b', 'c'], [album.name for album in beatles.albums.all()])
+
+    def test_object_list_index_ordering(self):
+        ordering = ['sort_order', '-name']
+        albums = [
+            Album(name='A', sort_order=1), Album(name='B', sort_order=None), Album(name='C', sort_order=1),
+            Album(name='A', sort_order=None), Album(name='B', sort_order=1), Album(name='C', sort_order=1),
+        ]
+        items = []
+        index = ObjectListIndex(items, ordering)
+        for album in albums:
+            index.add([album])
+
+        expected = list(albums)
+        sort_by_fields(expected, ordering)
+        self.assertEqual(expected, items)
+
+    def test_object_list_index_remove(self):
+        albums = [Album(pk=i, name='Album %d' % i, sort_order=i) for i in range(5)]
+        items = []
+        index = ObjectListIndex(items, ['sort_order'])
+        index.add(albums)
+
+        index.remove([albums[1], Album(pk=3)])
+        self.assertEqual([albums[0], albums[2], albums[4]], items)
+        self.assertEqual(None, index.find(albums[1]))
+        self.assertEqual(None, index.find(Album(pk=3)))
+        self.assertIs(albums[4], index.find(Album(pk=4)))
+        self.assertTrue(index.is_valid_for(items))
+
+        # replacing an item after a removal puts it in the right position
+        replacement = Album(pk=4, name='Replacement', sort_order=4)
+        index.add([replacement, Album(name='New', sort_order=3)])
+        self.assertEqual(['Album 0', 'Album 2', 'New', 'Replacement'], [album.name for album in items])
+
     def test_can_pass_child_relations_as_constructor_kwargs(self):
         beatles = Band(name='The Beatles', members=[
             BandMember(name='John Lennon'),
@@ -280,6 +416,22 @@ class ClusterTest(TestCase):
         self.assertEqual(error.obj, Instrument.banana.field)
         self.assertEqual(error.msg, "Field defines a relation with model 'Banana', which is either not installed, or is abstract.")
 
+    def test_meta_ordering_with_add(self):
+        beatles = Band(name='The Beatles', albums=[
+            Album(name='Please Please Me', sort_order=2),
+            Album(name='Abbey Road', sort_order=3),
+        ])
+        with_the_beatles = Album(name='With The Beatles', sort_order=4)
+        beatles.albums.add(with_the_beatles)
+        with_the_beatles.sort_order = 1
+        beatles.albums.add(with_the_beatles)
+
+        albums = [album.name for album in beatles.albums.all()]
+        self.assertEqual(['With The Beatles', 'Please Please Me', 'Abbey Road'], albums)
+
+        beatles.albums.remove(with_the_beatles)
+        self.assertEqual(['Please Please Me', 'Abbey Road'], [album.name for album in beatles.albums.all()])
+
     def test_parentalm2mfield(self):
         article = Article(title="Test Title")
         author_1 = Author(name="Author 1")
@@ -302,6 +454,9 @@ class ClusterTest(TestCase):
         )
         self.assertEqual(article.authors.count(), 3)
 
+        article.authors.add(author_3)
+        self.assertEqual(article.authors.count(), 3)
+
         article.authors.remove(author_3)
         self.assertEqual(
             ['Author 1', 'Author 2'],
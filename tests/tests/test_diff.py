@@ -0,0 +1,111 @@
+from __future__ import unicode_literals
+
+import copy
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import TestCase
+
+from modelcluster.diff import cluster_diff, cluster_patch
+
+from tests.models import Band, BandMember, Album, Article, Author
+
+
+class ClusterDiffTest(TestCase):
+    def assertPatchable(self, old_data, new_data):
+        old_copy = copy.deepcopy(old_data)
+        diff = cluster_diff(old_data, new_data)
+        self.assertEqual(new_data, cluster_patch(old_data, diff))
+        # the diff must survive being stored as JSON
+        stored_diff = json.loads(json.dumps(diff, cls=DjangoJSONEncoder))
+        self.assertEqual(
+            json.loads(json.dumps(new_data, cls=DjangoJSONEncoder)),
+            json.loads(json.dumps(cluster_patch(old_data, stored_diff), cls=DjangoJSONEncoder))
+        )
+        # the original data must not be modified
+        self.assertEqual(old_copy, old_data)
+        return diff
+
+    def setUp(self):
+        self.beatles = Band(name='The Beatles', members=[
+            BandMember(name='John Lennon'),
+            BandMember(name='Paul McCartney'),
+            BandMember(name='George Harrison'),
+        ], albums=[
+            Album(name='Please Please Me', sort_order=1),
+            Album(name='With The Beatles', sort_order=2),
+        ])
+        self.beatles.save()
+        self.old_data = self.beatles.serializable_data()
+
+    def test_no_changes(self):
+        self.assertEqual({}, cluster_diff(self.old_data, self.beatles.serializable_data()))
+
+    def test_field_change(self):
+        self.beatles.name = 'The Silver Beetles'
+        diff = self.assertPatchable(self.old_data, self.beatles.serializable_data())
+        self.assertEqual({'fields': {'name': 'The Silver Beetles'}}, diff)
+
+    def test_child_field_change(self):
+        paul = self.beatles.members.get(name='Paul McCartney')
+        paul.name = 'Sir Paul McCartney'
+        self.beatles.members.add(paul)
+        diff = self.assertPatchable(self.old_data, self.beatles.serializable_data())
+        self.assertEqual({'relations': {'members': {'changed': [[1, {'fields': {'name': 'Sir Paul McCartney'}}]]}}}, diff)
+
+    def test_insert_remove_and_reorder_children(self):
+        john, paul, george = self.beatles.members.all()
+        self.beatles.members = [george, BandMember(name='Ringo Starr'), john]
+        diff = self.assertPatchable(self.old_data, self.beatles.serializable_data())
+        members_diff = diff['relations']['members']
+        self.assertEqual([1], members_diff['removed'])
+        self.assertEqual([2, 0], members_diff['order'])
+        self.assertEqual('Ringo Starr', members_diff['inserted'][0][1]['name'])
+
+    def test_unsaved_children_are_matched_by_position(self):
+        old_data = {'pk': None, 'name': 'The Beatles', 'members': [
+            {'pk': None, 'name': 'John Lennon', 'band': None},
+            {'pk': None, 'name': 'Paul McCartney', 'band': None},
+        ]}
+        new_data = copy.deepcopy(old_data)
+        new_data['members'][1]['name'] = 'Sir Paul McCartney'
+        diff = self.assertPatchable(old_data, new_data)
+        self.assertEqual({'relations': {'members': {'changed': [[1, {'fields': {'name': 'Sir Paul McCartney'}}]]}}}, diff)
+
+    def test_nested_clusters(self):
+        old_data = {'pk': 1, 'title': 'Menu', 'sections': [
+            {'pk': 1, 'title': 'Starters', 'items': [
+                {'pk': 1, 'name': 'Soup', 'price': Decimal('4.00')},
+                {'pk': 2, 'name': 'Bread', 'price': Decimal('2.00')},
+            ]},
+            {'pk': 2, 'title': 'Mains', 'items': []},
+        ]}
+        new_data = copy.deepcopy(old_data)
+        new_data['sections'][0]['items'][1]['price'] = Decimal('2.50')
+        new_data['sections'][1]['items'].append({'pk': None, 'name': 'Pie', 'price': Decimal('9.00')})
+        del new_data['sections'][0]['items'][0]
+        diff = self.assertPatchable(old_data, new_data)
+        sections_diff = diff['relations']['sections']
+        self.assertEqual([0, 1], [index for index, section_diff in sections_diff['changed']])
+
+    def test_type_changes_are_detected(self):
+        diff = self.assertPatchable({'pk': 1, 'price': Decimal('1.0'), 'flag': 1}, {'pk': 1, 'price': Decimal('1.00'), 'flag': True})
+        self.assertEqual({'price': Decimal('1.00'), 'flag': True}, diff['fields'])
+
+    def test_m2m_changes(self):
+        authors = [Author.objects.create(name='Author %d' % i) for i in range(4)]
+        article = Article(title='Collected works', authors=authors[:3])
+        article.save()
+        old_data = article.serializable_data()
+
+        article.authors = [authors[0], authors[2], authors[3]]
+        diff = self.assertPatchable(old_data, article.serializable_data())
+        self.assertEqual({'added': [authors[3].pk], 'removed': [authors[1].pk]}, diff['m2m']['authors'])
+
+        diff = self.assertPatchable(old_data, dict(old_data, authors=list(reversed(old_data['authors']))))
+        self.assertEqual(list(reversed(old_data['authors'])), diff['m2m']['authors']['order'])
+
+    def test_added_and_removed_fields(self):
+        diff = self.assertPatchable({'pk': 1, 'name': 'a', 'old': 1}, {'pk': 1, 'name': 'a', 'new': 2})
+        self.assertEqual({'fields': {'new': 2}, 'removed_fields': ['old']}, diff)
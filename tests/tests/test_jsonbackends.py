@@ -0,0 +1,135 @@
+from __future__ import unicode_literals
+
+import datetime
+import json
+import logging
+import uuid
+from unittest import skipUnless
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy
+
+from modelcluster.jsonbackends import (
+    JSONBackend, OrjsonBackend, StandardJSONBackend, get_json_backend, register_json_backend
+)
+
+from tests.models import Band, BandMember, Dish, MenuItem, Restaurant
+
+
+class PlainJSONBackend(JSONBackend):
+    """
+    A backend that converts values through JSONBackend.convert, standing in for a JSON library
+    that only understands the basic JSON types
+    """
+    def __init__(self):
+        super(PlainJSONBackend, self).__init__()
+        self.calls = 0
+
+    def dumps(self, data):
+        self.calls += 1
+        return json.dumps(data, default=self.convert)
+
+    def loads(self, json_data):
+        self.calls += 1
+        return json.loads(json_data)
+
+
+register_json_backend('plain', PlainJSONBackend)
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super(RecordingHandler, self).__init__(level=logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class JSONBackendTest(TestCase):
+    def test_default_backend(self):
+        self.assertIsInstance(get_json_backend(), StandardJSONBackend)
+        beatles = Band(name='The Beatles', members=[BandMember(name='John Lennon')])
+        self.assertEqual(json.dumps(beatles.serializable_data(), cls=DjangoJSONEncoder), beatles.to_json())
+
+    def test_convert_matches_django_encoder(self):
+        data = {
+            'decimal': Decimal('3.50'),
+            'date': datetime.date(1965, 12, 3),
+            'datetime': datetime.datetime(2014, 8, 1, 11, 1, 42, 123456),
+            'time': datetime.time(11, 1, 42, 123456),
+            'uuid': uuid.UUID('12345678123456781234567812345678'),
+            'list': [Decimal('1.00'), (datetime.date(2000, 1, 1), None)],
+        }
+        self.assertEqual(
+            json.loads(json.dumps(data, cls=DjangoJSONEncoder)),
+            json.loads(get_json_backend('plain').dumps(data))
+        )
+        self.assertEqual('["Hello"]', get_json_backend('plain').dumps([ugettext_lazy('Hello')]))
+
+    def test_select_backend(self):
+        dish = Dish.objects.create(name='Snail ice cream')
+        fat_duck = Restaurant(name='The Fat Duck', menu_items=[MenuItem(dish=dish, price=Decimal('20.00'))])
+        backend = get_json_backend('plain')
+        backend.calls = 0
+
+        json_data = fat_duck.to_json(json_backend='plain')
+        self.assertEqual(json.loads(fat_duck.to_json()), json.loads(json_data))
+        restaurant = Restaurant.from_json(json_data, json_backend=backend)
+        self.assertEqual(Decimal('20.00'), restaurant.menu_items.all()[0].price)
+        self.assertEqual(2, backend.calls)
+
+        with override_settings(MODELCLUSTER_JSON_BACKEND='plain'):
+            fat_duck.to_json()
+        self.assertEqual(3, backend.calls)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_json_backend('nonexistent')
+
+    def test_unavailable_backend(self):
+        class UnavailableJSONBackend(StandardJSONBackend):
+            @classmethod
+            def is_available(cls):
+                return False
+
+        register_json_backend('unavailable', UnavailableJSONBackend)
+        logger = logging.getLogger('modelcluster')
+        handler = RecordingHandler()
+        logger.addHandler(handler)
+        try:
+            # the standard library backend is used instead, with a warning logged once
+            self.assertIs(get_json_backend('json'), get_json_backend('unavailable'))
+            with override_settings(MODELCLUSTER_JSON_BACKEND='unavailable'):
+                beatles = Band(name='The Beatles')
+                self.assertEqual(json.dumps(beatles.serializable_data(), cls=DjangoJSONEncoder), beatles.to_json())
+        finally:
+            logger.removeHandler(handler)
+        self.assertEqual(1, len(handler.messages))
+        self.assertIn("'unavailable' is not available", handler.messages[0])
+
+        with self.assertRaises(ImproperlyConfigured):
+            get_json_backend('unavailable', strict=True)
+
+    @skipUnless(OrjsonBackend.is_available(), "orjson is not installed")
+    def test_orjson_backend(self):
+        backend = get_json_backend('orjson')
+        data = {
+            'decimal': Decimal('3.50'),
+            'date': datetime.date(1965, 12, 3),
+            'datetime': datetime.datetime(2014, 8, 1, 11, 1, 42, 123456),
+            'aware_datetime': datetime.datetime(2014, 8, 1, 11, 1, 42, 123456, timezone.utc),
+            'time': datetime.time(11, 1, 42, 123456),
+            'uuid': uuid.UUID('12345678123456781234567812345678'),
+            'list': [Decimal('1.00'), (datetime.date(2000, 1, 1), None)],
+        }
+        self.assertEqual(json.loads(json.dumps(data, cls=DjangoJSONEncoder)), json.loads(backend.dumps(data)))
+        self.assertEqual('["Hello"]', backend.dumps([ugettext_lazy('Hello')]))
+
+        beatles = Band(name='The Beatles', members=[BandMember(name='John Lennon')])
+        self.assertEqual(json.loads(beatles.to_json()), json.loads(beatles.to_json(json_backend='orjson')))
+        self.assertEqual(beatles.serializable_data(), backend.loads(beatles.to_json()))
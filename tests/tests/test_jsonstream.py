@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+from django.test import SimpleTestCase
+from django.utils.six import BytesIO
+
+from modelcluster.jsonstream import JSONStreamReader
+
+
+def read_document(reader):
+    """Decode a whole document using the reader's structural methods"""
+    char = reader.peek()
+    if char == '{':
+        return dict((key, read_document(reader)) for key in reader.iter_object())
+    elif char == '[':
+        return [read_document(reader) for i in reader.iter_array()]
+    else:
+        return reader.read_value()
+
+
+class JSONStreamReaderTest(SimpleTestCase):
+    document = '{"pk": 12345, "name": "The Beatles \\u00e9\\"", "members": [{"pk": 1, "name": "John Lennon"}, ' \
+        '{"pk": 2.5, "active": true, "band": null}], "albums": [], "tags": {}, "count": -17e2}'
+
+    def test_read_whole_document(self):
+        self.assertEqual(json.loads(self.document), read_document(JSONStreamReader(self.document)))
+
+    def test_read_split_chunks(self):
+        expected = json.loads(self.document)
+        for split_at in range(1, len(self.document)):
+            chunks = [self.document[:split_at], self.document[split_at:]]
+            self.assertEqual(expected, read_document(JSONStreamReader(chunks)))
+
+    def test_read_bytes_file(self):
+        document = '{"name": "Björk", "members": [1, 2, 3]}'
+        reader = JSONStreamReader(BytesIO(document.encode('utf-8')), chunk_size=3)
+        self.assertEqual(json.loads(document), read_document(reader))
+
+    def test_read_whitespace(self):
+        reader = JSONStreamReader(['  {\n "a" : [ 1 ,2 ] ,', ' "b":\t{ } }  '])
+        self.assertEqual({'a': [1, 2], 'b': {}}, read_document(reader))
+        self.assertEqual(None, reader.peek())
+
+    def test_invalid_document(self):
+        with self.assertRaises(ValueError):
+            read_document(JSONStreamReader(['{"a": [1, 2', '}']))
+        with self.assertRaises(ValueError):
+            read_document(JSONStreamReader(['{"a": tru', 'x}']))
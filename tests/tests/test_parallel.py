@@ -0,0 +1,87 @@
+from __future__ import unicode_literals
+
+import os
+import pickle
+import subprocess
+import sys
+
+from django.test import TestCase
+
+from modelcluster.parallel import ProcessPoolExecutor, from_json_many
+from modelcluster.workers import get_worker_settings, validate_json_chunk
+
+from tests.models import Article, Author, Band, BandMember, Chef, Dish, MenuItem, Restaurant, Review, Wine
+
+
+class FromJSONManyTest(TestCase):
+    def setUp(self):
+        heston_blumenthal = Chef.objects.create(name="Heston Blumenthal")
+        snail_ice_cream = Dish.objects.create(name="Snail ice cream")
+        chips = Dish.objects.create(name="Chips")
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        self.restaurants_json = [
+            Restaurant(name="Restaurant %d" % i, proprietor=heston_blumenthal, menu_items=[
+                MenuItem(dish=snail_ice_cream, price='20.00', recommended_wine=chateauneuf),
+                MenuItem(dish=chips, price='%d.50' % i),
+            ], reviews=[
+                Review(author='Michael Winner', body='Rubbish.')
+            ]).to_json()
+            for i in range(5)
+        ]
+        heston_blumenthal.delete()
+        snail_ice_cream.delete()
+
+    def assertMatchesFromJSON(self, model, json_data_list, results):
+        self.assertEqual(
+            [model.from_json(json_data).serializable_data() for json_data in json_data_list],
+            [result.serializable_data() for result in results]
+        )
+
+    def test_in_process(self):
+        # one query each for Chef, Dish and Wine
+        with self.assertNumQueries(3):
+            restaurants = from_json_many(Restaurant, self.restaurants_json, workers=0, chunk_size=2)
+        self.assertMatchesFromJSON(Restaurant, self.restaurants_json, restaurants)
+        self.assertEqual(None, restaurants[0].proprietor_id)
+        self.assertEqual(1, restaurants[0].menu_items.count())
+
+    def test_process_pool(self):
+        # concurrent.futures is part of the standard library on python 3, and is installed from
+        # the 'futures' backport by tox on python 2
+        self.assertIsNotNone(ProcessPoolExecutor, "concurrent.futures is not available")
+        restaurants = from_json_many(Restaurant, self.restaurants_json, workers=2, chunk_size=2)
+        self.assertMatchesFromJSON(Restaurant, self.restaurants_json, restaurants)
+
+    def test_worker_in_new_process(self):
+        # a worker that is not forked from this process, as with the 'spawn' start method, starts
+        # with Django not set up; settings passed to settings.configure are sent to it
+        script = (
+            "import pickle, sys\n"
+            "from modelcluster.workers import validate_json_chunk\n"
+            "args = pickle.load(getattr(sys.stdin, 'buffer', sys.stdin))\n"
+            "getattr(sys.stdout, 'buffer', sys.stdout).write(pickle.dumps(validate_json_chunk(*args), 2))\n"
+        )
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        process = subprocess.Popen(
+            [sys.executable, '-c', script], stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env
+        )
+        args = (get_worker_settings(), 'tests', 'restaurant', self.restaurants_json)
+        output, errors = process.communicate(pickle.dumps(args, 2))
+        self.assertEqual(0, process.returncode)
+
+        self.assertEqual(validate_json_chunk(None, 'tests', 'restaurant', self.restaurants_json), pickle.loads(output))
+
+    def test_m2m_and_unsaved_objects(self):
+        authors = [Author.objects.create(name='Author %d' % i) for i in range(3)]
+        json_data_list = [
+            Article(title='Article 1', authors=[authors[2], authors[0]]).to_json(),
+            Article(title='Article 2', authors=authors[1:]).to_json(),
+            Band(name='The Beatles', members=[BandMember(name='John Lennon')]).to_json(),
+        ]
+        articles = from_json_many(Article, json_data_list[:2], workers=0)
+        self.assertMatchesFromJSON(Article, json_data_list[:2], articles)
+
+        [beatles] = from_json_many(Band, json_data_list[2:], workers=0)
+        self.assertEqual(None, beatles.pk)
+        self.assertEqual(['John Lennon'], [member.name for member in beatles.members.all()])
@@ -2,13 +2,21 @@ from __future__ import unicode_literals
 
 import json
 import datetime
+import decimal
+import sys
 
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.serializers.json import DjangoJSONEncoder
 from django.test import TestCase
 from django.utils import timezone
+from django.utils.six import BytesIO, StringIO
+
+from modelcluster.models import ReferenceResolver, get_field_value, get_serializer_plan, \
+    get_serializable_data_for_fields, invalidate_serializable_data
 
 from tests.models import Band, BandMember, Album, Restaurant, Dish, MenuItem, Chef, Wine, \
-    Review, Log, Document, Article, Author, Category
+    Review, Log, Document, Article, Author, Category, Genre, Place, Comment
 
 
 class SerializeTest(TestCase):
@@ -49,6 +57,36 @@ class SerializeTest(TestCase):
         unpacked_beatles = Band.from_json(beatles_json)
         self.assertEqual(datetime.date(1965, 12, 3), unpacked_beatles.albums.all()[0].release_date)
 
+    def test_to_json_iter(self):
+        beatles = Band(name='The Beatles', members=[
+            BandMember(name='John Lennon'),
+            BandMember(name='Paul McCartney'),
+        ], albums=[
+            Album(name='Rubber Soul', release_date=datetime.date(1965, 12, 3))
+        ])
+        self.assertEqual(json.loads(beatles.to_json()), json.loads(''.join(beatles.to_json_iter())))
+
+        beatles.save()
+        beatles = Band.objects.get(pk=beatles.pk)
+        self.assertEqual(json.loads(beatles.to_json()), json.loads(''.join(beatles.to_json_iter())))
+
+        # relations with uncommitted changes are written from the in-memory object list
+        beatles.members.add(BandMember(name='George Harrison'))
+        self.assertEqual(json.loads(beatles.to_json()), json.loads(''.join(beatles.to_json_iter())))
+
+        output = StringIO()
+        beatles.write_json(output)
+        self.assertEqual(json.loads(beatles.to_json()), json.loads(output.getvalue()))
+
+    def test_to_json_iter_m2m(self):
+        george_orwell = Author.objects.create(name='George Orwell')
+        charles_dickens = Author.objects.create(name='Charles Dickens')
+        article = Article(
+            title='Down and Out in Paris and London',
+            authors=[george_orwell, charles_dickens],
+        )
+        self.assertEqual(json.loads(article.to_json()), json.loads(''.join(article.to_json_iter())))
+
     def test_deserialize(self):
         beatles = Band.from_serializable_data({
             'pk': 9,
@@ -90,6 +128,52 @@ class SerializeTest(TestCase):
         self.assertEqual(2, beatles.members.count())
         self.assertEqual(BandMember, beatles.members.all()[0].__class__)
 
+    def test_deserialize_json_stream(self):
+        beatles = Band(name='The Beatles', members=[
+            BandMember(name='John Lennon'),
+            BandMember(name='Paul McCartney'),
+        ], albums=[
+            Album(name='With The Beatles', sort_order=2),
+            Album(name='Please Please Me', release_date=datetime.date(1963, 3, 22), sort_order=1),
+        ])
+        beatles_json = beatles.to_json()
+
+        chunks = [beatles_json[i:i + 7] for i in range(0, len(beatles_json), 7)]
+        unpacked_beatles = Band.from_json_stream(chunks)
+        self.assertEqual(unpacked_beatles.serializable_data(), Band.from_json(beatles_json).serializable_data())
+        self.assertEqual('Please Please Me', unpacked_beatles.albums.all()[0].name)
+        self.assertEqual(datetime.date(1963, 3, 22), unpacked_beatles.albums.all()[0].release_date)
+
+        unpacked_beatles = Band.from_json_stream(BytesIO(beatles_json.encode('utf-8')))
+        self.assertEqual(2, unpacked_beatles.members.count())
+
+    def test_deserialize_json_stream_with_dangling_foreign_keys(self):
+        heston_blumenthal = Chef.objects.create(name="Heston Blumenthal")
+        snail_ice_cream = Dish.objects.create(name="Snail ice cream")
+        chips = Dish.objects.create(name="Chips")
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        george_orwell = Author.objects.create(name='George Orwell')
+        fat_duck = Restaurant(name="The Fat Duck", proprietor=heston_blumenthal, serves_hot_dogs=False, menu_items=[
+            MenuItem(dish=snail_ice_cream, price='20.00', recommended_wine=chateauneuf),
+            MenuItem(dish=chips, price='2.00', recommended_wine=chateauneuf),
+        ])
+        fat_duck_json = fat_duck.to_json()
+        article_json = Article(title='Animal Farm', authors=[george_orwell]).to_json()
+
+        heston_blumenthal.delete()
+        chateauneuf.delete()
+        snail_ice_cream.delete()
+
+        with self.assertNumQueries(3):
+            fat_duck = Restaurant.from_json_stream(fat_duck_json)
+        self.assertEqual(None, fat_duck.proprietor_id)
+        self.assertEqual(1, fat_duck.menu_items.count())
+        self.assertEqual(chips.pk, fat_duck.menu_items.all()[0].dish_id)
+        self.assertEqual(None, fat_duck.menu_items.all()[0].recommended_wine_id)
+
+        article = Article.from_json_stream(article_json)
+        self.assertEqual(['George Orwell'], [author.name for author in article.authors.all()])
+
     def test_serialize_with_multi_table_inheritance(self):
         fat_duck = Restaurant(name='The Fat Duck', serves_hot_dogs=False, reviews=[
             Review(author='Michael Winner', body='Rubbish.')
@@ -135,6 +219,218 @@ class SerializeTest(TestCase):
         # the menu item should now be dropped entirely (because the foreign key to Dish has on_delete=CASCADE)
         self.assertEqual(0, fat_duck.menu_items.count())
 
+    def test_foreign_key_checks_are_batched(self):
+        heston_blumenthal = Chef.objects.create(name="Heston Blumenthal")
+        dishes = [Dish.objects.create(name="Dish %d" % i) for i in range(5)]
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        fat_duck = Restaurant(name="The Fat Duck", proprietor=heston_blumenthal, serves_hot_dogs=False, menu_items=[
+            MenuItem(dish=dish, price='20.00', recommended_wine=chateauneuf) for dish in dishes
+        ])
+        fat_duck_json = fat_duck.to_json()
+
+        dishes[0].delete()
+        chateauneuf.delete()
+
+        # one query each for Chef, Dish and Wine
+        with self.assertNumQueries(3):
+            fat_duck = Restaurant.from_json(fat_duck_json)
+
+        menu_items = fat_duck.menu_items.all()
+        self.assertEqual(4, len(menu_items))
+        self.assertEqual([dish.pk for dish in dishes[1:]], [item.dish_id for item in menu_items])
+        self.assertEqual([None] * 4, [item.recommended_wine_id for item in menu_items])
+        self.assertEqual(heston_blumenthal.pk, fat_duck.proprietor_id)
+
+    def test_serialize_columnar(self):
+        beatles = Band(name='The Beatles', members=[
+            BandMember(name='John Lennon'),
+            BandMember(name='Paul McCartney'),
+        ])
+        data = beatles.serializable_data(columnar=True)
+        self.assertEqual(['pk', 'band', 'name'], data['members']['columns'])
+        self.assertEqual([[None, None, 'John Lennon'], [None, None, 'Paul McCartney']], data['members']['rows'])
+        self.assertEqual({'columns': ['pk', 'band', 'name', 'release_date', 'sort_order'], 'rows': []}, data['albums'])
+
+        beatles.members = [BandMember(name='Member %d' % i) for i in range(10)]
+        self.assertTrue(len(beatles.to_json(columnar=True)) < len(beatles.to_json()))
+
+    def test_deserialize_columnar(self):
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        chips = Dish.objects.create(name="Chips")
+        snail_ice_cream = Dish.objects.create(name="Snail ice cream")
+        fat_duck = Restaurant(name="The Fat Duck", serves_hot_dogs=False, menu_items=[
+            MenuItem(dish=snail_ice_cream, price='20.00', recommended_wine=chateauneuf),
+            MenuItem(dish=chips, price='2.00', recommended_wine=chateauneuf),
+        ], reviews=[
+            Review(author='Michael Winner', body='Rubbish.')
+        ])
+        fat_duck_json = fat_duck.to_json(columnar=True)
+        snail_ice_cream.delete()
+        chateauneuf.delete()
+
+        expected_data = Restaurant.from_json(fat_duck.to_json()).serializable_data()
+        self.assertEqual(1, len(expected_data['menu_items']))
+
+        with self.assertNumQueries(2):
+            unpacked_fat_duck = Restaurant.from_json(fat_duck_json)
+        self.assertEqual(expected_data, unpacked_fat_duck.serializable_data())
+        self.assertEqual(None, unpacked_fat_duck.menu_items.all()[0].recommended_wine_id)
+
+        unpacked_fat_duck = Restaurant.from_json_stream(fat_duck_json)
+        self.assertEqual(expected_data, unpacked_fat_duck.serializable_data())
+
+        unpacked_fat_duck = Restaurant.from_bytes(fat_duck.to_bytes(columnar=True))
+        self.assertEqual(expected_data, unpacked_fat_duck.serializable_data())
+
+    def test_deserialize_lazy(self):
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        chips = Dish.objects.create(name="Chips")
+        snail_ice_cream = Dish.objects.create(name="Snail ice cream")
+        fat_duck = Restaurant(name="The Fat Duck", serves_hot_dogs=False, menu_items=[
+            MenuItem(dish=snail_ice_cream, price='20.00', recommended_wine=chateauneuf),
+            MenuItem(dish=chips, price='2.00', recommended_wine=chateauneuf),
+        ], reviews=[
+            Review(author='Michael Winner', body='Rubbish.')
+        ])
+        data = json.loads(fat_duck.to_json())
+        snail_ice_cream.delete()
+
+        with self.assertNumQueries(0):
+            lazy_fat_duck = Restaurant.from_serializable_data(data, lazy=True)
+            # untouched relations are passed through unchanged
+            self.assertEqual(data, lazy_fat_duck.serializable_data())
+            self.assertEqual(data, json.loads(''.join(lazy_fat_duck.to_json_iter())))
+
+        # foreign keys are checked when the relation is first accessed
+        with self.assertNumQueries(2):
+            menu_items = lazy_fat_duck.menu_items.all()
+        self.assertEqual([chips.pk], [item.dish_id for item in menu_items])
+        self.assertEqual(chateauneuf.pk, menu_items[0].recommended_wine_id)
+
+        eager_data = Restaurant.from_serializable_data(data).serializable_data()
+        self.assertEqual(eager_data, lazy_fat_duck.serializable_data())
+
+    def test_deserialize_lazy_m2m(self):
+        george_orwell = Author.objects.create(name='George Orwell')
+        charles_dickens = Author.objects.create(name='Charles Dickens')
+        article_json = Article(title='Down and Out in Paris and London', authors=[george_orwell]).to_json()
+
+        article = Article.from_json(article_json, lazy=True)
+        self.assertEqual(['George Orwell'], [author.name for author in article.authors.all()])
+
+        article = Article.from_json(article_json, lazy=True)
+        article.authors.add(charles_dickens)
+        self.assertEqual([george_orwell.pk, charles_dickens.pk], article.serializable_data()['authors'])
+
+    def test_save_lazy(self):
+        fat_duck = Restaurant(name="The Fat Duck", serves_hot_dogs=False, reviews=[
+            Review(author='Michael Winner', body='Rubbish.')
+        ])
+        lazy_fat_duck = Restaurant.from_json(fat_duck.to_json(), lazy=True)
+        lazy_fat_duck.save()
+        self.assertEqual(['Michael Winner'], [review.author for review in Review.objects.filter(place=lazy_fat_duck)])
+
+        lazy_fat_duck = Restaurant.from_serializable_data(lazy_fat_duck.serializable_data(), lazy=True)
+        lazy_fat_duck.reviews = []
+        lazy_fat_duck.save()
+        self.assertFalse(Review.objects.filter(place=lazy_fat_duck).exists())
+
+    def test_serializable_data_for_queryset(self):
+        for i in range(3):
+            Band(name='Band %d' % i, members=[
+                BandMember(name='Member %d' % j) for j in range(i)
+            ], albums=[
+                Album(name='Album %d' % j, sort_order=-j) for j in range(3)
+            ]).save()
+        authors = [Author.objects.create(name='Author %d' % i) for i in range(3)]
+        Article(title='Article 1', authors=[authors[2], authors[0]]).save()
+        Article(title='Article 2', authors=authors[1:]).save()
+        Article(title='Article 3').save()
+
+        # one query for the bands, plus one per relation for each chunk
+        with self.assertNumQueries(5):
+            results = list(Band.serializable_data_for_queryset(Band.objects.order_by('name'), chunk_size=2))
+        self.assertEqual(['Band 0', 'Band 1', 'Band 2'], [band.name for band, data in results])
+        for band, data in results:
+            self.assertEqual(Band.objects.get(pk=band.pk).serializable_data(), data)
+
+        with self.assertNumQueries(3):
+            results = list(Article.serializable_data_for_queryset(Article.objects.all()))
+        self.assertEqual(3, len(results))
+        for article, data in results:
+            self.assertEqual(Article.objects.get(pk=article.pk).serializable_data(), data)
+
+        fat_duck = Restaurant(name='The Fat Duck', reviews=[Review(author='Michael Winner', body='Rubbish.')])
+        fat_duck.tags.add('restaurant', 'fine dining')
+        fat_duck.save()
+        [(restaurant, data)] = Restaurant.serializable_data_for_queryset(Restaurant.objects.all())
+        self.assertEqual(fat_duck.serializable_data(), data)
+
+    def test_from_serializable_data_many(self):
+        authors = [Author.objects.create(name='Author %d' % i) for i in range(4)]
+        category = Category.objects.create(name='Fiction')
+        data_list = [
+            Article(title='Article 1', authors=[authors[2], authors[0]], categories=[category]).serializable_data(),
+            Article(title='Article 2', authors=[authors[3], authors[1], authors[2]]).serializable_data(),
+            Article(title='Article 3').serializable_data(),
+        ]
+        authors[1].delete()
+
+        with self.assertNumQueries(2):
+            articles = Article.from_serializable_data_many(data_list)
+
+        expected_articles = [Article.from_serializable_data(data) for data in data_list]
+        self.assertEqual(
+            [article.serializable_data() for article in expected_articles],
+            [article.serializable_data() for article in articles]
+        )
+        self.assertEqual(['Author 2', 'Author 3'], [author.name for author in articles[1].authors.all()])
+        self.assertIsNot(articles[0].authors.all()[1], articles[1].authors.all()[1])
+
+    def test_related_objects_fetched_separately_are_ordered(self):
+        drama, comedy, biography = [Genre.objects.create(name=name) for name in ['Drama', 'Comedy', 'Biography']]
+        resolver = ReferenceResolver()
+        resolver.add_related_objects(Genre, [drama.pk])
+        resolver.resolve()
+        resolver.add_related_objects(Genre, [comedy.pk, biography.pk])
+        resolver.resolve()
+
+        # ordered by name, as a single query would be, rather than in the order fetched
+        self.assertEqual(
+            ['Biography', 'Comedy', 'Drama'],
+            [genre.name for genre in resolver.get_related_objects(Genre, [drama.pk, comedy.pk, biography.pk])]
+        )
+
+    def test_from_serializable_data_many_with_dangling_foreign_keys(self):
+        heston_blumenthal = Chef.objects.create(name="Heston Blumenthal")
+        snail_ice_cream = Dish.objects.create(name="Snail ice cream")
+        chips = Dish.objects.create(name="Chips")
+        chateauneuf = Wine.objects.create(name="Chateauneuf-du-Pape 1979")
+        data_list = [
+            Restaurant(name="The Fat Duck", proprietor=heston_blumenthal, menu_items=[
+                MenuItem(dish=snail_ice_cream, price='20.00', recommended_wine=chateauneuf),
+                MenuItem(dish=chips, price='2.00'),
+            ]).serializable_data(),
+            Restaurant(name="The Chip Shop", menu_items=[
+                MenuItem(dish=chips, price='1.50', recommended_wine=chateauneuf),
+            ]).serializable_data(),
+        ]
+        heston_blumenthal.delete()
+        snail_ice_cream.delete()
+        chateauneuf.delete()
+
+        # one query each for Chef, Dish and Wine
+        with self.assertNumQueries(3):
+            restaurants = Restaurant.from_serializable_data_many(data_list)
+
+        self.assertEqual(
+            [Restaurant.from_serializable_data(data).serializable_data() for data in data_list],
+            [restaurant.serializable_data() for restaurant in restaurants]
+        )
+        self.assertEqual(None, restaurants[0].proprietor_id)
+        self.assertEqual([chips.pk], [item.dish_id for item in restaurants[0].menu_items.all()])
+        self.assertEqual(None, restaurants[1].menu_items.all()[0].recommended_wine_id)
+
     def test_deserialize_with_sort_order(self):
         beatles = Band.from_json('{"pk": null, "albums": [{"pk": null, "name": "With The Beatles", "sort_order": 2}, {"pk": null, "name": "Please Please Me", "sort_order": 1}], "name": "The Beatles", "members": []}')
         self.assertEqual(2, beatles.albums.count())
@@ -233,3 +529,326 @@ class SerializeTest(TestCase):
         new_doc = Document.from_json(doc_json)
 
         self.assertEqual(new_doc.file.read(), b'Hello world')
+
+    def test_serialise_without_pre_save(self):
+        doc = Document(title='Hello')
+        doc.file = SimpleUploadedFile('hello.txt', b'Hello world')
+
+        data = doc.serializable_data(pre_save=False)
+        self.assertEqual('hello.txt', data['file'])
+        # the file has not been written to storage
+        self.assertFalse(doc.file._committed)
+        self.assertEqual(data, json.loads(doc.to_json(pre_save=False)))
+        self.assertEqual(data, json.loads(''.join(doc.to_json_iter(pre_save=False))))
+
+    def test_serialise_with_serialize_pre_save_fields(self):
+        Document.serialize_pre_save_fields = ['file']
+        Document._meta.__dict__.pop('_serializer_plan_cache', None)
+        try:
+            doc = Document(title='Hello')
+            doc.file = SimpleUploadedFile('hello.txt', b'Hello world')
+            new_doc = Document.from_json(doc.to_json(pre_save=False))
+            self.assertTrue(doc.file._committed)
+            self.assertEqual(new_doc.file.read(), b'Hello world')
+        finally:
+            del Document.serialize_pre_save_fields
+            Document._meta.__dict__.pop('_serializer_plan_cache', None)
+
+    def test_serializable_data_is_memoized(self):
+        beatles = Band(name='The Beatles', members=[
+            BandMember(name='John Lennon'),
+        ], albums=[
+            Album(name='Please Please Me', sort_order=1),
+        ])
+        beatles.save()
+        beatles = Band.objects.get(pk=beatles.pk)
+        data = beatles.serializable_data()
+
+        # unmodified relations are not queried again
+        with self.assertNumQueries(0):
+            self.assertEqual(data, beatles.serializable_data())
+
+        # rows written other than through the relation's manager are seen once the memoized data
+        # is invalidated
+        extra_member = BandMember.objects.create(band=beatles, name='Pete Best')
+        self.assertEqual(['John Lennon'], [member['name'] for member in beatles.serializable_data()['members']])
+        invalidate_serializable_data(beatles, 'members')
+        self.assertEqual(
+            ['John Lennon', 'Pete Best'], [member['name'] for member in beatles.serializable_data()['members']]
+        )
+        extra_member.delete()
+        invalidate_serializable_data(beatles)
+        with self.assertNumQueries(2):
+            self.assertEqual(data, beatles.serializable_data())
+
+        # the result can be modified by the caller without affecting later results
+        data['members'][0]['name'] = 'Ringo Starr'
+        data['albums'].append({})
+        self.assertEqual('John Lennon', beatles.serializable_data()['members'][0]['name'])
+        self.assertEqual(1, len(beatles.serializable_data()['albums']))
+
+        beatles.name = 'The Silver Beatles'
+        self.assertEqual('The Silver Beatles', beatles.serializable_data()['name'])
+
+        beatles.members.add(BandMember(name='Paul McCartney'))
+        with self.assertNumQueries(0):
+            data = beatles.serializable_data()
+        self.assertEqual(['John Lennon', 'Paul McCartney'], [member['name'] for member in data['members']])
+        self.assertEqual(['Please Please Me'], [album['name'] for album in data['albums']])
+
+        # changes to fields of child objects are detected
+        beatles.members.all()[1].name = 'George Harrison'
+        self.assertEqual('George Harrison', beatles.serializable_data()['members'][1]['name'])
+
+        beatles.members.remove(beatles.members.all()[0])
+        beatles.albums = []
+        data = beatles.serializable_data()
+        self.assertEqual(['George Harrison'], [member['name'] for member in data['members']])
+        self.assertEqual([], data['albums'])
+
+        beatles.save()
+        data = beatles.serializable_data()
+        self.assertEqual(Band.objects.get(pk=beatles.pk).serializable_data(), data)
+        self.assertTrue(data['members'][0]['pk'])
+
+    def test_memoized_serializable_data_sees_file_changes(self):
+        doc = Document(title='Hello', file='documents/a.txt')
+        self.assertEqual('documents/a.txt', doc.serializable_data(pre_save=False)['file'])
+
+        # the FieldFile is changed in place, without reassigning the attribute
+        doc.file.name = 'documents/b.txt'
+        self.assertEqual('documents/b.txt', doc.serializable_data(pre_save=False)['file'])
+
+        doc.file.save('c.txt', ContentFile(b'Hello world'), save=False)
+        self.assertEqual(doc.file.name, doc.serializable_data(pre_save=False)['file'])
+        self.assertNotEqual('documents/b.txt', doc.file.name)
+
+    def test_cluster_fingerprint(self):
+        def make_band():
+            return Band(name='The Beatles', members=[
+                BandMember(name='John Lennon'),
+                BandMember(name='Paul McCartney'),
+            ], albums=[
+                Album(name='Please Please Me', release_date=datetime.date(1963, 3, 22), sort_order=1),
+            ])
+
+        beatles = make_band()
+        fingerprint = beatles.cluster_fingerprint()
+        self.assertEqual(fingerprint, make_band().cluster_fingerprint())
+        self.assertEqual(fingerprint, Band.from_json(beatles.to_json()).cluster_fingerprint())
+        self.assertEqual(fingerprint, Band.from_json(beatles.to_json(), lazy=True).cluster_fingerprint())
+        # fixed value, to detect changes to the hashing scheme
+        self.assertEqual('7accfa62e4a8bf1e0078816f5de339c9e930f780924be3b1637392555198e8b8', fingerprint)
+
+        beatles.albums.all()[0].name = 'With The Beatles'
+        self.assertNotEqual(fingerprint, beatles.cluster_fingerprint())
+
+        beatles = make_band()
+        beatles.members.add(BandMember(name='George Harrison'))
+        self.assertNotEqual(fingerprint, beatles.cluster_fingerprint())
+
+    def test_cluster_fingerprint_with_m2m(self):
+        author = Author.objects.create(name='George Orwell')
+        category = Category.objects.create(name='Fiction')
+        article = Article(title='Animal Farm', authors=[author])
+        fingerprint = article.cluster_fingerprint()
+        self.assertEqual(fingerprint, Article.from_json(article.to_json()).cluster_fingerprint())
+
+        article.categories = [category]
+        self.assertNotEqual(fingerprint, article.cluster_fingerprint())
+
+    def test_serializer_plan_matches_field_values(self):
+        dish = Dish.objects.create(name="Snail ice cream")
+        fat_duck = Restaurant(name="The Fat Duck", serves_hot_dogs=True)
+        items = [
+            MenuItem(restaurant=fat_duck, dish=dish, price='20.00'),
+            MenuItem(restaurant=fat_duck, dish=dish, price=decimal.Decimal('3.50')),
+            Log(time=self.WAGTAIL_05_RELEASE_DATETIME, data="Wagtail 0.5 released"),
+            Log(time=None, data="Someone scanned a QR code"),
+            Album(name='Rubber Soul', release_date=datetime.date(1965, 12, 3)),
+            fat_duck,
+        ]
+
+        for item in items:
+            expected = {'pk': get_field_value(Place._meta.pk if isinstance(item, Place) else item._meta.pk, item)}
+            for field in item._meta.fields:
+                if field.serialize:
+                    expected[field.name] = get_field_value(field, item)
+            self.assertEqual(
+                json.dumps(expected, cls=DjangoJSONEncoder),
+                json.dumps(get_serializable_data_for_fields(item), cls=DjangoJSONEncoder)
+            )
+
+    def test_serializer_plan_is_cached(self):
+        self.assertIs(get_serializer_plan(MenuItem), get_serializer_plan(MenuItem))
+        self.assertIs(get_serializer_plan(MenuItem), get_serializer_plan(MenuItem(price='1.00')))
+        self.assertEqual(get_serializer_plan(Restaurant).pk_field, Place._meta.pk)
+
+    def test_serialize_with_include_and_exclude(self):
+        dish = Dish.objects.create(name="Snail ice cream")
+        fat_duck = Restaurant(name="The Fat Duck", serves_hot_dogs=False, menu_items=[
+            MenuItem(dish=dish, price='20.00'),
+        ], reviews=[
+            Review(author='Michael Winner', body='Rubbish.'),
+        ])
+        fat_duck.save()
+        fat_duck = Restaurant.objects.get(pk=fat_duck.pk)
+
+        # reviews are not selected, so only menu_items is queried
+        with self.assertNumQueries(1):
+            data = fat_duck.serializable_data(include=['name', 'menu_items.price'])
+        self.assertEqual({'pk': fat_duck.pk, 'name': 'The Fat Duck', 'menu_items': [
+            {'pk': fat_duck.menu_items.get().pk, 'price': decimal.Decimal('20.00')}
+        ]}, data)
+
+        data = fat_duck.serializable_data(exclude=['menu_items', 'reviews.body', 'tags'])
+        self.assertNotIn('menu_items', data)
+        self.assertEqual(['author', 'pk', 'place'], sorted(data['reviews'][0]))
+        self.assertFalse(data['serves_hot_dogs'])
+
+        data = fat_duck.serializable_data(columnar=True, include=['menu_items.price'])
+        self.assertEqual(['pk', 'price'], data['menu_items']['columns'])
+        self.assertEqual([[fat_duck.menu_items.get().pk, decimal.Decimal('20.00')]], data['menu_items']['rows'])
+
+        # unfiltered serialization is unaffected
+        self.assertIn('reviews', fat_duck.serializable_data())
+
+    def test_deserialize_with_include_and_exclude(self):
+        dish = Dish.objects.create(name="Snail ice cream")
+        fat_duck = Restaurant(name="The Fat Duck", menu_items=[
+            MenuItem(dish=dish, price='20.00'),
+        ], reviews=[
+            Review(author='Michael Winner', body='Rubbish.'),
+        ])
+        fat_duck.save()
+        data = fat_duck.serializable_data()
+        data['name'] = "The Thin Duck"
+        data['reviews'] = []
+        data['menu_items'][0]['price'] = '25.00'
+
+        restaurant = Restaurant.from_serializable_data(data, include=['name', 'menu_items'])
+        self.assertEqual("The Thin Duck", restaurant.name)
+        self.assertEqual(decimal.Decimal('25.00'), restaurant.menu_items.all()[0].price)
+        restaurant.save()
+
+        # reviews were left out, so saving leaves them untouched
+        self.assertEqual(['Michael Winner'], [review.author for review in Review.objects.filter(place=fat_duck)])
+        self.assertEqual(decimal.Decimal('25.00'), MenuItem.objects.get(restaurant=fat_duck).price)
+
+        restaurant = Restaurant.from_json(fat_duck.to_json(), exclude=['name', 'menu_items.price'])
+        self.assertEqual('', restaurant.name)
+        self.assertEqual(None, restaurant.menu_items.all()[0].price)
+        self.assertEqual(dish.pk, restaurant.menu_items.all()[0].dish_id)
+
+    def test_save_after_deserializing_with_exclude(self):
+        chef = Chef.objects.create(name="Heston Blumenthal")
+        dish = Dish.objects.create(name="Snail ice cream")
+        fat_duck = Restaurant(name="The Fat Duck", proprietor=chef, serves_hot_dogs=True, menu_items=[
+            MenuItem(dish=dish, price='20.00'),
+        ])
+        fat_duck.save()
+
+        # fields that were left out hold defaults, but saving leaves the database values untouched
+        restaurant = Restaurant.from_json(fat_duck.to_json(), exclude=['name', 'proprietor', 'menu_items.price'])
+        restaurant.serves_hot_dogs = False
+        restaurant.menu_items.all()[0].recommended_wine = Wine.objects.create(name="Chateau Margaux")
+        restaurant.save()
+
+        restaurant = Restaurant.objects.get(pk=fat_duck.pk)
+        self.assertEqual("The Fat Duck", restaurant.name)
+        self.assertEqual(chef, restaurant.proprietor)
+        self.assertFalse(restaurant.serves_hot_dogs)
+        menu_item = restaurant.menu_items.get()
+        self.assertEqual(decimal.Decimal('20.00'), menu_item.price)
+        self.assertEqual("Chateau Margaux", menu_item.recommended_wine.name)
+
+        # fields that are set after deserializing are written
+        restaurant = Restaurant.from_json(fat_duck.to_json(), include=['serves_hot_dogs', 'menu_items.price'])
+        restaurant.name = "The Thin Duck"
+        restaurant.menu_items.all()[0].price = '25.00'
+        with self.settings(MODELCLUSTER_COMMIT_SIGNALS=True):
+            restaurant.save()
+
+        restaurant = Restaurant.objects.get(pk=fat_duck.pk)
+        self.assertEqual("The Thin Duck", restaurant.name)
+        self.assertEqual(chef, restaurant.proprietor)
+        menu_item = restaurant.menu_items.get()
+        self.assertEqual(decimal.Decimal('25.00'), menu_item.price)
+        self.assertEqual(dish, menu_item.dish)
+        self.assertEqual("Chateau Margaux", menu_item.recommended_wine.name)
+
+        # objects that don't exist in the database are saved in full
+        Restaurant.objects.filter(pk=fat_duck.pk).delete()
+        restaurant = Restaurant.from_json(fat_duck.to_json(), exclude=['proprietor'])
+        restaurant.save()
+        self.assertEqual(None, Restaurant.objects.get(pk=fat_duck.pk).proprietor)
+
+    def test_save_after_deserializing_data_with_missing_fields(self):
+        fat_duck = Restaurant.objects.create(name="The Fat Duck", serves_hot_dogs=True)
+        beatles = Band(name='The Beatles', albums=[Album(name='Rubber Soul', sort_order=5)])
+        beatles.save()
+
+        # fields missing from the data, as in a revision made before the field existed, are
+        # written with their default values when not deserializing with include / exclude
+        data = fat_duck.serializable_data()
+        del data['serves_hot_dogs']
+        Restaurant.from_serializable_data(data).save()
+        self.assertFalse(Restaurant.objects.get(pk=fat_duck.pk).serves_hot_dogs)
+
+        data = beatles.serializable_data()
+        del data['albums'][0]['sort_order']
+        Band.from_serializable_data(data).save()
+        self.assertEqual(None, Album.objects.get(name='Rubber Soul').sort_order)
+
+    def test_save_after_assigning_skipped_field(self):
+        fat_duck = Restaurant.objects.create(name="The Fat Duck", serves_hot_dogs=True)
+
+        # assigning a skipped field marks it to be written, even if the value is unchanged
+        restaurant = Restaurant.from_json(fat_duck.to_json(), exclude=['serves_hot_dogs'])
+        restaurant.serves_hot_dogs = False
+        restaurant.save()
+        self.assertFalse(Restaurant.objects.get(pk=fat_duck.pk).serves_hot_dogs)
+
+    def test_serialize_nested_clusters(self):
+        thread = Comment(body='First!', replies=[
+            Comment(body='Second!', replies=[Comment(body='Third!')]),
+            Comment(body='Me too'),
+        ])
+        expected = {'pk': None, 'parent': None, 'body': 'First!', 'replies': [
+            {'pk': None, 'parent': None, 'body': 'Second!', 'replies': [
+                {'pk': None, 'parent': None, 'body': 'Third!', 'replies': []},
+            ]},
+            {'pk': None, 'parent': None, 'body': 'Me too', 'replies': []},
+        ]}
+        self.assertEqual(expected, thread.serializable_data())
+
+        data = thread.serializable_data(columnar=True)
+        self.assertEqual(['Second!', 'Me too'], [row[data['replies']['columns'].index('body')] for row in data['replies']['rows']])
+
+        thread = Comment.from_serializable_data(data)
+        thread.save()
+        thread = Comment.objects.get(pk=thread.pk)
+        reply = thread.replies.get(body='Second!')
+        self.assertEqual(['Third!'], [comment.body for comment in reply.replies.all()])
+        self.assertEqual(
+            Comment.from_json(thread.to_json()).serializable_data(),
+            thread.serializable_data()
+        )
+
+    def test_deeply_nested_cluster(self):
+        depth = sys.getrecursionlimit() + 100
+        thread = Comment(body='0')
+        for i in range(1, depth):
+            thread = Comment(body=str(i), replies=[thread])
+
+        data = thread.serializable_data()
+        fingerprint = thread.cluster_fingerprint()
+        # child relations held as raw data are hashed without recursion too
+        self.assertEqual(fingerprint, Comment.from_serializable_data(data, lazy=True).cluster_fingerprint())
+
+        thread = Comment.from_serializable_data(data)
+        self.assertEqual(fingerprint, thread.cluster_fingerprint())
+        for i in reversed(range(depth)):
+            self.assertEqual(str(i), thread.body)
+            thread = (list(thread.replies.all()) or [None])[0]
+        self.assertEqual(None, thread)
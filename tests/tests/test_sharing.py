@@ -0,0 +1,122 @@
+from __future__ import unicode_literals
+
+import copy
+import json
+from decimal import Decimal
+
+from django.test import TestCase
+
+from modelcluster.sharing import decode_shared_references, encode_shared_references, has_shared_references
+
+from tests.models import Comment, Dish, MenuItem, Restaurant, Review
+
+
+class SharedReferencesTest(TestCase):
+    def test_round_trip(self):
+        item = {'pk': None, 'dish': 1, 'price': Decimal('1.50')}
+        data = {
+            'pk': 1,
+            'menu_items': [dict(item), dict(item), {'pk': None, 'dish': 1, 'price': Decimal('1.5')}],
+            'tags': [['a', 'b'], ['a', 'b'], ['a']],
+            'body': 'A long string that is repeated',
+            'summary': 'A long string that is repeated',
+            'short': 'x',
+            'flag': True,
+            'count': 1,
+        }
+        encoded = encode_shared_references(data)
+        self.assertTrue(has_shared_references(encoded))
+        self.assertFalse(has_shared_references(data))
+
+        # repeated dicts, lists and long strings are stored once
+        self.assertEqual(3, len(encoded['$shared']))
+        self.assertEqual({'$ref': encoded['$shared'].index('A long string that is repeated')}, encoded['$data']['body'])
+        # Decimal('1.5') compares equal to Decimal('1.50'), but is a different value
+        self.assertEqual(Decimal('1.5'), encoded['$data']['menu_items'][2]['price'])
+
+        decoded = decode_shared_references(json.loads(json.dumps(encoded, default=str)))
+        self.assertEqual(json.loads(json.dumps(data, default=str)), decoded)
+        self.assertIs(decoded['menu_items'][0], decoded['menu_items'][1])
+        self.assertIs(decoded['tags'][0], decoded['tags'][1])
+
+    def test_decode_does_not_modify_data(self):
+        data = {'pk': None, 'menu_items': [{'pk': None, 'dish': 1, 'price': '1.50'}] * 2}
+        encoded = encode_shared_references(data)
+        original = copy.deepcopy(encoded)
+        self.assertEqual(data, decode_shared_references(encoded))
+        self.assertEqual(original, encoded)
+        self.assertEqual(data, decode_shared_references(encoded))
+
+    def test_nested_references(self):
+        leaf = {'pk': None, 'body': 'Me too', 'replies': []}
+        data = [{'pk': None, 'body': 'Thread', 'replies': [leaf, leaf]} for i in range(2)]
+        decoded = decode_shared_references(encode_shared_references(data))
+        self.assertEqual(data, decoded)
+        self.assertIs(decoded[0], decoded[1])
+        self.assertIs(decoded[0]['replies'][0], decoded[0]['replies'][1])
+
+    def test_cluster(self):
+        dish = Dish.objects.create(name="Snail ice cream")
+        fat_duck = Restaurant(name="The Fat Duck", menu_items=[
+            MenuItem(dish=dish, price='20.00') for i in range(10)
+        ], reviews=[
+            Review(author='Michael Winner', body='Rubbish, and far too expensive.') for i in range(10)
+        ])
+
+        json_data = fat_duck.to_json(shared_references=True)
+        self.assertLess(len(json_data), len(fat_duck.to_json()))
+
+        expected = json.loads(fat_duck.to_json())
+        restaurant = Restaurant.from_json(json_data)
+        self.assertEqual(expected, json.loads(restaurant.to_json()))
+        self.assertEqual(10, len(restaurant.reviews.all()))
+
+        restaurant = Restaurant.from_bytes(fat_duck.to_bytes(shared_references=True))
+        self.assertEqual(expected, json.loads(restaurant.to_json()))
+
+        [restaurant] = Restaurant.from_serializable_data_many([fat_duck.serializable_data(shared_references=True)])
+        self.assertEqual(expected, json.loads(restaurant.to_json()))
+
+    def test_what_is_shared(self):
+        dish = Dish.objects.create(name="Snail ice cream")
+        fat_duck = Restaurant(name="The Fat Duck", menu_items=[
+            MenuItem(dish=dish, price='20.00'),
+            MenuItem(dish=dish, price='25.00'),
+        ], reviews=[
+            Review(author='Michael Winner', body='Rubbish, and far too expensive.'),
+            Review(author='A. A. Gill', body='Rubbish, and far too expensive.'),
+            Review(author='A. A. Gill', body='Rubbish, and far too expensive.'),
+        ])
+        data = fat_duck.serializable_data(shared_references=True)
+
+        # the dish is referred to by its pk, which is not shared; the menu items differ in
+        # price, so they are not shared either
+        self.assertEqual([dish.pk, dish.pk], [item['dish'] for item in data['$data']['menu_items']])
+        # the repeated review body, and the review that is repeated in full, are
+        self.assertEqual(
+            ['Rubbish, and far too expensive.', {'pk': None, 'place': None, 'author': 'A. A. Gill', 'body': {'$ref': 0}}],
+            data['$shared']
+        )
+        self.assertEqual({'$ref': 0}, data['$data']['reviews'][0]['body'])
+        self.assertEqual([{'$ref': 1}, {'$ref': 1}], data['$data']['reviews'][1:])
+
+    def test_from_json_stream(self):
+        dish = Dish.objects.create(name="Snail ice cream")
+        fat_duck = Restaurant(name="The Fat Duck", menu_items=[
+            MenuItem(dish=dish, price='20.00') for i in range(3)
+        ])
+        restaurant = Restaurant.from_json_stream([fat_duck.to_json(shared_references=True)])
+        self.assertEqual(json.loads(fat_duck.to_json()), json.loads(restaurant.to_json()))
+        self.assertEqual(3, len(restaurant.menu_items.all()))
+
+    def test_nested_clusters(self):
+        thread = Comment(body='First!', replies=[
+            Comment(body='Me too', replies=[Comment(body='Me three')]) for i in range(3)
+        ])
+        data = thread.serializable_data(shared_references=True)
+        self.assertEqual(1, len(set(reply['$ref'] for reply in data['$data']['replies'])))
+        thread = Comment.from_serializable_data(data)
+        self.assertEqual(['Me too'] * 3, [reply.body for reply in thread.replies.all()])
+        self.assertEqual(
+            ['Me three'] * 3, [reply.replies.all()[0].body for reply in thread.replies.all()]
+        )